@@ -0,0 +1,223 @@
+import os
+import time
+from pathlib import Path
+from concurrent.futures import ThreadPoolExecutor
+import requests
+from luma_client import get_download_session
+
+# --- Download Settings ---
+# 1 MB chunks keep memory flat no matter how big the 4K mp4 is
+CHUNK_SIZE = 1024 * 1024
+MAX_RETRIES = 5
+RETRY_BACKOFF = 2  # seconds, doubled after every failed attempt
+TIMEOUT = (10, 60)  # (connect, read) seconds
+
+# Parallel downloads: only worth the extra connections for big assets (the 4K ray-2 mp4s)
+PARALLEL_CONNECTIONS = 8
+MIN_PARALLEL_SIZE = 16 * 1024 * 1024
+
+
+class DownloadError(RuntimeError):
+    pass
+
+
+def _retryable(error):
+    # Connection trouble, a 429 or a 5xx: the CDN throttling us or having a bad moment is worth
+    # retrying, any other 4xx won't get better
+    if isinstance(error, requests.exceptions.HTTPError):
+        status = error.response.status_code if error.response is not None else None
+        return status is not None and (status == 429 or status >= 500)
+    return True
+
+
+def _total_size(response, already_have):
+    # Work out the full size of the asset from either a 206 or a 200 response
+    content_range = response.headers.get("Content-Range")
+    if content_range and "/" in content_range:
+        total = content_range.rsplit("/", 1)[1]
+        if total.isdigit():
+            return int(total)
+    content_length = response.headers.get("Content-Length")
+    if content_length and content_length.isdigit():
+        if response.status_code == 206:
+            return already_have + int(content_length)
+        return int(content_length)
+    return None
+
+
+def download_asset(url, save_path, session=None, chunk_size=CHUNK_SIZE, max_retries=MAX_RETRIES):
+    # Stream an asset to disk and return its final path.
+    #   1. Bytes go to `<save_path>.part` as they arrive, never all held in RAM.
+    #   2. If the connection drops we reconnect with `Range: bytes=<have>-` and carry on.
+    #   3. Once the size matches what the server promised, the .part file is renamed into place,
+    #      so save_path either doesn't exist or is a complete file.
+    #   4. A .part that doesn't fit the asset (a 416 for some other size, or the asset's size changing
+    #      between attempts) is left over from a different file: it's deleted and we start from byte 0.
+    save_path = Path(save_path)
+    part_path = save_path.with_name(save_path.name + ".part")
+    http = session or get_download_session()
+
+    attempt = 0
+    total = None
+    while True:
+        have = part_path.stat().st_size if part_path.exists() else 0
+        headers = {"Range": f"bytes={have}-"} if have else {}
+        stale = None
+
+        try:
+            with http.get(url, headers=headers, stream=True, timeout=TIMEOUT) as response:
+                if response.status_code == 416 and have:
+                    reported = _total_size(response, have) or total
+                    if have == reported:
+                        # We already have every byte, the previous attempt died right before the rename
+                        break
+                    stale = f"{have} bytes on disk but the asset is {reported or 'an unknown size'}"
+                else:
+                    response.raise_for_status()
+
+                    if have and response.status_code != 206:
+                        # Server ignored the Range header and is sending the whole file again
+                        have = 0
+                    size = _total_size(response, have)
+                    if have and total is not None and size is not None and size != total:
+                        stale = f"the asset changed from {total} to {size} bytes"
+                    else:
+                        total = size or total
+                        with open(part_path, "ab" if have else "wb") as file:
+                            for chunk in response.iter_content(chunk_size=chunk_size):
+                                if chunk:
+                                    file.write(chunk)
+
+            if stale:
+                part_path.unlink(missing_ok=True)
+                total = None
+                error = f"{stale}, starting again"
+            else:
+                # Verify the size before exposing the file. A connection that closes cleanly
+                # but early is treated like any other interruption and resumed.
+                size = part_path.stat().st_size
+                if total is None or size == total:
+                    break
+                if size > total:
+                    part_path.unlink()
+                    raise DownloadError(f"Downloaded {size} bytes of {url}, expected {total}")
+                error = f"stream ended at {size} of {total} bytes"
+
+        except (requests.exceptions.ConnectionError, requests.exceptions.Timeout,
+                requests.exceptions.ChunkedEncodingError, requests.exceptions.HTTPError) as e:
+            if not _retryable(e):
+                raise
+            error = e
+
+        attempt += 1
+        if attempt > max_retries:
+            raise DownloadError(f"Giving up on {url} after {max_retries} retries: {error}")
+        wait = RETRY_BACKOFF * 2 ** (attempt - 1)
+        print(f"Download interrupted ({error}), retrying in {wait}s...")
+        time.sleep(wait)
+
+    os.replace(part_path, save_path)
+    return save_path
+
+
+def probe_asset(url, session=None, max_retries=MAX_RETRIES):
+    # Ask for the first byte to find out the size and whether the server honours Range.
+    # A 206 with a Content-Range is the only reliable sign; some CDNs omit Accept-Ranges on HEAD.
+    # Retried like the downloads themselves, so one 503 doesn't fail the whole asset.
+    http = session or get_download_session()
+    attempt = 0
+    while True:
+        try:
+            with http.get(url, headers={"Range": "bytes=0-0"}, stream=True, timeout=TIMEOUT) as response:
+                response.raise_for_status()
+                return _total_size(response, 0), response.status_code == 206
+        except (requests.exceptions.ConnectionError, requests.exceptions.Timeout,
+                requests.exceptions.HTTPError) as e:
+            if not _retryable(e):
+                raise
+            attempt += 1
+            if attempt > max_retries:
+                raise DownloadError(f"Giving up on {url} after {max_retries} retries: {e}") from e
+            time.sleep(RETRY_BACKOFF * 2 ** (attempt - 1))
+
+
+def _download_segment(url, part_path, start, end, session, chunk_size, max_retries):
+    # Fetch bytes [start, end] into the preallocated file. If the connection drops (or the CDN
+    # answers 429/5xx) we retry from the last byte written, so a flaky segment never restarts
+    # from scratch. Other 4xx responses fail straight away.
+    http = session or get_download_session()
+    position = start
+    attempt = 0
+    while position <= end:
+        try:
+            headers = {"Range": f"bytes={position}-{end}"}
+            with http.get(url, headers=headers, stream=True, timeout=TIMEOUT) as response:
+                response.raise_for_status()
+                if response.status_code != 206:
+                    raise DownloadError(f"Server stopped honouring Range requests for {url}")
+                with open(part_path, "r+b") as file:
+                    file.seek(position)
+                    for chunk in response.iter_content(chunk_size=chunk_size):
+                        if chunk:
+                            chunk = chunk[: end + 1 - position]
+                            file.write(chunk)
+                            position += len(chunk)
+            if position <= end:
+                raise requests.exceptions.ChunkedEncodingError(
+                    f"segment ended at byte {position}, expected {end}"
+                )
+
+        except (requests.exceptions.ConnectionError, requests.exceptions.Timeout,
+                requests.exceptions.ChunkedEncodingError, requests.exceptions.HTTPError) as e:
+            if not _retryable(e):
+                raise
+            attempt += 1
+            if attempt > max_retries:
+                raise DownloadError(f"Segment {start}-{end} of {url} failed after {max_retries} retries: {e}") from e
+            time.sleep(RETRY_BACKOFF * 2 ** (attempt - 1))
+    return end + 1 - start
+
+
+def download_asset_parallel(url, save_path, session=None, connections=PARALLEL_CONNECTIONS,
+                            min_parallel_size=MIN_PARALLEL_SIZE, chunk_size=CHUNK_SIZE,
+                            max_retries=MAX_RETRIES):
+    # Split a large asset into `connections` byte ranges and fetch them at the same time.
+    # A single stream from the CDN is capped well below our link speed, N streams aren't.
+    # Falls back to the single-stream download_asset when the server has no Range support
+    # or the file is too small to be worth it.
+    save_path = Path(save_path)
+    total, ranges_supported = probe_asset(url, session=session, max_retries=max_retries)
+    if not ranges_supported or total is None or total < min_parallel_size or connections < 2:
+        return download_asset(url, save_path, session=session, chunk_size=chunk_size, max_retries=max_retries)
+
+    # 1. Preallocate the .part file so every segment can write at its own offset
+    part_path = save_path.with_name(save_path.name + ".part")
+    with open(part_path, "wb") as file:
+        file.truncate(total)
+
+    # 2. Even byte ranges, the last one picks up the remainder
+    segment_size = -(-total // connections)
+    segments = [
+        (start, min(start + segment_size, total) - 1)
+        for start in range(0, total, segment_size)
+    ]
+
+    # 3. Fetch every segment concurrently
+    try:
+        with ThreadPoolExecutor(max_workers=len(segments)) as pool:
+            futures = [
+                pool.submit(_download_segment, url, part_path, start, end, session, chunk_size, max_retries)
+                for start, end in segments
+            ]
+            written = sum(future.result() for future in futures)
+    except Exception:
+        part_path.unlink(missing_ok=True)
+        raise
+
+    # 4. Verify and rename into place
+    if written != total or part_path.stat().st_size != total:
+        part_path.unlink(missing_ok=True)
+        raise DownloadError(f"Downloaded {written} bytes of {url}, expected {total}")
+
+    os.replace(part_path, save_path)
+    return save_path
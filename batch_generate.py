@@ -0,0 +1,367 @@
+import sys
+import time
+import argparse
+from pathlib import Path
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from luma_client import get_client
+from job_manifest import iter_manifest
+from concept_catalog import validate_concepts, refresh_concepts
+from model_capabilities import validate_request, request_problems
+from status_poller import StatusPoller, log_poll_error
+from asset_download import download_asset, download_asset_parallel
+from generation_cache import GenerationCache
+from job_ledger import JobLedger
+from generation_timing import TimingTrace, serve_metrics, DEFAULT_TRACE_PATH
+from reference_images import get_reference_images
+from callback_receiver import CallbackReceiver
+from output_store import OutputStore
+
+# --- Configuration ---
+# 1. Setup Paths
+# We use the current script directory as the base, just like list_allowed_concepts.py
+current_script_dir = Path(__file__).resolve().parent
+default_output_dir = current_script_dir / "batch_outputs"
+
+# Photon models go through the image endpoint, everything else (ray-2 etc.) is a video
+IMAGE_MODELS = ("photon-1", "photon-flash-1")
+
+# Keys in a manifest entry that are for us, not for the Luma API
+#   final_spec  on a draft: the full quality spec it stands in for (see promote_draft.py)
+#   draft_of    on a promoted render: the draft generation it was approved from
+SPEC_META_KEYS = ("name", "final_spec", "draft_of")
+
+# Draft mode: the cheapest, fastest tier, for iterating on prompts before paying for the real render.
+# Everything else in the spec (prompt, keyframes, concepts, aspect ratio, loop) is left as it is.
+DRAFT_VIDEO_SETTINGS = {"model": "ray-flash-2", "resolution": "540p", "duration": "5s"}
+DRAFT_IMAGE_SETTINGS = {"model": "photon-flash-1"}
+
+
+def is_image_spec(spec):
+    return spec.get("model") in IMAGE_MODELS
+
+
+def draft_spec(spec):
+    # The draft version of a spec, carrying the original so an approved draft can be promoted as-is
+    if "final_spec" in spec:
+        return spec
+    final = {key: value for key, value in spec.items() if key != "draft_of"}
+    draft = dict(final, **(DRAFT_IMAGE_SETTINGS if is_image_spec(spec) else DRAFT_VIDEO_SETTINGS))
+    if spec.get("name"):
+        draft["name"] = f"{spec['name']}-draft"
+    draft["final_spec"] = final
+    return draft
+
+
+def request_params(spec):
+    # Strip our own bookkeeping keys before handing the spec to the SDK
+    return {key: value for key, value in spec.items() if key not in SPEC_META_KEYS}
+
+
+def check_manifest(specs):
+    # Check every spec against the model capability table before anything is submitted.
+    # Returns ([(name, problems)] for the invalid ones, number of specs checked). A draft's
+    # final_spec is checked too, so it can be promoted later without surprises.
+    invalid = []
+    count = 0
+    for spec in specs:
+        count += 1
+        problems = request_problems(request_params(spec))
+        if spec.get("final_spec"):
+            problems += [f"final spec: {problem}" for problem in request_problems(request_params(spec["final_spec"]))]
+        if problems:
+            invalid.append((spec.get("name"), problems))
+    return invalid, count
+
+
+def submit_generation(client, spec, timing=None):
+    # Unknown concept keys, and models/resolutions/durations/references a model doesn't support,
+    # are caught locally (no network call)
+    validate_concepts(spec)
+
+    params = request_params(spec)
+    validate_request(params)
+    if timing is not None:
+        timing.submitting()
+    if is_image_spec(spec):
+        generation = client.generations.image.create(**params)
+    else:
+        generation = client.generations.create(**params)
+    if timing is not None:
+        timing.submitted(generation)
+    return generation
+
+
+def download_generation(generation, output_dir, image=False):
+    # Save as {generation.id}.mp4 (or .jpg for images) inside the batch output folder
+    asset_url = generation.assets.image if image else generation.assets.video
+    extension = "jpg" if image else "mp4"
+    save_path = Path(output_dir) / f"{generation.id}.{extension}"
+
+    if image:
+        return download_asset(asset_url, save_path)
+    # Videos are big enough to be worth several ranged connections
+    return download_asset_parallel(asset_url, save_path)
+
+
+def download_job(generation, spec, result, output_dir, cache=None, ledger=None, timing=None, store=None,
+                 source="batch_generate.py"):
+    # Runs in the download pool so a slow download never holds up status polling
+    try:
+        if timing is not None:
+            timing.downloading()
+        save_path = download_generation(generation, output_dir, image=is_image_spec(spec))
+        if timing is not None:
+            timing.downloaded(save_path)
+        asset_url = generation.assets.image if is_image_spec(spec) else generation.assets.video
+        if store is not None:
+            save_path = store.add(save_path, generation.id, spec, source=source,
+                                  timings=timing.stages() if timing is not None else None, asset_url=asset_url)
+        print(f"[{spec['name']}] File downloaded as {save_path}")
+        if ledger is not None:
+            ledger.record_download(generation.id, save_path)
+        if cache is not None:
+            cache.store(spec, generation.id, asset_url, save_path)
+        return save_path
+    finally:
+        result["finished"] = time.monotonic()
+
+
+def restore_cached(cache, cached, spec, output_dir, store=None, source="batch_generate.py"):
+    # Put a cache hit where a fresh download would have gone: filed in the output store (only
+    # indexed again if the store doesn't already have it), or {generation_id}.ext in output_dir
+    generation_id = cached["generation_id"]
+    if store is not None:
+        stored = store.path_for(generation_id)
+        if stored is not None and stored.exists():
+            return stored
+        return store.add(cached["path"], generation_id, spec, source=source, asset_url=cached.get("asset_url"),
+                         move=False)
+    return cache.restore(cached, Path(output_dir) / f"{generation_id}{Path(cached['path']).suffix}")
+
+
+def run_batch(client, specs, output_dir, max_concurrency=4, download_workers=4, cache=None, refresh=False,
+              ledger=None, timings=None, references=None, callbacks=None, store=None):
+    # Keep up to max_concurrency generations queued at Luma. A single StatusPoller watches
+    # all of them, and the moment one finishes its download starts and the next spec is submitted.
+    # Specs already in the cache are restored from disk and never submitted (unless refresh=True).
+    # With a TimingTrace, every submitted generation's per-stage timings are recorded.
+    # With a ReferenceImages resolver, local image paths in specs are swapped for hosted URLs.
+    # With a CallbackReceiver, jobs are submitted with its callback_url and polling drops to a slow sweep.
+    # With an OutputStore, finished downloads are moved into it and indexed.
+    output_dir = Path(output_dir)
+    output_dir.mkdir(parents=True, exist_ok=True)
+
+    poller = StatusPoller(
+        client,
+        on_state_change=ledger.record_state if ledger is not None else None,
+        on_error=log_poll_error,
+        on_check=timings.observe if timings is not None else None,
+        sweep_interval=callbacks.sweep_interval if callbacks is not None else None,
+    )
+    if callbacks is not None:
+        callbacks.on_generation = poller.push
+    remaining = iter(specs)
+    in_flight = {}
+    results = []
+    downloads = {}
+
+    def submit_next():
+        for spec in remaining:
+            result = {"name": spec["name"], "generation_id": None, "path": None, "error": None}
+            result["started"] = time.monotonic()
+            timing = timings.start(spec, source="batch_generate.py") if timings is not None else None
+
+            if references is not None:
+                # Before the cache lookup, so the cache key holds the content-hashed URL, not a path
+                try:
+                    spec = references.resolve_spec(spec)
+                except Exception as e:
+                    result["error"] = f"Reference image problem: {e}"
+                    result["finished"] = time.monotonic()
+                    print(f"[{spec['name']}] {result['error']}")
+                    if timing is not None:
+                        timing.finish(error=result["error"])
+                    results.append(result)
+                    continue
+
+            cached = None if cache is None or refresh else cache.lookup(spec)
+            if cached:
+                result["generation_id"] = cached["generation_id"]
+                result["path"] = str(restore_cached(cache, cached, spec, output_dir, store))
+                result["finished"] = time.monotonic()
+                print(f"[{spec['name']}] Identical request found in cache! File restored as {result['path']}")
+                results.append(result)
+                continue
+
+            try:
+                if callbacks is not None:
+                    spec = dict(spec, callback_url=callbacks.url)
+                generation = submit_generation(client, spec, timing)
+            except Exception as e:
+                result["error"] = str(e)
+                result["finished"] = time.monotonic()
+                if timing is not None:
+                    timing.finish(error=result["error"])
+                print(f"[{spec['name']}] An error occurred during generation: {e}")
+                results.append(result)
+                continue
+            result["generation_id"] = generation.id
+            print(f"[{spec['name']}] Generation started successfully! ID: {generation.id}")
+            if ledger is not None:
+                extension = "jpg" if is_image_spec(spec) else "mp4"
+                ledger.record_submitted(
+                    generation, spec, output_path=output_dir / f"{generation.id}.{extension}", source="batch_generate.py"
+                )
+            in_flight[generation.id] = (spec, result, timing)
+            poller.add(generation)
+            return
+
+    for _ in range(max_concurrency):
+        submit_next()
+
+    with ThreadPoolExecutor(max_workers=download_workers) as pool:
+        for generation in poller.as_completed():
+            spec, result, timing = in_flight.pop(generation.id)
+            if generation.state == "failed":
+                result["error"] = f"Generation failed: {generation.failure_reason}"
+                result["finished"] = time.monotonic()
+                print(f"[{spec['name']}] {result['error']}")
+                if timing is not None:
+                    timing.finish(error=result["error"])
+                results.append(result)
+            else:
+                print(f"[{spec['name']}] Generation completed, downloading...")
+                future = pool.submit(download_job, generation, spec, result, output_dir, cache, ledger, timing, store)
+                downloads[future] = (result, timing)
+
+            # A slot just freed up at Luma, fill it
+            submit_next()
+
+        for future in as_completed(downloads):
+            result, timing = downloads[future]
+            try:
+                result["path"] = str(future.result())
+            except Exception as e:
+                result["error"] = str(e)
+                print(f"[{result['name']}] An error occurred during the download process: {e}")
+            if timing is not None:
+                timing.finish(error=result["error"])
+            results.append(result)
+
+    for result in results:
+        result["seconds"] = round(result.pop("finished") - result.pop("started"), 1)
+    print(f"Status checks: {poller.get_requests} GET, {poller.list_requests} list")
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Run many Luma generations concurrently from a manifest.")
+    parser.add_argument("manifest", help="Job manifest: .jsonl, .json, .toml or a prompt.txt-style .txt file")
+    parser.add_argument("--concurrency", type=int, default=4, help="Maximum number of jobs in flight at once")
+    parser.add_argument("--output-dir", default=str(default_output_dir),
+                        help="Where assets are downloaded to (and left, with --no-store)")
+    parser.add_argument("--no-store", action="store_true", help="Leave downloads in --output-dir instead of the output store")
+    parser.add_argument("--download-workers", type=int, default=4, help="Parallel downloads of finished assets")
+    parser.add_argument("--refresh", action="store_true", help="Ignore the generation cache and pay for fresh generations")
+    parser.add_argument("--no-cache", action="store_true", help="Don't read or write the generation cache at all")
+    parser.add_argument("--model", help="Default model for entries that don't set one")
+    parser.add_argument("--resolution", help="Default resolution for entries that don't set one")
+    parser.add_argument("--duration", help="Default duration for entries that don't set one")
+    parser.add_argument("--aspect-ratio", help="Default aspect ratio for entries that don't set one")
+    parser.add_argument("--draft", action="store_true",
+                        help="Render every entry at the cheap draft tier first (promote keepers with promote_draft.py)")
+    parser.add_argument("--callbacks", action="store_true",
+                        help="Have Luma call us back on completion instead of polling (slow safety-net polling only)")
+    parser.add_argument("--callback-port", type=int, default=0, help="Local port for the callback receiver")
+    parser.add_argument("--callback-url", help="Public URL forwarding to the receiver (default: LUMA_CALLBACK_URL)")
+    parser.add_argument("--trace", default=str(DEFAULT_TRACE_PATH), help="JSONL file per-stage timings are appended to")
+    parser.add_argument("--metrics-port", type=int, help="Serve Prometheus timing metrics on this port while running")
+    parser.add_argument("--check", action="store_true", help="Only check the manifest against model_capabilities.py")
+    args = parser.parse_args()
+
+    # Specs are streamed from the manifest as slots free up, never all loaded at once
+    defaults = {
+        key: value
+        for key, value in {
+            "model": args.model,
+            "resolution": args.resolution,
+            "duration": args.duration,
+            "aspect_ratio": args.aspect_ratio,
+        }.items()
+        if value is not None
+    }
+    specs = iter_manifest(args.manifest, defaults=defaults)
+    if args.draft:
+        specs = map(draft_spec, specs)
+
+    # One streaming pass over the whole manifest first, so a bad entry near the end stops the run
+    # before anything is paid for; the specs aren't kept, the real run reads the manifest again
+    try:
+        invalid, count = check_manifest(specs)
+    except (ValueError, OSError) as e:
+        print(f"Error reading {args.manifest}: {e}")
+        sys.exit(1)
+    for name, problems in invalid:
+        print(f"[{name}] {'; '.join(problems)}")
+    if invalid:
+        print(f"{len(invalid)}/{count} specs in {args.manifest} are invalid, nothing was submitted")
+        sys.exit(1)
+    if args.check:
+        print(f"All {count} specs in {args.manifest} are valid")
+        return
+    specs = iter_manifest(args.manifest, defaults=defaults)
+    if args.draft:
+        specs = map(draft_spec, specs)
+    client = get_client()
+
+    # One conditional request up front at most; every per-job concept check after this is local
+    try:
+        refresh_concepts()
+    except Exception as e:
+        print(f"Warning: could not load the concept catalogue ({e})")
+
+    timings = TimingTrace(args.trace)
+    if args.metrics_port:
+        serve_metrics(timings, args.metrics_port)
+
+    callbacks = None
+    if args.callbacks:
+        callbacks = CallbackReceiver(port=args.callback_port, public_url=args.callback_url)
+        print(f"Receiving completion callbacks on port {callbacks.port}")
+
+    print(f"Running jobs from {args.manifest} with concurrency {args.concurrency}")
+    started = time.monotonic()
+    results = run_batch(
+        client,
+        specs,
+        args.output_dir,
+        max_concurrency=args.concurrency,
+        download_workers=args.download_workers,
+        cache=None if args.no_cache else GenerationCache(),
+        refresh=args.refresh,
+        ledger=JobLedger(),
+        timings=timings,
+        references=get_reference_images(),
+        callbacks=callbacks,
+        store=None if args.no_store else OutputStore(),
+    )
+    elapsed = time.monotonic() - started
+    if callbacks is not None:
+        callbacks.close()
+        print(f"Callbacks: {callbacks.received} received, {callbacks.duplicates} duplicates ignored, "
+              f"{callbacks.rejected} rejected")
+
+    # Summary
+    failed = [result for result in results if result["error"]]
+    print("-" * 30)
+    print(f"Finished {len(results) - len(failed)}/{len(results)} jobs in {elapsed:.1f}s")
+    print(f"Per-stage timings appended to {args.trace} (summarise with: python generation_timing.py)")
+    for result in failed:
+        print(f"- {result['name']} ({result['generation_id']}): {result['error']}")
+
+    if failed:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
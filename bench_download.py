@@ -0,0 +1,134 @@
+import os
+import re
+import time
+import argparse
+import tempfile
+import threading
+from pathlib import Path
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+from asset_download import download_asset, download_asset_parallel
+
+# --- Local download benchmark ---
+# Serves a fake asset from a local HTTP server that (like the Luma CDN) caps the speed of each
+# individual connection, then times the single-stream download against the ranged parallel one.
+#
+#   python bench_download.py --size-mb 300 --per-connection-mbps 40 --connections 8
+
+
+def make_handler(asset_path, per_connection_bytes_per_sec, ranges=True):
+    asset_size = os.path.getsize(asset_path)
+
+    class AssetHandler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+
+        def log_message(self, format, *args):
+            pass
+
+        def do_GET(self):
+            start, end = 0, asset_size - 1
+            range_header = self.headers.get("Range")
+            match = re.match(r"bytes=(\d+)-(\d*)", range_header or "")
+
+            if ranges and match:
+                start = int(match.group(1))
+                if match.group(2):
+                    end = min(int(match.group(2)), asset_size - 1)
+                if start >= asset_size:
+                    self.send_response(416)
+                    self.send_header("Content-Range", f"bytes */{asset_size}")
+                    self.send_header("Content-Length", "0")
+                    self.end_headers()
+                    return
+                self.send_response(206)
+                self.send_header("Content-Range", f"bytes {start}-{end}/{asset_size}")
+            else:
+                self.send_response(200)
+
+            self.send_header("Content-Type", "video/mp4")
+            self.send_header("Content-Length", str(end - start + 1))
+            if ranges:
+                self.send_header("Accept-Ranges", "bytes")
+            self.end_headers()
+
+            # Send in 64 KB slices, sleeping to hold each connection to its bandwidth cap
+            slice_size = 64 * 1024
+            with open(asset_path, "rb") as file:
+                file.seek(start)
+                remaining = end - start + 1
+                began = time.monotonic()
+                sent = 0
+                while remaining > 0:
+                    data = file.read(min(slice_size, remaining))
+                    try:
+                        self.wfile.write(data)
+                    except (BrokenPipeError, ConnectionResetError):
+                        # The client hung up early (e.g. the Range probe on a no-Range server)
+                        return
+                    sent += len(data)
+                    remaining -= len(data)
+                    if per_connection_bytes_per_sec:
+                        ahead = sent / per_connection_bytes_per_sec - (time.monotonic() - began)
+                        if ahead > 0:
+                            time.sleep(ahead)
+
+    return AssetHandler
+
+
+def serve_asset(asset_path, per_connection_bytes_per_sec=None, ranges=True, port=0):
+    # Start the server in a background thread and return (server, url)
+    server = ThreadingHTTPServer(("127.0.0.1", port), make_handler(asset_path, per_connection_bytes_per_sec, ranges))
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, f"http://127.0.0.1:{server.server_address[1]}/{Path(asset_path).name}"
+
+
+def time_download(label, download, url, save_path, size, **kwargs):
+    started = time.monotonic()
+    download(url, save_path, **kwargs)
+    elapsed = time.monotonic() - started
+    assert os.path.getsize(save_path) == size, f"{label}: size mismatch"
+    print(f"{label:<28} {elapsed:7.2f}s  {size / elapsed / 1e6:8.1f} MB/s")
+    os.remove(save_path)
+    return elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark single-stream vs parallel ranged downloads locally.")
+    parser.add_argument("--size-mb", type=int, default=200, help="Size of the fake asset")
+    parser.add_argument("--per-connection-mbps", type=float, default=40, help="Bandwidth cap per connection (MB/s, 0 = none)")
+    parser.add_argument("--connections", type=int, default=8, help="Parallel connections to use")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as workdir:
+        asset_path = Path(workdir) / "asset.mp4"
+        size = args.size_mb * 1024 * 1024
+        with open(asset_path, "wb") as file:
+            block = os.urandom(1024 * 1024)
+            for _ in range(args.size_mb):
+                file.write(block)
+
+        cap = args.per_connection_mbps * 1e6 or None
+        server, url = serve_asset(asset_path, cap)
+        no_range_server, no_range_url = serve_asset(asset_path, cap, ranges=False)
+        save_path = Path(workdir) / "download.mp4"
+
+        print(f"Asset: {args.size_mb} MB, per-connection cap: {args.per_connection_mbps} MB/s")
+        print("-" * 30)
+        single = time_download("single stream", download_asset, url, save_path, size)
+        parallel = time_download(
+            f"parallel x{args.connections}", download_asset_parallel, url, save_path, size,
+            connections=args.connections,
+        )
+        time_download(
+            "parallel, no Range (fallback)", download_asset_parallel, no_range_url, save_path, size,
+            connections=args.connections,
+        )
+        print("-" * 30)
+        print(f"Speedup: {single / parallel:.1f}x")
+
+        server.shutdown()
+        no_range_server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
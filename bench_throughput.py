@@ -0,0 +1,259 @@
+import io
+import sys
+import json
+import time
+import socket
+import argparse
+import resource
+import tempfile
+import threading
+import subprocess
+import contextlib
+from pathlib import Path
+import httpx
+import requests
+from lumaai import LumaAI, DefaultHttpxClient
+import status_poller
+from status_poller import PollProfile, TERMINAL_STATES
+from rate_limiter import RateLimitedTransport, TokenBucket, account_limits
+from batch_generate import run_batch, submit_generation
+from generation_timing import TimingTrace
+from callback_receiver import CallbackReceiver, SAFETY_NET_SWEEP
+
+# --- End-to-end throughput benchmark ---
+# Runs N generations through the real submit/poll/download code against mock_luma_server.py
+# (started in a child process, so its memory doesn't count towards ours) and reports
+# jobs/minute, p50/p99 end-to-end latency, status requests and peak RSS.
+#
+# Time is compressed by --time-scale: renders take that fraction of their real duration, and the
+# poll schedules and account rate limits are scaled to match, so the numbers keep their shape.
+#
+#   python bench_throughput.py --jobs 50 --concurrency 10
+#   python bench_throughput.py --jobs 50 --concurrency 10 --mode both --rate-limit-rate 0.05
+#
+# Modes:
+#   batch   batch_generate.run_batch (one StatusPoller, parallel ranged downloads);
+#           with --callbacks, completion callbacks plus a slow safety-net sweep instead of polling
+#   legacy  what the scripts originally did: a thread per job, GET every 3s, plain requests.get download
+#   both    each of the above in its own process, so peak RSS is measured separately
+
+LEGACY_POLL_INTERVAL = 3.0  # the original scripts' time.sleep(3)
+
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def start_mock_server(args):
+    port = free_port()
+    command = [
+        sys.executable, str(Path(__file__).resolve().parent / "mock_luma_server.py"),
+        "--port", str(port),
+        "--time-scale", str(args.time_scale),
+        "--failure-rate", str(args.failure_rate),
+        "--error-rate", str(args.error_rate),
+        "--rate-limit-rate", str(args.rate_limit_rate),
+        "--video-mb", str(args.video_mb),
+        "--per-connection-mbps", str(args.per_connection_mbps),
+        "--callback-drop-rate", str(args.callback_drop_rate),
+        "--callback-duplicate-rate", str(args.callback_duplicate_rate),
+        "--seed", str(args.seed),
+    ]
+    process = subprocess.Popen(command, stdout=subprocess.DEVNULL)
+    base_url = f"http://127.0.0.1:{port}/dream-machine/v1/"
+
+    deadline = time.monotonic() + 10
+    while True:
+        try:
+            requests.get(base_url + "_mock/stats", timeout=1).raise_for_status()
+            return process, base_url
+        except requests.RequestException:
+            if time.monotonic() > deadline or process.poll() is not None:
+                process.kill()
+                raise RuntimeError("Mock Luma API did not start")
+            time.sleep(0.1)
+
+
+def scale_poll_profiles(time_scale):
+    # Renders on the mock are time_scale times as long as the real thing, so poll on the same clock
+    for model, profile in status_poller.POLL_PROFILES.items():
+        status_poller.POLL_PROFILES[model] = PollProfile(*(value * time_scale for value in profile))
+    status_poller.DEFAULT_PROFILE = PollProfile(*(value * time_scale for value in status_poller.DEFAULT_PROFILE))
+
+
+def make_client(base_url, time_scale):
+    # Same transport as luma_client.get_client(), with the account limits sped up to the mock's clock
+    limits = account_limits()
+    transport = RateLimitedTransport(
+        request_bucket=TokenBucket(limits.requests_per_second / time_scale, limits.request_burst),
+        create_bucket=TokenBucket(limits.creates_per_minute / 60.0 / time_scale, limits.create_burst),
+        limits=httpx.Limits(max_connections=32, max_keepalive_connections=32),
+    )
+    client = LumaAI(
+        auth_token="mock-key", base_url=base_url, http_client=DefaultHttpxClient(transport=transport), max_retries=0
+    )
+    return client, transport
+
+
+def legacy_job(client, spec, output_dir, poll_interval, result):
+    # The loop generate_video.py used to run, one of these per job
+    started = time.monotonic()
+    try:
+        generation = submit_generation(client, spec)
+        while generation.state not in TERMINAL_STATES:
+            time.sleep(poll_interval)
+            generation = client.generations.get(id=generation.id)
+        if generation.state == "failed":
+            result["error"] = f"Generation failed: {generation.failure_reason}"
+            return
+        response = requests.get(generation.assets.video, stream=True)
+        with open(Path(output_dir) / f"{generation.id}.mp4", "wb") as file:
+            file.write(response.content)
+    except Exception as e:
+        result["error"] = str(e)
+    finally:
+        result["seconds"] = time.monotonic() - started
+
+
+def run_legacy(client, specs, output_dir, max_concurrency, poll_interval):
+    # Threads in waves of max_concurrency, the closest thing to running the script N times
+    results = []
+    specs = list(specs)
+    for index in range(0, len(specs), max_concurrency):
+        threads = []
+        for spec in specs[index:index + max_concurrency]:
+            result = {"name": spec["name"], "error": None}
+            results.append(result)
+            thread = threading.Thread(target=legacy_job, args=(client, spec, output_dir, poll_interval, result))
+            thread.start()
+            threads.append(thread)
+        for thread in threads:
+            thread.join()
+    return results
+
+
+def percentile(values, fraction):
+    # Nearest-rank percentile, fine for a few hundred samples
+    if not values:
+        return None
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, max(0, round(fraction * len(ordered) + 0.5) - 1))]
+
+
+def run_mode(args):
+    process, base_url = start_mock_server(args)
+    try:
+        scale_poll_profiles(args.time_scale)
+        client, transport = make_client(base_url, args.time_scale)
+        specs = [
+            {"name": f"job{index:03d}", "prompt": f"benchmark job {index}", "model": args.model,
+             "resolution": args.resolution, "duration": args.duration}
+            for index in range(args.jobs)
+        ]
+
+        callbacks = None
+        if args.callbacks and args.mode == "batch":
+            callbacks = CallbackReceiver(sweep_interval=SAFETY_NET_SWEEP * args.time_scale)
+
+        output = None if args.verbose else io.StringIO()
+        with tempfile.TemporaryDirectory() as output_dir, contextlib.redirect_stdout(output or sys.stdout):
+            started = time.monotonic()
+            if args.mode == "legacy":
+                results = run_legacy(client, specs, output_dir, args.concurrency, LEGACY_POLL_INTERVAL * args.time_scale)
+            else:
+                results = run_batch(
+                    client, specs, output_dir, max_concurrency=args.concurrency, download_workers=args.download_workers,
+                    timings=TimingTrace(args.trace) if args.trace else None, callbacks=callbacks,
+                )
+            elapsed = time.monotonic() - started
+
+        server_stats = requests.get(base_url + "_mock/stats").json()["requests"]
+    finally:
+        if callbacks is not None:
+            callbacks.close()
+        process.terminate()
+        process.wait()
+
+    latencies = [result["seconds"] for result in results if not result["error"]]
+    status_requests = server_stats.get("get", 0) + server_stats.get("list", 0)
+    return {
+        "mode": args.mode,
+        "jobs": len(results),
+        "succeeded": len(latencies),
+        "elapsed": elapsed,
+        "jobs_per_minute": len(latencies) / elapsed * 60 if elapsed else 0.0,
+        # Reported in real-world seconds, i.e. scaled back up by the time scale
+        "p50": percentile(latencies, 0.50) / args.time_scale if latencies else None,
+        "p99": percentile(latencies, 0.99) / args.time_scale if latencies else None,
+        "status_requests": status_requests,
+        "status_requests_per_job": status_requests / len(results) if results else 0.0,
+        "server_requests": server_stats,
+        "callbacks": None if callbacks is None else {
+            "received": callbacks.received, "duplicates": callbacks.duplicates, "rejected": callbacks.rejected,
+        },
+        "throttled": transport.throttled,
+        "retried": transport.retried,
+        # ru_maxrss is in KB on Linux
+        "peak_rss_mb": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024,
+    }
+
+
+def print_report(report, time_scale):
+    print(f"Mode: {report['mode']}")
+    print(f"  jobs:                 {report['succeeded']}/{report['jobs']} succeeded in {report['elapsed']:.1f}s")
+    print(f"  jobs/minute:          {report['jobs_per_minute']:.1f}  (x{1 / time_scale:g} time compression)")
+    if report["p50"] is not None:
+        print(f"  latency p50 / p99:    {report['p50']:.1f}s / {report['p99']:.1f}s  (real-time equivalent)")
+    print(f"  status requests:      {report['status_requests']} ({report['status_requests_per_job']:.1f} per job)")
+    if report["callbacks"]:
+        print(f"  callbacks:            {report['callbacks']}")
+    print(f"  429s / retries:       {report['throttled']} / {report['retried']}")
+    print(f"  peak RSS:             {report['peak_rss_mb']:.1f} MB")
+    print(f"  server requests:      {report['server_requests']}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the generation pipeline end to end against the mock Luma API.")
+    parser.add_argument("--jobs", type=int, default=20, help="Number of generations to run")
+    parser.add_argument("--concurrency", type=int, default=8, help="Jobs in flight at once")
+    parser.add_argument("--download-workers", type=int, default=4, help="Parallel downloads (batch mode)")
+    parser.add_argument("--mode", choices=("batch", "legacy", "both"), default="batch")
+    parser.add_argument("--model", default="ray-flash-2")
+    parser.add_argument("--resolution", default="720p")
+    parser.add_argument("--duration", default="5s")
+    parser.add_argument("--time-scale", type=float, default=0.05, help="Fraction of real render time the mock takes")
+    parser.add_argument("--failure-rate", type=float, default=0.0)
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    parser.add_argument("--rate-limit-rate", type=float, default=0.0)
+    parser.add_argument("--video-mb", type=float, default=8.0)
+    parser.add_argument("--per-connection-mbps", type=float, default=0.0)
+    parser.add_argument("--callbacks", action="store_true", help="Use completion callbacks (batch mode)")
+    parser.add_argument("--callback-drop-rate", type=float, default=0.0)
+    parser.add_argument("--callback-duplicate-rate", type=float, default=0.0)
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--trace", help="Write per-stage timings to this JSONL file (batch mode)")
+    parser.add_argument("--json", action="store_true", help="Print the report as JSON")
+    parser.add_argument("--verbose", action="store_true", help="Show the per-job output of the code under test")
+    args = parser.parse_args()
+
+    if args.mode == "both":
+        # Each mode in its own process, so neither one's peak RSS hides the other's
+        reports = []
+        for mode in ("legacy", "batch"):
+            command = [sys.executable, __file__, *sys.argv[1:], "--mode", mode, "--json"]
+            reports.append(json.loads(subprocess.run(command, check=True, capture_output=True, text=True).stdout))
+    else:
+        reports = [run_mode(args)]
+
+    if args.json:
+        print(json.dumps(reports[0] if len(reports) == 1 else reports))
+        return
+    for report in reports:
+        print_report(report, args.time_scale)
+        print("-" * 30)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,103 @@
+import os
+import json
+import secrets
+import threading
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+from lumaai.types import Generation
+
+# --- Completion Callbacks ---
+# The create call takes a callback_url, and Luma POSTs the generation to it whenever its state
+# changes. CallbackReceiver is a small HTTP server for those POSTs, embedded in the running script,
+# so a finished generation starts downloading the moment Luma says so instead of at the next poll.
+#
+#   verify   every receiver makes a random secret token that only appears in the callback URL it
+#            hands out (/luma-callback/<token>); POSTs to any other path are refused
+#   dedupe   each (generation id, state) is handled once, however many times it's delivered
+#
+# Callbacks can be lost, so the StatusPoller keeps a slow safety-net sweep running alongside
+# (SAFETY_NET_SWEEP, one bulk list call per sweep) to catch anything that never arrives.
+#
+# Luma has to be able to reach the receiver. Run it behind a tunnel or reverse proxy, and set
+# LUMA_CALLBACK_URL (or --callback-url) to the public address that forwards to --callback-port.
+# Against mock_luma_server.py the local address just works.
+#
+#   python batch_generate.py shots.jsonl --callbacks --callback-port 8788 --callback-url https://hooks.example.com
+
+CALLBACK_PATH = "/luma-callback/"
+SAFETY_NET_SWEEP = 120.0  # seconds between safety-net status sweeps while callbacks are on
+MAX_BODY_BYTES = 1024 * 1024
+
+
+class CallbackReceiver:
+
+    def __init__(self, on_generation=None, port=0, host="127.0.0.1", public_url=None, sweep_interval=SAFETY_NET_SWEEP):
+        # on_generation is called (on the server's thread) with each new Generation, e.g. StatusPoller.push
+        self.on_generation = on_generation
+        # How often the StatusPoller working with this receiver still checks every job itself
+        self.sweep_interval = sweep_interval
+        self.token = secrets.token_urlsafe(24)
+        self._seen = set()
+        self._lock = threading.Lock()
+
+        # Counters, for the summary and the benchmarks
+        self.received = 0
+        self.duplicates = 0
+        self.rejected = 0
+
+        self._server = ThreadingHTTPServer((host, port), self._make_handler())
+        self._server.daemon_threads = True
+        self.port = self._server.server_address[1]
+        base_url = (public_url or os.getenv("LUMA_CALLBACK_URL") or f"http://{host}:{self.port}").rstrip("/")
+        self.url = f"{base_url}{CALLBACK_PATH}{self.token}"
+        threading.Thread(target=self._server.serve_forever, daemon=True).start()
+
+    def close(self):
+        self._server.shutdown()
+        self._server.server_close()
+
+    def handle(self, path, body):
+        # Returns the HTTP status to answer with
+        if not secrets.compare_digest(path.encode("utf-8"), (CALLBACK_PATH + self.token).encode("utf-8")):
+            with self._lock:
+                self.rejected += 1
+            return 403
+        try:
+            generation = Generation.model_validate(json.loads(body))
+        except ValueError:  # not JSON, or not a Generation (pydantic's ValidationError is a ValueError)
+            with self._lock:
+                self.rejected += 1
+            return 400
+
+        key = (generation.id, generation.state)
+        with self._lock:
+            duplicate = key in self._seen
+            self._seen.add(key)
+            if duplicate:
+                self.duplicates += 1
+            else:
+                self.received += 1
+        if not duplicate and self.on_generation is not None:
+            self.on_generation(generation)
+        return 200
+
+    def _make_handler(self):
+        receiver = self
+
+        class CallbackHandler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def log_message(self, format, *args):
+                pass
+
+            def do_POST(self):
+                length = int(self.headers.get("Content-Length") or 0)
+                if length > MAX_BODY_BYTES:
+                    status = 413
+                    self.close_connection = True
+                else:
+                    status = receiver.handle(self.path, self.rfile.read(length))
+                self.send_response(status)
+                self.send_header("Content-Length", "0")
+                self.end_headers()
+
+        return CallbackHandler
@@ -0,0 +1,121 @@
+import json
+import time
+import difflib
+import threading
+from pathlib import Path
+from email.utils import formatdate
+from luma_client import api_request
+
+# --- Concept Catalogue ---
+# The list of allowed concept keys (orbit_left, orbit_right, zoom_in, ...) is cached on disk.
+#   - validate_concepts() checks a request against the cached list with no network call,
+#     so a typo fails instantly instead of costing a create round trip and a failed job.
+#   - refresh_concepts() revalidates the cache with If-None-Match / If-Modified-Since;
+#     an unchanged list comes back as a cheap 304.
+
+current_script_dir = Path(__file__).resolve().parent
+CONCEPT_CACHE_PATH = current_script_dir / "concept_cache.json"
+CONCEPTS_PATH = "generations/concepts/list"
+CONCEPT_TTL = 24 * 60 * 60  # seconds before the cached list is worth revalidating
+
+_lock = threading.Lock()
+_known = None  # in-memory copy of the cached keys, so validation never touches the disk twice
+
+
+class InvalidConceptError(ValueError):
+    pass
+
+
+def concept_key(concept):
+    # The endpoint returns plain strings today, but accept {"key": ...} objects too
+    if isinstance(concept, dict):
+        return concept.get("key") or concept.get("name")
+    return concept
+
+
+def _read_cache():
+    if not CONCEPT_CACHE_PATH.exists():
+        return None
+    try:
+        return json.loads(CONCEPT_CACHE_PATH.read_text(encoding="utf-8"))
+    except ValueError:
+        print(f"Warning: concept cache at {CONCEPT_CACHE_PATH} is corrupt, ignoring it")
+        return None
+
+
+def _write_cache(cache):
+    temporary = CONCEPT_CACHE_PATH.with_name(CONCEPT_CACHE_PATH.name + ".tmp")
+    temporary.write_text(json.dumps(cache, indent=2), encoding="utf-8")
+    temporary.replace(CONCEPT_CACHE_PATH)
+
+
+def refresh_concepts(force=False, max_age=CONCEPT_TTL):
+    # Make sure the cached list is no older than max_age, revalidating it with the API if needed.
+    # Returns the list of concept keys. If the API can't be reached, a stale cache is still used.
+    global _known
+    cache = _read_cache()
+    if cache and not force and time.time() - cache["fetched_at"] < max_age:
+        with _lock:
+            _known = set(cache["concepts"])
+        return cache["concepts"]
+
+    headers = {}
+    if cache:
+        if cache.get("etag"):
+            headers["If-None-Match"] = cache["etag"]
+        headers["If-Modified-Since"] = cache.get("last_modified") or formatdate(cache["fetched_at"], usegmt=True)
+
+    try:
+        response = api_request("GET", CONCEPTS_PATH, headers=headers)
+        if response.status_code == 304 and cache:
+            # Nothing changed, just restart the TTL
+            cache["fetched_at"] = time.time()
+        else:
+            response.raise_for_status()
+            cache = {
+                "fetched_at": time.time(),
+                "etag": response.headers.get("ETag"),
+                "last_modified": response.headers.get("Last-Modified"),
+                "concepts": sorted(filter(None, (concept_key(concept) for concept in response.json()))),
+            }
+        _write_cache(cache)
+    except Exception as e:
+        if not cache:
+            raise
+        print(f"Warning: could not revalidate concepts ({e}), using cached list from {CONCEPT_CACHE_PATH}")
+
+    with _lock:
+        _known = set(cache["concepts"])
+    return cache["concepts"]
+
+
+def known_concepts():
+    # Cached concept keys, read from disk at most once per process. Never hits the network.
+    # Returns None when there's no cache yet (run list_allowed_concepts.py once to create it).
+    global _known
+    with _lock:
+        if _known is None:
+            cache = _read_cache()
+            if cache is None:
+                return None
+            _known = set(cache["concepts"])
+        return _known
+
+
+def validate_concepts(spec):
+    # Check every concept key in a generation request against the cached catalogue.
+    # Raises InvalidConceptError (with a "did you mean" hint) for unknown keys.
+    concepts = spec.get("concepts") or []
+    if not concepts:
+        return
+    known = known_concepts()
+    if known is None:
+        print("Warning: no concept cache yet, skipping local concept check (run list_allowed_concepts.py)")
+        return
+
+    for concept in concepts:
+        key = concept_key(concept)
+        if key not in known:
+            suggestions = difflib.get_close_matches(str(key), sorted(known), n=3)
+            hint = f" Did you mean: {', '.join(suggestions)}?" if suggestions else ""
+            raise InvalidConceptError(f"Unknown concept '{key}'.{hint}")
@@ -1,36 +1,33 @@
-import os
 import sys
 from pathlib import Path
-from dotenv import load_dotenv
-from lumaai import LumaAI
-import requests 
-import time
+from luma_client import get_client
+from concept_catalog import validate_concepts
+from model_capabilities import validate_request
+from status_poller import wait_for_generation
+from job_ledger import JobLedger
+from generation_timing import TimingTrace
+from asset_download import download_asset
+from output_store import OutputStore
+from generation_cache import GenerationCache
+from batch_generate import restore_cached
 
 # --- Configuration ---
 # 1. Setup Paths
 # We use the current script directory as the base, just like list_allowed_concepts.py
 current_script_dir = Path(__file__).resolve().parent
-output_dir = current_script_dir / "merged_reference_images"
-env_path = current_script_dir / "env" / ".env"
+# Downloads are filed in the indexed output store (outputs/, search it with `python output_store.py find ...`)
+store = OutputStore()
 
-# Ensure output directory exists to save the result
-output_dir.mkdir(parents=True, exist_ok=True)
+# 2. Initialize Client
+# luma_client loads env/.env once and hands back the shared client, so every API call
+# and download in this run reuses the same pooled connections
+client = get_client()
 
-# 2. Load Environment Variables
-# Using the same logic that worked in your reference file
-if env_path.exists():
-    load_dotenv(dotenv_path=env_path)
-else:
-    # Fallback: Just try loading without a path (searches CWD) or print explicit warning
-    print(f"Warning: .env file not found at {env_path}")
-    load_dotenv() 
+# Every submitted generation is written to the local job ledger
+ledger = JobLedger()
 
-# 3. Initialize Client
-api_key = os.getenv("LUMA_API_KEY")
-if not api_key:
-    raise ValueError(f"API Key not found. Checked path: {env_path}")
-
-client = LumaAI(auth_token=api_key)
+# Per-stage timings (create, queued, dreaming, download speed...) are appended to generation_trace.jsonl
+timings = TimingTrace()
 
 
 # 4. Define key details such as the video_prompt, 
@@ -62,70 +59,89 @@ image_prompt = (
 )
 
 
-# 4. Generate the Video
+# 4. Describe the Image
+# The request is kept in one dict so the cache can hash exactly what we send to Luma
+image_spec = dict(
+    # 'photon-flash-1' is the current standard for high-quality images
+    model="photon-flash-1",
+    
+    aspect_ratio="16:9",
+    
+    # image_ref steers the composition, style_ref the look, character_ref keeps the face consistent;
+    # weights run from 0 to 1 (see model_capabilities.py for the limits)
+    image_ref=[
+        {
+            "url": "https://storage.cdn-luma.com/dream_machine/7e4fe07f-1dfd-4921-bc97-4bcf5adea39a/video_0_thumb.jpg",
+            "weight": 0.85
+        }
+    ],
+    
+    style_ref=[
+        {
+            "url": "https://staging.storage.cdn-luma.com/dream_machine/400460d3-cc24-47ae-a015-d4d1c6296aba/38cc78d7-95aa-4e6e-b1ac-4123ce24725e_image0c73fa8a463114bf89e30892a301c532e.jpg",
+            "weight": 0.8
+        }
+    ],
+    
+    character_ref={
+        "identity0": {
+            "images": [
+                "https://staging.storage.cdn-luma.com/dream_machine/400460d3-cc24-47ae-a015-d4d1c6296aba/38cc78d7-95aa-4e6e-b1ac-4123ce24725e_image0c73fa8a463114bf89e30892a301c532e.jpg"
+            ]
+        }
+    },
+    
+    prompt=image_prompt,
+    
+    # no resolution/duration here: those are video settings, photon models don't take them
+    # (see model_capabilities.py for what each model accepts)
+)
+
+# Check the local cache first: an identical request we've already paid for comes straight off disk.
+# Run with --refresh to skip the cache and pay for a brand-new generation.
+refresh_cache = "--refresh" in sys.argv
+cache = GenerationCache()
+cached = None if refresh_cache else cache.lookup(image_spec)
+if cached:
+    # filed through the output store like a fresh download, so `output_store.py find` sees it
+    restored_path = restore_cached(cache, cached, image_spec, ".", store, source="generate_image.py")
+    print(f"Identical request found in cache! ID: {cached['generation_id']}")
+    print(f"File restored as {restored_path}")
+    sys.exit(0)
+
+
+# 4. Generate the Image
+timing = timings.start(image_spec, source="generate_image.py")
 try:
-    generation = client.generations.create(
-        # 'photon-flash-1' is the current standard for high-quality images
-        model="photon-flash-1",
-        
-        aspect_ratio="16:9",
-        
-        # 'loop' forces the start and end to match, creating a perfect orbit
-        # since loop does not support start and end (multiple) keyframes however, we will change it to False for now
-        # it does not support multiple keyframes because loop=True implies start and end frame are the same
-        # remember, we can always loop using CapCut
-        image_ref=[
-            {
-                "url": "https://storage.cdn-luma.com/dream_machine/7e4fe07f-1dfd-4921-bc97-4bcf5adea39a/video_0_thumb.jpg",
-                "weight": 0.85
-            }
-        ],
-        
-        style_ref=[
-            {
-                "url": "https://staging.storage.cdn-luma.com/dream_machine/400460d3-cc24-47ae-a015-d4d1c6296aba/38cc78d7-95aa-4e6e-b1ac-4123ce24725e_image0c73fa8a463114bf89e30892a301c532e.jpg",
-                "weight": 0.8
-            }
-        ],
-        
-        character_ref={
-            "identity0": {
-                "images": [
-                    "https://staging.storage.cdn-luma.com/dream_machine/400460d3-cc24-47ae-a015-d4d1c6296aba/38cc78d7-95aa-4e6e-b1ac-4123ce24725e_image0c73fa8a463114bf89e30892a301c532e.jpg"
-                ]
-            }
-        },
-        
-        prompt=image_prompt,
-        resolution="4k",
-        duration="9s",
-           
-        
-        #the keyframes parameter allows users to enter images to use as reference in video generation, add or omit as needed. 
-         
-    )
+    # check concept keys and the model's capabilities locally first, so a typo or an unsupported
+    # resolution/duration fails here, not at Luma
+    validate_concepts(image_spec)
+    validate_request(image_spec)
+    timing.submitting()
+    # photon models have their own endpoint; generations.create is for video
+    generation = client.generations.image.create(**image_spec)
+    timing.submitted(generation)
     
     print(f"Generation started successfully! ID: {generation.id}")
+    
+    # record the ID straight away so `python resume_jobs.py` can pick this job up if we get killed
+    ledger.record_submitted(generation, image_spec, output_path=f'{generation.id}.jpg', source="generate_image.py")
 
 except Exception as e:
     print(f"An error occurred during generation: {e}")
+    timing.finish(error=str(e))
     sys.exit(1) # Stop the script here so you don't get errors later for trying to check the status of a non-existent generated video
     
 
 # 5. Check the status of the image generation
+# The shared poller picks its check interval from the model/resolution/duration instead of a flat 3 seconds
 try:
-    completed = False
-    while not completed:
-        generation = client.generations.get(id=generation.id)
-        if generation.state == "completed":
-            completed = True
-        elif generation.state == "failed":
-            raise RuntimeError(f"Generation failed: {generation.failure_reason}")
-        print("Generating image...")
-        time.sleep(3)
+    generation = wait_for_generation(client, generation, message="Generating image...", on_state_change=ledger.record_state,
+                                     on_check=timing.observed)
         
 except Exception as e:
     print(f"An error occurred during periodic status checks: {e}")
+    timing.finish(error=str(e))
     sys.exit(1) 
     
     
@@ -134,16 +150,24 @@ except Exception as e:
 image_url = generation.assets.image
 
 try:
-    # download the image
-    response = requests.get(image_url, stream=True)
-    
     # CHANGE: Save with a .jpg extension instead of .mp4
-    # You can also use os.path.join(output_dir, ...) if you want to use the folder created in Step 1
     filename = f'{generation.id}.jpg'
     
-    with open(filename, 'wb') as file:
-        file.write(response.content)
-    print(f"File downloaded as {filename}")
+    # stream the image to disk in chunks, resuming if the connection drops
+    timing.downloading()
+    download_asset(image_url, filename)
+    timing.downloaded(filename)
+
+    # file it in the output store: content-hashed, with a sidecar recording how it was made
+    saved_path = store.add(filename, generation.id, image_spec, source="generate_image.py",
+                           timings=timing.stages(), asset_url=image_url)
+    print(f"File saved as {saved_path}")
+    ledger.record_download(generation.id, saved_path)
+    
+    # remember this request so an identical re-run doesn't pay for it again
+    cache.store(image_spec, generation.id, image_url, saved_path)
+    timing.finish()
     
 except Exception as e:
-    print(f"An error occurred during the download process: {e}")
\ No newline at end of file
+    print(f"An error occurred during the download process: {e}")
+    timing.finish(error=str(e))
\ No newline at end of file
@@ -1,36 +1,34 @@
-import os
 import sys
 from pathlib import Path
-from dotenv import load_dotenv
-from lumaai import LumaAI
-import requests 
-import time
+from luma_client import get_client
+from concept_catalog import validate_concepts
+from model_capabilities import validate_request
+from status_poller import wait_for_generation
+from job_ledger import JobLedger
+from generation_timing import TimingTrace
+from asset_download import download_asset_parallel
+from output_store import OutputStore
+from generation_cache import GenerationCache
+from batch_generate import draft_spec, request_params, restore_cached
+from hedged_generation import hedged_generate, load_scorer
 
 # --- Configuration ---
 # 1. Setup Paths
 # We use the current script directory as the base, just like list_allowed_concepts.py
 current_script_dir = Path(__file__).resolve().parent
-output_dir = current_script_dir / "merged_reference_images"
-env_path = current_script_dir / "env" / ".env"
+# Downloads are filed in the indexed output store (outputs/, search it with `python output_store.py find ...`)
+store = OutputStore()
 
-# Ensure output directory exists to save the result
-output_dir.mkdir(parents=True, exist_ok=True)
+# 2. Initialize Client
+# luma_client loads env/.env once and hands back the shared client, so every API call
+# and download in this run reuses the same pooled connections
+client = get_client()
 
-# 2. Load Environment Variables
-# Using the same logic that worked in your reference file
-if env_path.exists():
-    load_dotenv(dotenv_path=env_path)
-else:
-    # Fallback: Just try loading without a path (searches CWD) or print explicit warning
-    print(f"Warning: .env file not found at {env_path}")
-    load_dotenv() 
+# Every submitted generation is written to the local job ledger
+ledger = JobLedger()
 
-# 3. Initialize Client
-api_key = os.getenv("LUMA_API_KEY")
-if not api_key:
-    raise ValueError(f"API Key not found. Checked path: {env_path}")
-
-client = LumaAI(auth_token=api_key)
+# Per-stage timings (create, queued, dreaming, download speed...) are appended to generation_trace.jsonl
+timings = TimingTrace()
 
 
 # 4. Define key details such as the video_prompt, 
@@ -61,50 +59,100 @@ video_prompt = (
     "Massive ocean leviathan obliterates a warship in the frozen North Sea."
 )
 
+# Alternative phrasings of the prompt, used for the extra variants when running with --hedge
+video_prompt_variants = [
+    # "A colossal sea monster tears a warship apart in icy North Sea waters.",
+]
+
+
+# 4. Describe the Video
+# The request is kept in one dict so the cache can hash exactly what we send to Luma
+video_spec = dict(
+    # 'ray-2' is the current standard for high-quality video
+    model="ray-2",
+    
+    aspect_ratio="16:9",
+    
+    # 'loop' forces the start and end to match, creating a perfect orbit
+    # since loop does not support start and end (multiple) keyframes however, we will change it to False for now
+    # it does not support multiple keyframes because loop=True implies start and end frame are the same
+    # remember, we can always loop using CapCut, or cut a seamless loop out of the clip with loop_cut.py
+    loop=False, 
+    prompt=video_prompt,
+    resolution="4k",
+    duration="9s",
+       
+    
+    #the keyframes parameter allows users to enter images to use as reference in video generation, add or omit as needed. 
+     
+)
+
+# Run with --draft to try the prompt at the cheap tier (ray-flash-2, 540p, 5s) first.
+# If the draft looks right, `python promote_draft.py <draft id>` renders it with the settings above.
+if "--draft" in sys.argv:
+    video_spec = draft_spec(video_spec)
+
+# Check the local cache first: an identical request we've already paid for comes straight off disk.
+# Run with --refresh to skip the cache and pay for a brand-new generation.
+refresh_cache = "--refresh" in sys.argv
+cache = GenerationCache()
+cached = None if refresh_cache else cache.lookup(video_spec)
+if cached:
+    # filed through the output store like a fresh download, so `output_store.py find` sees it
+    restored_path = restore_cached(cache, cached, video_spec, ".", store, source="generate_video.py")
+    print(f"Identical request found in cache! ID: {cached['generation_id']}")
+    print(f"File restored as {restored_path}")
+    sys.exit(0)
+
+
+# Run with --hedge K to submit K variants at once and keep whichever finishes first; the rest are
+# cancelled at Luma. Add --scorer module:function to only accept a variant that passes a local check.
+if "--hedge" in sys.argv:
+    try:
+        scorer = load_scorer(sys.argv[sys.argv.index("--scorer") + 1]) if "--scorer" in sys.argv else None
+        generation, path, variant_spec = hedged_generate(
+            client, video_spec, int(sys.argv[sys.argv.index("--hedge") + 1]), phrasings=video_prompt_variants,
+            scorer=scorer, ledger=ledger, timings=timings, source="generate_video.py", store=store,
+        )
+    except Exception as e:
+        print(f"An error occurred during hedged generation: {e}")
+        sys.exit(1)
+    print(f"File saved as {path}")
+    cache.store(variant_spec, generation.id, generation.assets.video, path)
+    sys.exit(0)
+
 
 # 4. Generate the Video
+timing = timings.start(video_spec, source="generate_video.py")
 try:
-    generation = client.generations.create(
-        # 'ray-2' is the current standard for high-quality video
-        model="ray-2",
-        
-        aspect_ratio="16:9",
-        
-        # 'loop' forces the start and end to match, creating a perfect orbit
-        # since loop does not support start and end (multiple) keyframes however, we will change it to False for now
-        # it does not support multiple keyframes because loop=True implies start and end frame are the same
-        # remember, we can always loop using CapCut
-        loop=False, 
-        prompt=video_prompt,
-        resolution="4k",
-        duration="9s",
-           
-        
-        #the keyframes parameter allows users to enter images to use as reference in video generation, add or omit as needed. 
-         
-    )
+    # check concept keys and the model's capabilities locally first, so a typo or an unsupported
+    # resolution/duration fails here, not at Luma
+    validate_concepts(video_spec)
+    validate_request(request_params(video_spec))
+    timing.submitting()
+    generation = client.generations.create(**request_params(video_spec))
+    timing.submitted(generation)
     
     print(f"Generation started successfully! ID: {generation.id}")
+    
+    # record the ID straight away so `python resume_jobs.py` can pick this job up if we get killed
+    ledger.record_submitted(generation, video_spec, output_path=f'{generation.id}.mp4', source="generate_video.py")
 
 except Exception as e:
     print(f"An error occurred during generation: {e}")
+    timing.finish(error=str(e))
     sys.exit(1) # Stop the script here so you don't get errors later for trying to check the status of a non-existent generated video
     
 
 # 5. Check the status of the video generation
+# The shared poller picks its check interval from the model/resolution/duration instead of a flat 3 seconds
 try:
-    completed = False
-    while not completed:
-        generation = client.generations.get(id=generation.id)
-        if generation.state == "completed":
-            completed = True
-        elif generation.state == "failed":
-            raise RuntimeError(f"Generation failed: {generation.failure_reason}")
-        print("Dreaming")
-        time.sleep(3)
+    generation = wait_for_generation(client, generation, message="Dreaming", on_state_change=ledger.record_state,
+                                     on_check=timing.observed)
         
 except Exception as e:
     print(f"An error occurred during periodic status checks: {e}")
+    timing.finish(error=str(e))
     sys.exit(1) # Stop the script here so you don't get errors later for trying to download a non-existent generated video
     
     
@@ -112,14 +160,24 @@ except Exception as e:
 video_url = generation.assets.video
 
 try:
-    # download the video
-    response = requests.get(video_url, stream=True)
-    with open(f'{generation.id}.mp4', 'wb') as file:
-        file.write(response.content)
-    print(f"File downloaded as {generation.id}.mp4")
+    # fetch the video over several ranged connections at once (falls back to a single resumable stream)
+    timing.downloading()
+    download_asset_parallel(video_url, f'{generation.id}.mp4')
+    timing.downloaded(f'{generation.id}.mp4')
+
+    # file it in the output store: content-hashed, with a sidecar recording how it was made
+    saved_path = store.add(f'{generation.id}.mp4', generation.id, video_spec, source="generate_video.py",
+                           timings=timing.stages(), asset_url=video_url)
+    print(f"File saved as {saved_path}")
+    ledger.record_download(generation.id, saved_path)
+    
+    # remember this request so an identical re-run doesn't pay for it again
+    cache.store(video_spec, generation.id, video_url, saved_path)
+    timing.finish()
     
 except Exception as e:
     print(f"An error occurred during the download process: {e}")
+    timing.finish(error=str(e))
     
 
     
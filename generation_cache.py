@@ -0,0 +1,136 @@
+import os
+import json
+import time
+import shutil
+import hashlib
+import threading
+from pathlib import Path
+
+# --- Generation Cache ---
+# Re-running a script with the exact same prompt/model/aspect_ratio/resolution/duration/concepts/keyframes
+# used to pay for a brand-new generation. Now the full request is hashed and, if we've seen it before,
+# the file we already downloaded is handed back straight from disk.
+#
+#   generation_cache/
+#       index.json            key -> generation id, asset url, media file, size, last used
+#       media/<key>.mp4       our own copy (hard link where possible) of every cached asset
+
+current_script_dir = Path(__file__).resolve().parent
+DEFAULT_CACHE_DIR = current_script_dir / "generation_cache"
+DEFAULT_MAX_BYTES = 20 * 1024 ** 3  # 20 GB of media before the least recently used entries are evicted
+
+# Keys that are bookkeeping for our scripts, not part of what Luma renders
+IGNORED_SPEC_KEYS = ("name", "callback_url", "final_spec", "draft_of")
+
+
+def spec_key(spec):
+    # Canonical hash of a request: drop our bookkeeping keys, sort every dict, no whitespace.
+    # Two specs that would produce the same API call always hash the same.
+    request = {key: value for key, value in spec.items() if key not in IGNORED_SPEC_KEYS and value is not None}
+    canonical = json.dumps(request, sort_keys=True, separators=(",", ":"), ensure_ascii=False)
+    return hashlib.sha256(canonical.encode("utf-8")).hexdigest()
+
+
+def _link_or_copy(source, destination):
+    # Hard links cost no extra disk space; fall back to a copy across filesystems
+    destination = Path(destination)
+    destination.parent.mkdir(parents=True, exist_ok=True)
+    temporary = destination.with_name(destination.name + ".tmp")
+    if temporary.exists():
+        temporary.unlink()
+    try:
+        os.link(source, temporary)
+    except OSError:
+        shutil.copy2(source, temporary)
+    os.replace(temporary, destination)
+    return destination
+
+
+class GenerationCache:
+
+    def __init__(self, cache_dir=DEFAULT_CACHE_DIR, max_bytes=DEFAULT_MAX_BYTES):
+        self.cache_dir = Path(cache_dir)
+        self.media_dir = self.cache_dir / "media"
+        self.index_path = self.cache_dir / "index.json"
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+
+        self.media_dir.mkdir(parents=True, exist_ok=True)
+        self._index = self._load_index()
+
+    def _load_index(self):
+        if not self.index_path.exists():
+            return {}
+        try:
+            return json.loads(self.index_path.read_text(encoding="utf-8"))
+        except ValueError:
+            print(f"Warning: generation cache index at {self.index_path} is corrupt, starting empty")
+            return {}
+
+    def _save_index(self):
+        # Write to a temp file and rename, so a crash never leaves half an index behind
+        temporary = self.index_path.with_name(self.index_path.name + ".tmp")
+        temporary.write_text(json.dumps(self._index, indent=2), encoding="utf-8")
+        os.replace(temporary, self.index_path)
+
+    def lookup(self, spec):
+        # Return the cached entry for this spec (with its media path), or None on a miss
+        key = spec_key(spec)
+        with self._lock:
+            entry = self._index.get(key)
+            if entry is None:
+                return None
+            if not (self.cache_dir / entry["media"]).exists():
+                # Someone deleted the media by hand, forget about it
+                del self._index[key]
+                self._save_index()
+                return None
+            entry["last_used"] = time.time()
+            self._save_index()
+            return dict(entry, key=key, path=str(self.cache_dir / entry["media"]))
+
+    def store(self, spec, generation_id, asset_url, asset_path):
+        # Remember the finished generation for this spec and keep our own copy of its asset
+        key = spec_key(spec)
+        asset_path = Path(asset_path)
+        media_name = f"media/{key}{asset_path.suffix}"
+        _link_or_copy(asset_path, self.cache_dir / media_name)
+
+        with self._lock:
+            self._index[key] = {
+                "generation_id": generation_id,
+                "asset_url": asset_url,
+                "media": media_name,
+                "size": asset_path.stat().st_size,
+                "created": time.time(),
+                "last_used": time.time(),
+            }
+            self._evict()
+            self._save_index()
+        return key
+
+    def restore(self, entry, destination):
+        # Put a cached asset where the caller expected its download to land
+        return _link_or_copy(entry["path"], destination)
+
+    def invalidate(self, spec):
+        key = spec_key(spec)
+        with self._lock:
+            entry = self._index.pop(key, None)
+            if entry is not None:
+                (self.cache_dir / entry["media"]).unlink(missing_ok=True)
+                self._save_index()
+
+    def total_bytes(self):
+        return sum(entry["size"] for entry in self._index.values())
+
+    def _evict(self):
+        # Size-based LRU: drop the least recently used media until we're under max_bytes
+        total = self.total_bytes()
+        for key, entry in sorted(self._index.items(), key=lambda item: item[1]["last_used"]):
+            if total <= self.max_bytes:
+                break
+            (self.cache_dir / entry["media"]).unlink(missing_ok=True)
+            del self._index[key]
+            total -= entry["size"]
+            print(f"Cache: evicted {entry['generation_id']} ({entry['size'] / 1e6:.1f} MB)")
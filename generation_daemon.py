@@ -0,0 +1,568 @@
+import os
+import sys
+import json
+import time
+import uuid
+import signal
+import secrets
+import argparse
+import threading
+from pathlib import Path
+from collections import deque, OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import urlsplit, parse_qs
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+from luma_client import get_client
+from concept_catalog import refresh_concepts
+from status_poller import StatusPoller, log_poll_error
+from batch_generate import (submit_generation, download_job, draft_spec, is_image_spec, default_output_dir,
+                            check_manifest, restore_cached)
+from generation_cache import GenerationCache
+from job_ledger import JobLedger
+from generation_timing import TimingTrace, serve_metrics, DEFAULT_TRACE_PATH
+from reference_images import get_reference_images
+from callback_receiver import CallbackReceiver
+from output_store import OutputStore
+from hedged_generation import cancel_generation
+from submit_job import DAEMON_FILE, DEFAULT_PORT
+
+# --- Generation Daemon ---
+# Every script run pays for Python startup, the lumaai/requests/dotenv imports, .env parsing and
+# fresh TLS sessions before it sends a single request. The daemon pays that once and stays up:
+# one warm client (pooled connections), one StatusPoller watching every job, one download pool,
+# and the ledger, cache, output store and timing trace the scripts use.
+#
+# Jobs are the same specs the scripts and manifests build (create kwargs plus an optional name),
+# POSTed as JSON to a localhost HTTP server. The reply comes straight back with job IDs, before
+# anything is sent to Luma; with ?wait=1 the connection instead streams the jobs' progress as
+# JSON lines (waiting, queued, dreaming, downloading, then completed/cached/failed/cancelled).
+#
+#   POST   /jobs[?wait=1][&draft=1]   a spec or a list of specs (422 if any breaks model_capabilities.py)
+#   GET    /jobs                      recent jobs
+#   GET    /jobs/<id>                 one job and every event so far
+#   GET    /jobs/<id>/events          stream its events until it finishes
+#   DELETE /jobs/<id>                 cancel (dropped if still waiting, deleted at Luma if rendering;
+#                                     202 if its create call is in flight: deleted as soon as it returns)
+#   GET    /status
+#
+# It only listens on 127.0.0.1, and every request must carry the X-Daemon-Token from daemon.json
+# (written on startup, readable only by its owner), since a job spends credits.
+#
+#   python generation_daemon.py --concurrency 8
+#   python submit_job.py shot.json --wait          # see submit_job.py
+
+SOURCE = "generation_daemon.py"
+FINISHED_STATES = ("completed", "cached", "failed", "cancelled")
+KEEP_FINISHED_JOBS = 1000  # finished jobs kept around for /jobs and /jobs/<id>
+MAX_BODY_BYTES = 4 * 1024 * 1024
+
+
+class Job:
+
+    def __init__(self, spec):
+        self.id = uuid.uuid4().hex[:12]
+        self.spec = dict(spec, name=spec.get("name") or self.id)
+        self.name = self.spec["name"]
+        # waiting (for a concurrency slot), queued/dreaming (at Luma), downloading, then one of FINISHED_STATES
+        self.state = "waiting"
+        self.generation_id = None
+        self.path = None
+        self.error = None
+        self.timing = None
+        self.events = []
+        self.holds_slot = False  # counted in the daemon's in-flight jobs until _release_slot
+        self.cancel_requested = False  # cancelled while its create call was in flight
+
+    def summary(self):
+        return {
+            "id": self.id,
+            "name": self.name,
+            "state": self.state,
+            "generation_id": self.generation_id,
+            "path": self.path,
+            "error": self.error,
+        }
+
+
+class GenerationDaemon:
+
+    def __init__(self, client, output_dir=default_output_dir, max_concurrency=4, download_workers=4, cache=None,
+                 ledger=None, timings=None, references=None, store=None, callbacks=None):
+        self.client = client
+        self.output_dir = Path(output_dir)
+        self.output_dir.mkdir(parents=True, exist_ok=True)
+        self.max_concurrency = max_concurrency
+        self.cache = cache
+        self.ledger = ledger
+        self.timings = timings
+        self.references = references
+        self.store = store
+        self.started = time.monotonic()
+
+        self.poller = StatusPoller(
+            client,
+            on_state_change=self._state_changed,
+            on_error=log_poll_error,
+            on_check=timings.observe if timings is not None else None,
+            sweep_interval=callbacks.sweep_interval if callbacks is not None else None,
+        )
+        self.callbacks = callbacks
+        if callbacks is not None:
+            callbacks.on_generation = self.poller.push
+
+        self.jobs = OrderedDict()
+        self._by_generation = {}
+        self._waiting = deque()
+        self._in_flight = 0
+        self._closed = False
+        # One lock for all job state; _changed wakes event streams, _slot_free the submitter
+        self._lock = threading.RLock()
+        self._changed = threading.Condition(self._lock)
+        self._slot_free = threading.Condition(self._lock)
+        self._downloads = ThreadPoolExecutor(max_workers=download_workers)
+        self._threads = [
+            threading.Thread(target=self._submit_loop, daemon=True),
+            threading.Thread(target=self._poll_loop, daemon=True),
+        ]
+        for thread in self._threads:
+            thread.start()
+
+    def close(self):
+        with self._lock:
+            self._closed = True
+            self._slot_free.notify_all()
+            self._changed.notify_all()
+        self.poller.close()
+        self._downloads.shutdown(wait=True)
+        if self.callbacks is not None:
+            self.callbacks.close()
+
+    # --- Jobs in ---
+
+    def submit(self, spec, draft=False):
+        # Queue a spec and return its Job straight away; a slot, the API call and the rest follow
+        job = Job(draft_spec(spec) if draft else spec)
+        with self._lock:
+            self.jobs[job.id] = job
+            self._waiting.append(job)
+            self._event(job)
+            self._forget_old_jobs()
+            self._slot_free.notify()
+        return job
+
+    def cancel(self, job_id):
+        # Returns the job (in its new state), or None if there's no such job
+        with self._lock:
+            job = self.jobs.get(job_id)
+            if job is None or job.state in FINISHED_STATES or job.state == "downloading":
+                return job
+            if job in self._waiting:
+                self._waiting.remove(job)
+                self._finish(job, "cancelled")
+                return job
+            generation_id = job.generation_id
+            if generation_id is None:
+                # Being submitted right now: _start deletes it at Luma as soon as it has an ID
+                job.cancel_requested = True
+                return job
+            # Claimed here, so the poll loop won't also release its slot if it finishes meanwhile
+            if self._by_generation.pop(generation_id, None) is None:
+                return job
+        self._release_slot(job)
+        try:
+            cancel_generation(self.client, generation_id, poller=self.poller, ledger=self.ledger)
+        except Exception as e:
+            # No longer watched either way; whatever Luma does with it now isn't this job's
+            self._finish(job, "failed", error=f"Cancel failed: {e}")
+            raise
+        self._finish(job, "cancelled")
+        return job
+
+    def _submit_loop(self):
+        # Keep up to max_concurrency jobs at Luma, like run_batch; the rest wait here
+        while True:
+            with self._lock:
+                while not self._closed and not (self._waiting and self._in_flight < self.max_concurrency):
+                    self._slot_free.wait()
+                if self._closed:
+                    return
+                job = self._waiting.popleft()
+                self._in_flight += 1
+                job.holds_slot = True
+            try:
+                self._start(job)
+            except Exception as e:
+                # Whatever went wrong, it's this job's problem: keep the loop alive and give its slot back.
+                # A generation it already created stays in the ledger, so resume_jobs.py can still fetch it.
+                print(f"[{job.name}] Unexpected error starting the job: {e}")
+                with self._lock:
+                    watched = self._by_generation.get(job.generation_id) is job
+                    if watched:
+                        del self._by_generation[job.generation_id]
+                if watched:
+                    self.poller.remove(job.generation_id)
+                self._release_slot(job)
+                self._finish(job, "failed", error=f"Unexpected error: {e}")
+
+    def _start(self, job):
+        spec = job.spec
+        job.timing = self.timings.start(spec, source=SOURCE) if self.timings is not None else None
+        if job.cancel_requested:
+            self._release_slot(job)
+            self._finish(job, "cancelled")
+            return
+        try:
+            if self.references is not None:
+                spec = job.spec = self.references.resolve_spec(spec)
+            cached = self.cache.lookup(spec) if self.cache is not None else None
+            if cached:
+                job.generation_id = cached["generation_id"]
+                job.path = str(restore_cached(self.cache, cached, spec, self.output_dir, self.store, source=SOURCE))
+                job.timing = None  # nothing was generated, so nothing to time
+                self._release_slot(job)
+                self._finish(job, "cached")
+                return
+
+            if self.callbacks is not None:
+                spec = dict(spec, callback_url=self.callbacks.url)
+            generation = submit_generation(self.client, spec, job.timing)
+        except Exception as e:
+            self._release_slot(job)
+            self._finish(job, "failed", error=str(e))
+            return
+
+        if self.ledger is not None:
+            extension = "jpg" if is_image_spec(spec) else "mp4"
+            try:
+                self.ledger.record_submitted(generation, spec,
+                                             output_path=self.output_dir / f"{generation.id}.{extension}", source=SOURCE)
+            except Exception as e:
+                # The generation exists and is being paid for either way, so keep watching it
+                print(f"[{job.name}] Warning: could not record {generation.id} in the job ledger ({e})")
+        with self._lock:
+            job.generation_id = generation.id
+            cancelled = job.cancel_requested
+            if not cancelled:
+                self._by_generation[generation.id] = job
+                job.state = generation.state or "queued"
+                self._event(job)
+        if cancelled:
+            self._release_slot(job)
+            try:
+                cancel_generation(self.client, generation.id, ledger=self.ledger)
+            except Exception as e:
+                self._finish(job, "failed", error=f"Cancel failed: {e}")
+                return
+            self._finish(job, "cancelled")
+            return
+        self.poller.add(generation)
+
+    # --- Jobs out ---
+
+    def _poll_loop(self):
+        for generation in self.poller.as_completed(idle_wait=True):
+            with self._lock:
+                job = self._by_generation.pop(generation.id, None)
+            if job is None:
+                continue
+            self._release_slot(job)
+            if generation.state == "failed":
+                self._finish(job, "failed", error=f"Generation failed: {generation.failure_reason}")
+                continue
+            self._set_state(job, "downloading")
+            self._downloads.submit(self._download, generation, job)
+
+    def _download(self, generation, job):
+        try:
+            job.path = str(download_job(generation, job.spec, {}, self.output_dir, self.cache, self.ledger, job.timing,
+                                        self.store, source=SOURCE))
+        except Exception as e:
+            self._finish(job, "failed", error=f"Download failed: {e}")
+            return
+        self._finish(job, "completed")
+
+    def _state_changed(self, generation):
+        if self.ledger is not None:
+            self.ledger.record_state(generation)
+        with self._lock:
+            job = self._by_generation.get(generation.id)
+        if job is not None and generation.state not in ("completed", "failed"):
+            self._set_state(job, generation.state)
+
+    def _release_slot(self, job):
+        # Only the first call for a job counts, whichever path (done, failed, cancelled) gets there first
+        with self._lock:
+            if not job.holds_slot:
+                return
+            job.holds_slot = False
+            self._in_flight -= 1
+            self._slot_free.notify()
+
+    def _set_state(self, job, state):
+        with self._lock:
+            if job.state not in FINISHED_STATES:
+                job.state = state
+                self._event(job)
+
+    def _finish(self, job, state, error=None):
+        with self._lock:
+            if job.state in FINISHED_STATES:
+                return
+            job.state = state
+            job.error = error
+            self._event(job)
+        print(f"[{job.name}] {state} {error or job.path or ''}".rstrip())
+        if job.timing is not None:
+            job.timing.finish(error=error if state != "cancelled" else "cancelled")
+
+    # --- Progress ---
+
+    def _event(self, job):
+        # Lock held
+        event = dict(job.summary(), job=job.id, time=round(time.time(), 3))
+        del event["id"]
+        job.events.append(event)
+        self._changed.notify_all()
+
+    def _forget_old_jobs(self):
+        # Lock held
+        finished = [job_id for job_id, job in self.jobs.items() if job.state in FINISHED_STATES]
+        for job_id in finished[:max(0, len(finished) - KEEP_FINISHED_JOBS)]:
+            del self.jobs[job_id]
+
+    def stream(self, jobs):
+        # Yield every event of these jobs, past and future, until they've all finished
+        sent = {job.id: 0 for job in jobs}
+        while True:
+            with self._lock:
+                while not self._closed and all(
+                        sent[job.id] == len(job.events) for job in jobs) and not self._all_finished(jobs):
+                    self._changed.wait()
+                new = []
+                for job in jobs:
+                    new.extend(job.events[sent[job.id]:])
+                    sent[job.id] = len(job.events)
+                done = self._closed or self._all_finished(jobs)
+            new.sort(key=lambda event: event["time"])
+            yield from new
+            if done:
+                return
+
+    def _all_finished(self, jobs):
+        return all(job.state in FINISHED_STATES for job in jobs)
+
+    def status(self):
+        with self._lock:
+            states = {}
+            for job in self.jobs.values():
+                states[job.state] = states.get(job.state, 0) + 1
+            return {
+                "uptime": round(time.monotonic() - self.started, 1),
+                "in_flight": self._in_flight,
+                "waiting": len(self._waiting),
+                "max_concurrency": self.max_concurrency,
+                "jobs": states,
+                "status_requests": {"get": self.poller.get_requests, "list": self.poller.list_requests},
+            }
+
+
+def make_handler(daemon, token):
+
+    class DaemonHandler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+
+        def log_message(self, format, *args):
+            pass
+
+        def send_json(self, status, body):
+            data = json.dumps(body).encode("utf-8")
+            self.send_response(status)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(data)))
+            self.end_headers()
+            self.wfile.write(data)
+
+        def send_stream(self, jobs):
+            # Newline-delimited JSON, one event per line, written as it happens
+            self.send_response(200)
+            self.send_header("Content-Type", "application/x-ndjson")
+            self.send_header("Connection", "close")
+            self.end_headers()
+            self.close_connection = True
+            try:
+                for event in daemon.stream(jobs):
+                    self.wfile.write(json.dumps(event).encode("utf-8") + b"\n")
+                    self.wfile.flush()
+            except (BrokenPipeError, ConnectionResetError):
+                pass  # the client stopped listening; its jobs carry on
+
+        def route(self):
+            # (path parts, query) if the request is allowed, else None with the error already sent
+            presented = self.headers.get("X-Daemon-Token", "").encode("utf-8")
+            if not secrets.compare_digest(presented, token.encode("utf-8")):
+                self.send_json(401, {"error": "missing or wrong X-Daemon-Token"})
+                return None, None
+            url = urlsplit(self.path)
+            return [part for part in url.path.split("/") if part], parse_qs(url.query)
+
+        def job_or_404(self, job_id):
+            job = daemon.jobs.get(job_id)
+            if job is None:
+                self.send_json(404, {"error": f"no job {job_id}"})
+            return job
+
+        def do_GET(self):
+            parts, _ = self.route()
+            if parts is None:
+                return
+            if parts == ["status"]:
+                self.send_json(200, daemon.status())
+            elif parts == ["jobs"]:
+                self.send_json(200, {"jobs": [job.summary() for job in list(daemon.jobs.values())]})
+            elif len(parts) == 2 and parts[0] == "jobs":
+                job = self.job_or_404(parts[1])
+                if job is not None:
+                    self.send_json(200, dict(job.summary(), spec=job.spec, events=list(job.events)))
+            elif len(parts) == 3 and parts[0] == "jobs" and parts[2] == "events":
+                job = self.job_or_404(parts[1])
+                if job is not None:
+                    self.send_stream([job])
+            else:
+                self.send_json(404, {"error": "not found"})
+
+        def do_POST(self):
+            parts, query = self.route()
+            if parts is None:
+                return
+            if parts != ["jobs"]:
+                self.send_json(404, {"error": "not found"})
+                return
+            length = int(self.headers.get("Content-Length") or 0)
+            if length > MAX_BODY_BYTES:
+                self.close_connection = True
+                self.send_json(413, {"error": "request too large"})
+                return
+            try:
+                specs = json.loads(self.rfile.read(length))
+            except ValueError as e:
+                self.send_json(400, {"error": f"not JSON: {e}"})
+                return
+            specs = specs if isinstance(specs, list) else [specs]
+            if not specs or not all(isinstance(spec, dict) for spec in specs):
+                self.send_json(400, {"error": "expected a spec object or a list of them"})
+                return
+
+            draft = query.get("draft", ["0"])[0] not in ("0", "")
+            # All or nothing: one bad spec in a list rejects the lot, before anything is queued
+            invalid, _ = check_manifest(draft_spec(spec) if draft else spec for spec in specs)
+            if invalid:
+                self.send_json(422, {"error": "invalid specs", "invalid": [
+                    {"name": name, "problems": problems} for name, problems in invalid]})
+                return
+            jobs = [daemon.submit(spec, draft=draft) for spec in specs]
+            if query.get("wait", ["0"])[0] not in ("0", ""):
+                self.send_stream(jobs)
+            else:
+                self.send_json(202, {"jobs": [job.summary() for job in jobs]})
+
+        def do_DELETE(self):
+            parts, _ = self.route()
+            if parts is None:
+                return
+            if len(parts) != 2 or parts[0] != "jobs":
+                self.send_json(404, {"error": "not found"})
+                return
+            if self.job_or_404(parts[1]) is None:
+                return
+            try:
+                job = daemon.cancel(parts[1])
+            except Exception as e:
+                self.send_json(502, {"error": f"could not cancel at Luma: {e}"})
+                return
+            # 202: still being submitted, and deleted at Luma the moment the create call returns
+            pending = job.cancel_requested and job.state not in FINISHED_STATES
+            self.send_json(202 if pending else 200, job.summary())
+
+    return DaemonHandler
+
+
+def write_daemon_file(port, token, daemon_file=DAEMON_FILE):
+    # Created readable by its owner only: the token is what lets a process spend credits
+    descriptor = os.open(daemon_file, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600)
+    with os.fdopen(descriptor, "w", encoding="utf-8") as file:
+        json.dump({"port": port, "token": token, "pid": os.getpid()}, file)
+
+
+def stop(signum, frame):
+    raise KeyboardInterrupt
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Run a resident generation daemon that accepts jobs on localhost.")
+    parser.add_argument("--port", type=int, default=DEFAULT_PORT, help="Local port to listen on (0: any free port)")
+    parser.add_argument("--concurrency", type=int, default=4, help="Maximum number of jobs in flight at Luma")
+    parser.add_argument("--download-workers", type=int, default=4, help="Parallel downloads of finished assets")
+    parser.add_argument("--output-dir", default=str(default_output_dir),
+                        help="Where assets are downloaded to (and left, with --no-store)")
+    parser.add_argument("--no-store", action="store_true", help="Leave downloads in --output-dir instead of the output store")
+    parser.add_argument("--no-cache", action="store_true", help="Don't read or write the generation cache")
+    parser.add_argument("--callbacks", action="store_true",
+                        help="Have Luma call us back on completion instead of polling (slow safety-net polling only)")
+    parser.add_argument("--callback-port", type=int, default=0, help="Local port for the callback receiver")
+    parser.add_argument("--callback-url", help="Public URL forwarding to the receiver (default: LUMA_CALLBACK_URL)")
+    parser.add_argument("--trace", default=str(DEFAULT_TRACE_PATH), help="JSONL file per-stage timings are appended to")
+    parser.add_argument("--metrics-port", type=int, help="Serve Prometheus timing metrics on this port")
+    args = parser.parse_args()
+
+    client = get_client()
+    try:
+        refresh_concepts()
+    except Exception as e:
+        print(f"Warning: could not load the concept catalogue ({e})")
+
+    timings = TimingTrace(args.trace)
+    if args.metrics_port:
+        serve_metrics(timings, args.metrics_port)
+    callbacks = None
+    if args.callbacks:
+        callbacks = CallbackReceiver(port=args.callback_port, public_url=args.callback_url)
+        print(f"Receiving completion callbacks on port {callbacks.port}")
+
+    daemon = GenerationDaemon(
+        client,
+        args.output_dir,
+        max_concurrency=args.concurrency,
+        download_workers=args.download_workers,
+        cache=None if args.no_cache else GenerationCache(),
+        ledger=JobLedger(),
+        timings=timings,
+        references=get_reference_images(),
+        store=None if args.no_store else OutputStore(),
+        callbacks=callbacks,
+    )
+
+    token = secrets.token_urlsafe(24)
+    try:
+        server = ThreadingHTTPServer(("127.0.0.1", args.port), make_handler(daemon, token))
+    except OSError as e:
+        print(f"Error: can't listen on port {args.port} ({e}); is another daemon running?")
+        sys.exit(1)
+    server.daemon_threads = True
+    port = server.server_address[1]
+    write_daemon_file(port, token)
+    print(f"Generation daemon listening on http://127.0.0.1:{port} (token in {DAEMON_FILE})")
+
+    # kill / systemctl stop shut down as cleanly as Ctrl+C
+    signal.signal(signal.SIGTERM, stop)
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        print("Shutting down, waiting for downloads in progress...")
+    finally:
+        server.server_close()
+        DAEMON_FILE.unlink(missing_ok=True)
+        daemon.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,282 @@
+import os
+import sys
+import json
+import time
+import argparse
+import threading
+import statistics
+from pathlib import Path
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+from status_poller import TERMINAL_STATES, describe_generation
+
+# --- Per-stage Generation Timings ---
+# Every generation is timed stage by stage, so we can tell whether wall-clock time goes to
+# Luma's queue, to our polling, or to our downloads:
+#   build          spec pulled / built -> create call sent (cache lookup, concept check)
+#   create         the create call's round trip
+#   queued         create returned -> first status check that saw "dreaming"
+#   dreaming       first "dreaming" check -> the check that saw it finish
+#   render         create returned -> finish detected (queued + dreaming, always known)
+#   detection_lag  last check that saw it unfinished -> the check that saw it finished.
+#                  Luma finished somewhere in between, so this is the most our polling added.
+#   download       download time, plus download_bytes / download_bytes_per_sec
+#   total          spec built -> asset on disk (or failure)
+# queued/dreaming come from our own status checks, so they're as precise as the poll schedule.
+#
+# Finished timings are appended to generation_trace.jsonl (one JSON object per generation) and
+# aggregated into Prometheus histograms, optionally served over HTTP (serve_metrics).
+# Summarise a trace by model and resolution with:
+#   python generation_timing.py [generation_trace.jsonl]
+
+current_script_dir = Path(__file__).resolve().parent
+DEFAULT_TRACE_PATH = current_script_dir / "generation_trace.jsonl"
+
+HISTOGRAM_BUCKETS = (0.1, 0.5, 1, 2, 5, 10, 30, 60, 120, 300, 600, 1800)
+
+
+class GenerationTiming:
+    # Timestamps for one generation. Created by TimingTrace.start(); call the methods as the
+    # job moves along, then finish() to write it to the trace.
+
+    def __init__(self, trace, spec, name=None, source=None):
+        self.trace = trace
+        self.name = name or spec.get("name")
+        self.source = source
+        self.model = spec.get("model")
+        self.resolution = spec.get("resolution")
+        self.duration = spec.get("duration")
+        self.generation_id = None
+        self.state = None
+        self.checks = 0
+        self.download_bytes = None
+        self.started_at = time.time()  # wall clock, for the trace
+
+        self._started = time.monotonic()
+        self._submitting = None
+        self._submitted = None
+        self._dreaming_seen = None
+        self._last_pending_check = None
+        self._detected = None
+        self._download_started = None
+        self._download_finished = None
+
+    def submitting(self):
+        self._submitting = time.monotonic()
+
+    def submitted(self, generation):
+        self._submitted = time.monotonic()
+        self.generation_id = generation.id
+        self.state = generation.state
+        model, resolution, duration = describe_generation(generation)
+        self.model = self.model or model
+        self.resolution = self.resolution or resolution
+        self.duration = self.duration or duration
+        self.trace.register(self)
+
+    def observed(self, generation):
+        # Called with every status check result for this generation
+        now = time.monotonic()
+        self.checks += 1
+        self.state = generation.state
+        if generation.state in TERMINAL_STATES:
+            if self._detected is None:
+                self._detected = now
+            return
+        if generation.state == "dreaming" and self._dreaming_seen is None:
+            self._dreaming_seen = now
+        self._last_pending_check = now
+
+    def downloading(self):
+        self._download_started = time.monotonic()
+
+    def downloaded(self, save_path):
+        self._download_finished = time.monotonic()
+        self.download_bytes = os.path.getsize(save_path)
+
+    def stages(self):
+        # Seconds per stage; None for stages this job never reached (or that we couldn't see)
+        def span(start, end):
+            return round(end - start, 3) if start is not None and end is not None else None
+
+        end = self._download_finished or self._detected or time.monotonic()
+        download = span(self._download_started, self._download_finished)
+        return {
+            "build": span(self._started, self._submitting),
+            "create": span(self._submitting, self._submitted),
+            "queued": span(self._submitted, self._dreaming_seen),
+            "dreaming": span(self._dreaming_seen, self._detected),
+            "render": span(self._submitted, self._detected),
+            "detection_lag": span(self._last_pending_check, self._detected),
+            "download": download,
+            "total": span(self._started, end),
+        }
+
+    def record(self, error=None):
+        stages = self.stages()
+        download_rate = None
+        if stages["download"] and self.download_bytes is not None:
+            download_rate = round(self.download_bytes / stages["download"])
+        return {
+            "name": self.name,
+            "generation_id": self.generation_id,
+            "source": self.source,
+            "model": self.model,
+            "resolution": self.resolution,
+            "duration": self.duration,
+            "state": self.state,
+            "error": error,
+            "started_at": self.started_at,
+            "checks": self.checks,
+            "download_bytes": self.download_bytes,
+            "download_bytes_per_sec": download_rate,
+            "stages": stages,
+        }
+
+    def finish(self, error=None):
+        self.trace.finish(self, error)
+
+
+class TimingTrace:
+    # Collects GenerationTimings: appends each finished one to the JSONL trace (path=None to skip
+    # the file) and keeps Prometheus-style histograms per stage, model and resolution.
+
+    def __init__(self, path=DEFAULT_TRACE_PATH):
+        self.path = Path(path) if path else None
+        self._lock = threading.Lock()
+        self._active = {}
+        self._histograms = {}
+        self._outcomes = {}
+        self._download_bytes = {}
+
+    def start(self, spec, name=None, source=None):
+        return GenerationTiming(self, spec, name=name, source=source)
+
+    def register(self, timing):
+        with self._lock:
+            self._active[timing.generation_id] = timing
+
+    def observe(self, generation):
+        # Route a status check result to its timing. Hand this to StatusPoller(on_check=...).
+        with self._lock:
+            timing = self._active.get(generation.id)
+        if timing is not None:
+            timing.observed(generation)
+
+    def finish(self, timing, error=None):
+        record = timing.record(error)
+        labels = (timing.model or "unknown", timing.resolution or "n/a")
+        outcome = "error" if error else (timing.state or "unknown")
+
+        with self._lock:
+            self._active.pop(timing.generation_id, None)
+            if self.path is not None:
+                with open(self.path, "a", encoding="utf-8") as file:
+                    file.write(json.dumps(record) + "\n")
+
+            for stage, seconds in record["stages"].items():
+                if seconds is None:
+                    continue
+                histogram = self._histograms.setdefault((stage,) + labels, [[0] * len(HISTOGRAM_BUCKETS), 0.0, 0])
+                for index, bound in enumerate(HISTOGRAM_BUCKETS):
+                    if seconds <= bound:
+                        histogram[0][index] += 1
+                histogram[1] += seconds
+                histogram[2] += 1
+            self._outcomes[labels + (outcome,)] = self._outcomes.get(labels + (outcome,), 0) + 1
+            if record["download_bytes"]:
+                self._download_bytes[labels] = self._download_bytes.get(labels, 0) + record["download_bytes"]
+        return record
+
+    def metrics_text(self):
+        # Prometheus text exposition format (also valid OpenMetrics apart from the # EOF marker)
+        def label_text(**labels):
+            return ",".join(f'{key}="{value}"' for key, value in labels.items())
+
+        lines = [
+            "# HELP luma_generation_stage_seconds Time spent in each stage of a generation.",
+            "# TYPE luma_generation_stage_seconds histogram",
+        ]
+        with self._lock:
+            for (stage, model, resolution), (buckets, total, count) in sorted(self._histograms.items()):
+                labels = label_text(stage=stage, model=model, resolution=resolution)
+                for bound, bucket_count in zip(HISTOGRAM_BUCKETS, buckets):
+                    lines.append(f'luma_generation_stage_seconds_bucket{{{labels},le="{bound}"}} {bucket_count}')
+                lines.append(f'luma_generation_stage_seconds_bucket{{{labels},le="+Inf"}} {count}')
+                lines.append(f"luma_generation_stage_seconds_sum{{{labels}}} {total:.3f}")
+                lines.append(f"luma_generation_stage_seconds_count{{{labels}}} {count}")
+
+            lines.append("# HELP luma_generations_total Generations finished, by outcome.")
+            lines.append("# TYPE luma_generations_total counter")
+            for (model, resolution, outcome), count in sorted(self._outcomes.items()):
+                lines.append(f"luma_generations_total{{{label_text(model=model, resolution=resolution, outcome=outcome)}}} {count}")
+
+            lines.append("# HELP luma_download_bytes_total Bytes of finished assets downloaded.")
+            lines.append("# TYPE luma_download_bytes_total counter")
+            for (model, resolution), total in sorted(self._download_bytes.items()):
+                lines.append(f"luma_download_bytes_total{{{label_text(model=model, resolution=resolution)}}} {total}")
+
+            lines.append("# HELP luma_generations_in_flight Generations submitted and not yet finished.")
+            lines.append("# TYPE luma_generations_in_flight gauge")
+            lines.append(f"luma_generations_in_flight {len(self._active)}")
+        return "\n".join(lines) + "\n"
+
+
+def serve_metrics(trace, port, host="127.0.0.1"):
+    # Serve trace.metrics_text() at http://host:port/metrics from a background thread
+    class MetricsHandler(BaseHTTPRequestHandler):
+        def log_message(self, format, *args):
+            pass
+
+        def do_GET(self):
+            if self.path.rstrip("/") != "/metrics":
+                self.send_error(404)
+                return
+            body = trace.metrics_text().encode("utf-8")
+            self.send_response(200)
+            self.send_header("Content-Type", "text/plain; version=0.0.4; charset=utf-8")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+    server = ThreadingHTTPServer((host, port), MetricsHandler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    print(f"Serving timing metrics on http://{host}:{server.server_address[1]}/metrics")
+    return server
+
+
+def summarize_trace(trace_path):
+    # Median seconds per stage for every model/resolution in a trace, and where the time went
+    groups = {}
+    with open(trace_path, encoding="utf-8") as file:
+        for line in file:
+            if line.strip():
+                record = json.loads(line)
+                groups.setdefault((record["model"] or "unknown", record["resolution"] or "n/a"), []).append(record)
+
+    columns = ("build", "create", "queued", "dreaming", "detection_lag", "download", "total")
+    print(f"{'model':<16}{'resolution':<12}{'jobs':>6}" + "".join(f"{column:>15}" for column in columns) + f"{'MB/s':>9}")
+    for (model, resolution), records in sorted(groups.items()):
+        medians = []
+        for column in columns:
+            values = [record["stages"][column] for record in records if record["stages"].get(column) is not None]
+            medians.append(f"{statistics.median(values):>15.2f}" if values else f"{'-':>15}")
+        rates = [record["download_bytes_per_sec"] for record in records if record["download_bytes_per_sec"]]
+        rate = f"{statistics.median(rates) / 1e6:>9.1f}" if rates else f"{'-':>9}"
+        print(f"{model:<16}{resolution:<12}{len(records):>6}" + "".join(medians) + rate)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Summarise a generation timing trace by model and resolution.")
+    parser.add_argument("trace", nargs="?", default=str(DEFAULT_TRACE_PATH), help="JSONL trace file")
+    args = parser.parse_args()
+
+    if not Path(args.trace).exists():
+        print(f"No trace found at {args.trace}")
+        sys.exit(1)
+    print("Median seconds per stage:")
+    summarize_trace(args.trace)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,151 @@
+import importlib
+from pathlib import Path
+from batch_generate import submit_generation, download_generation, is_image_spec
+from status_poller import StatusPoller, log_poll_error
+
+# --- Hedged Generation ---
+# For time-critical shots: submit K variants of one spec at once and keep whichever finishes first,
+# so a single job sitting in Luma's queue doesn't hold up the shot. As soon as there's a winner the
+# losers are deleted at Luma (client.generations.delete), so they stop taking up concurrency slots.
+#
+# Variants are the spec with each of the alternative prompt phrasings given. The API has no seed,
+# so repeats of the same spec render differently too. With a scorer, a finished variant only wins
+# if its downloaded file scores at least min_score. If none does, the best scoring one is kept.
+#
+# A scorer is any function (path, generation) -> number or bool, e.g. in my_checks.py:
+#   def long_enough(path, generation):
+#       return probe_video(path)["duration"] >= 8
+#
+#   python generate_video.py --hedge 3
+#   python generate_video.py --hedge 3 --scorer my_checks:long_enough
+
+
+def variant_specs(spec, count, phrasings=None):
+    # `count` copies of the spec, cycling through the original prompt and the alternative phrasings
+    prompts = [spec.get("prompt")] + list(phrasings or [])
+    name = spec.get("name") or "variant"
+    return [dict(spec, prompt=prompts[index % len(prompts)], name=f"{name}#{index + 1}") for index in range(count)]
+
+
+def load_scorer(reference):
+    # "module:function" (as given on the command line) -> the function
+    module_name, _, function_name = reference.partition(":")
+    if not module_name or not function_name:
+        raise ValueError(f"Scorer should look like module:function, got '{reference}'")
+    return getattr(importlib.import_module(module_name), function_name)
+
+
+def cancel_generation(client, generation_id, poller=None, ledger=None):
+    # Stop watching a generation and delete it at Luma, freeing its slot
+    if poller is not None:
+        poller.remove(generation_id)
+    client.generations.delete(id=generation_id)
+    if ledger is not None:
+        ledger.record_cancelled(generation_id)
+
+
+def hedged_generate(client, spec, count=2, phrasings=None, scorer=None, min_score=0.5, output_dir=".", ledger=None,
+                    timings=None, source="hedged_generation.py", timeout=None, store=None):
+    # Submit `count` variants of spec and return (generation, downloaded path, variant spec) for the
+    # winner. Every variant still running when the winner is picked (or on a timeout) is cancelled.
+    # Raises RuntimeError if no variant produced anything.
+    output_dir = Path(output_dir)
+    output_dir.mkdir(parents=True, exist_ok=True)
+    poller = StatusPoller(
+        client,
+        on_state_change=ledger.record_state if ledger is not None else None,
+        on_error=log_poll_error,
+        on_check=timings.observe if timings is not None else None,
+    )
+
+    variants = {}
+    for variant in variant_specs(spec, count, phrasings):
+        timing = timings.start(variant, source=source) if timings is not None else None
+        try:
+            generation = submit_generation(client, variant, timing)
+        except Exception as e:
+            print(f"[{variant['name']}] An error occurred during generation: {e}")
+            if timing is not None:
+                timing.finish(error=str(e))
+            continue
+        print(f"[{variant['name']}] Generation started successfully! ID: {generation.id}")
+        if ledger is not None:
+            extension = "jpg" if is_image_spec(variant) else "mp4"
+            ledger.record_submitted(generation, variant, output_path=output_dir / f"{generation.id}.{extension}",
+                                    source=source)
+        variants[generation.id] = (variant, timing)
+        poller.add(generation)
+    if not variants:
+        raise RuntimeError("None of the variants could be submitted")
+
+    running = set(variants)
+    winner = None
+    best = None
+    errors = []
+
+    def cancel_running():
+        # Everything still in Luma's queue has lost (or we're giving up): cancel it
+        for generation_id in sorted(running):
+            variant, timing = variants[generation_id]
+            try:
+                cancel_generation(client, generation_id, poller=poller, ledger=ledger)
+                print(f"[{variant['name']}] Cancelled")
+            except Exception as e:
+                print(f"[{variant['name']}] Warning: could not cancel {generation_id} ({e})")
+            if timing is not None:
+                timing.finish(error="cancelled")
+        running.clear()
+
+    try:
+        for generation in poller.as_completed(timeout=timeout):
+            running.discard(generation.id)
+            variant, timing = variants[generation.id]
+            if generation.state == "failed":
+                errors.append(f"{variant['name']}: {generation.failure_reason}")
+                print(f"[{variant['name']}] Generation failed: {generation.failure_reason}")
+                if timing is not None:
+                    timing.finish(error=f"Generation failed: {generation.failure_reason}")
+                continue
+
+            if scorer is None:
+                # Without a scorer the first completion wins outright; free the other slots now
+                # rather than after the download
+                cancel_running()
+            try:
+                if timing is not None:
+                    timing.downloading()
+                path = download_generation(generation, output_dir, image=is_image_spec(variant))
+                if timing is not None:
+                    timing.downloaded(path)
+                if store is not None:
+                    path = store.add(path, generation.id, variant, source=source,
+                                     timings=timing.stages() if timing is not None else None,
+                                     asset_url=generation.assets.image if is_image_spec(variant) else generation.assets.video)
+                if ledger is not None:
+                    ledger.record_download(generation.id, path)
+                score = scorer(path, generation) if scorer is not None else None
+            except Exception as e:
+                errors.append(f"{variant['name']}: {e}")
+                print(f"[{variant['name']}] An error occurred during the download or scoring: {e}")
+                if timing is not None:
+                    timing.finish(error=str(e))
+                continue
+            if timing is not None:
+                timing.finish()
+
+            if score is None or score >= min_score:
+                winner = (generation, path, variant)
+                print(f"[{variant['name']}] {'Finished first' if score is None else f'Scored {score}'}, keeping it")
+                break
+            print(f"[{variant['name']}] Scored {score}, below {min_score}")
+            if best is None or score > best[0]:
+                best = (score, generation, path, variant)
+    finally:
+        cancel_running()
+
+    if winner is None and best is not None:
+        print(f"No variant reached a score of {min_score}, keeping the best one ({best[0]})")
+        winner = best[1:]
+    if winner is None:
+        raise RuntimeError(f"Every variant failed: {'; '.join(errors)}")
+    return winner
@@ -1,36 +1,33 @@
-import os
 import sys
 from pathlib import Path
-from dotenv import load_dotenv
-from lumaai import LumaAI
-import requests 
-import time
+from luma_client import get_client
+from concept_catalog import validate_concepts
+from model_capabilities import validate_request
+from status_poller import wait_for_generation
+from job_ledger import JobLedger
+from generation_timing import TimingTrace
+from asset_download import download_asset_parallel
+from output_store import OutputStore
+from video_frames import find_generation_video, FrameExtractionError
+from local_transition import local_bridge, bridge_spec, LOCAL_BRIDGE_THRESHOLD
 
 # --- Configuration ---
 # 1. Setup Paths
 # We use the current script directory as the base, just like list_allowed_concepts.py
 current_script_dir = Path(__file__).resolve().parent
-output_dir = current_script_dir / "merged_reference_images"
-env_path = current_script_dir / "env" / ".env"
+# Downloads are filed in the indexed output store (outputs/, search it with `python output_store.py find ...`)
+store = OutputStore()
 
-# Ensure output directory exists to save the result
-output_dir.mkdir(parents=True, exist_ok=True)
+# 2. Initialize Client
+# luma_client loads env/.env once and hands back the shared client, so every API call
+# and download in this run reuses the same pooled connections
+client = get_client()
 
-# 2. Load Environment Variables
-# Using the same logic that worked in your reference file
-if env_path.exists():
-    load_dotenv(dotenv_path=env_path)
-else:
-    # Fallback: Just try loading without a path (searches CWD) or print explicit warning
-    print(f"Warning: .env file not found at {env_path}")
-    load_dotenv() 
+# Every submitted generation is written to the local job ledger
+ledger = JobLedger()
 
-# 3. Initialize Client
-api_key = os.getenv("LUMA_API_KEY")
-if not api_key:
-    raise ValueError(f"API Key not found. Checked path: {env_path}")
-
-client = LumaAI(auth_token=api_key)
+# Per-stage timings (create, queued, dreaming, download speed...) are appended to generation_trace.jsonl
+timings = TimingTrace()
 
 
 # 4. Define key details such as the video_prompt, 
@@ -62,53 +59,88 @@ video_prompt = (
 )
 
 
+# 4. Describe the Video
+# The request is kept in one dict so it can be recorded in the job ledger exactly as sent
+video_spec = dict(
+    # 'ray-2' is the current standard for high-quality video
+    model="ray-2",
+    
+    
+    # 'loop' forces the start and end to match, creating a perfect orbit
+    # since loop does not support start and end (multiple) keyframes however, we will change it to False for now
+    # it does not support multiple keyframes because loop=True implies start and end frame are the same
+    # remember, we can always loop using CapCut
+    prompt=video_prompt,
+    
+    #the keyframes parameter allows users to enter images to use as reference in video generation, add or omit as needed. 
+    keyframes={
+        "frame0": {
+            "type": "generation",
+            "id": "aa0baafa-e7ef-41eb-a744-6f15b2739c21"
+        },
+        "frame1": {
+            "type": "generation",
+            "id": "182b56ed-7d59-4b49-a518-adc8cef3d174"
+        }
+    }
+)
+
+
+# Clips that already nearly meet (the same shot, a little further round) can be bridged on the CPU
+# in seconds instead of with a full generation: `python interpolate_videos.py --local-bridge`.
+# If they're too far apart after optical-flow alignment, this falls through to the API as usual.
+if "--local-bridge" in sys.argv:
+    frame0_id = video_spec["keyframes"]["frame0"]["id"]
+    frame1_id = video_spec["keyframes"]["frame1"]["id"]
+    bridge_path = f'{frame0_id}_{frame1_id}_bridge.mp4'
+    try:
+        difference, frames = local_bridge(find_generation_video(frame0_id, ledger),
+                                          find_generation_video(frame1_id, ledger), bridge_path)
+    except (FileNotFoundError, FrameExtractionError) as e:
+        print(f"Can't bridge locally ({e}), submitting to Luma instead")
+    else:
+        if frames is not None:
+            # filed like a generation, with its source clips as parents so `output_store.py find --parent` finds it
+            saved_path = store.add(bridge_path, f"local-bridge-{frame0_id}-{frame1_id}",
+                                   bridge_spec(frame0_id, frame1_id, frames, difference),
+                                   source="local_transition.py", parents=[frame0_id, frame1_id])
+            print(f"Bridged locally ({frames} frames, difference {difference:.1f} after alignment): {saved_path}")
+            sys.exit(0)
+        print(f"The clips differ by {difference:.1f} after alignment (local threshold {LOCAL_BRIDGE_THRESHOLD}), "
+              "submitting to Luma")
+
+
 # 4. Generate the Video
+timing = timings.start(video_spec, source="interpolate_videos.py")
 try:
-    generation = client.generations.create(
-        # 'ray-2' is the current standard for high-quality video
-        model="ray-2",
-        
-        
-        # 'loop' forces the start and end to match, creating a perfect orbit
-        # since loop does not support start and end (multiple) keyframes however, we will change it to False for now
-        # it does not support multiple keyframes because loop=True implies start and end frame are the same
-        # remember, we can always loop using CapCut
-        prompt=video_prompt,
-        
-        #the keyframes parameter allows users to enter images to use as reference in video generation, add or omit as needed. 
-        keyframes={
-            "frame0": {
-                "type": "generation",
-                "id": "aa0baafa-e7ef-41eb-a744-6f15b2739c21"
-            },
-            "frame1": {
-                "type": "generation",
-                "id": "182b56ed-7d59-4b49-a518-adc8cef3d174"
-            }
-        }
-    )
+    # check concept keys and the model's capabilities locally first, so a typo or an unsupported
+    # resolution/duration fails here, not at Luma
+    validate_concepts(video_spec)
+    validate_request(video_spec)
+    timing.submitting()
+    generation = client.generations.create(**video_spec)
+    timing.submitted(generation)
     
     print(f"Generation started successfully! ID: {generation.id}")
+    
+    # record the ID straight away so `python resume_jobs.py` can pick this job up if we get killed
+    ledger.record_submitted(generation, video_spec, output_path=f'{generation.id}.mp4', source="interpolate_videos.py")
 
 except Exception as e:
     print(f"An error occurred during generation: {e}")
+    timing.finish(error=str(e))
     sys.exit(1) # Stop the script here so you don't get errors later for trying to check the status of a non-existent generated video
     
 
 # 5. Check the status of the video generation
+# The shared poller picks its check interval from the model/resolution/duration instead of a flat 3 seconds
 try:
-    completed = False
-    while not completed:
-        generation = client.generations.get(id=generation.id)
-        if generation.state == "completed":
-            completed = True
-        elif generation.state == "failed":
-            raise RuntimeError(f"Generation failed: {generation.failure_reason}")
-        print("Dreaming")
-        time.sleep(3)
+    generation = wait_for_generation(client, generation, message="Dreaming", on_state_change=ledger.record_state,
+                                     on_check=timing.observed)
         
 except Exception as e:
     print(f"An error occurred during periodic status checks: {e}")
+    timing.finish(error=str(e))
     sys.exit(1) # Stop the script here so you don't get errors later for trying to download a non-existent generated video
     
     
@@ -116,14 +148,21 @@ except Exception as e:
 video_url = generation.assets.video
 
 try:
-    # download the video
-    response = requests.get(video_url, stream=True)
-    with open(f'{generation.id}.mp4', 'wb') as file:
-        file.write(response.content)
-    print(f"File downloaded as {generation.id}.mp4")
+    # fetch the video over several ranged connections at once (falls back to a single resumable stream)
+    timing.downloading()
+    download_asset_parallel(video_url, f'{generation.id}.mp4')
+    timing.downloaded(f'{generation.id}.mp4')
+
+    # file it in the output store: content-hashed, with a sidecar recording how it was made
+    saved_path = store.add(f'{generation.id}.mp4', generation.id, video_spec, source="interpolate_videos.py",
+                           timings=timing.stages(), asset_url=video_url)
+    print(f"File saved as {saved_path}")
+    ledger.record_download(generation.id, saved_path)
+    timing.finish()
     
 except Exception as e:
     print(f"An error occurred during the download process: {e}")
+    timing.finish(error=str(e))
     
 
     
@@ -0,0 +1,179 @@
+import json
+import time
+import sqlite3
+import threading
+from pathlib import Path
+
+# --- Job Ledger ---
+# Every generation we submit is written to a local SQLite file the moment the create call returns,
+# so a killed script never loses the ID of a job we've already paid for.
+#
+#   jobs         one row per generation: spec, current state, asset url, where it should be saved
+#   transitions  every state change we've seen (submitted -> queued -> dreaming -> completed -> downloaded)
+#
+# `python resume_jobs.py` reattaches to anything still running and downloads anything that finished
+# while nobody was watching.
+
+current_script_dir = Path(__file__).resolve().parent
+DEFAULT_LEDGER_PATH = current_script_dir / "job_ledger.sqlite3"
+
+# States after which there's nothing left for resume_jobs.py to do
+FINAL_STATES = ("failed", "downloaded", "cancelled")
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS jobs (
+    generation_id   TEXT PRIMARY KEY,
+    name            TEXT,
+    source          TEXT,
+    model           TEXT,
+    spec            TEXT NOT NULL,
+    state           TEXT NOT NULL,
+    failure_reason  TEXT,
+    asset_url       TEXT,
+    output_path     TEXT,
+    submitted_at    REAL NOT NULL,
+    updated_at      REAL NOT NULL,
+    completed_at    REAL,
+    downloaded_at   REAL
+);
+CREATE TABLE IF NOT EXISTS transitions (
+    generation_id   TEXT NOT NULL,
+    state           TEXT NOT NULL,
+    at              REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS jobs_state ON jobs (state);
+CREATE INDEX IF NOT EXISTS transitions_generation ON transitions (generation_id);
+"""
+
+
+class JobLedger:
+
+    def __init__(self, path=DEFAULT_LEDGER_PATH):
+        self.path = Path(path)
+        # One connection shared by the poller thread and the download pool, guarded by a lock
+        self._connection = sqlite3.connect(str(self.path), check_same_thread=False, isolation_level=None)
+        self._connection.row_factory = sqlite3.Row
+        self._lock = threading.Lock()
+        with self._lock:
+            # WAL keeps writes cheap and lets resume_jobs.py read while another script is writing
+            self._connection.execute("PRAGMA journal_mode=WAL")
+            self._connection.executescript(SCHEMA)
+
+    def close(self):
+        with self._lock:
+            self._connection.close()
+
+    def _write(self, statements):
+        # Run several statements as one transaction so a crash can't leave a half-recorded transition
+        with self._lock:
+            self._connection.execute("BEGIN")
+            try:
+                for sql, params in statements:
+                    self._connection.execute(sql, params)
+                self._connection.execute("COMMIT")
+            except Exception:
+                self._connection.execute("ROLLBACK")
+                raise
+
+    def record_submitted(self, generation, spec, output_path=None, source=None):
+        # Call straight after client.generations.create returns
+        now = time.time()
+        state = getattr(generation, "state", None) or "submitted"
+        self._write([
+            (
+                "INSERT OR REPLACE INTO jobs (generation_id, name, source, model, spec, state, output_path, "
+                "submitted_at, updated_at) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                (
+                    generation.id,
+                    spec.get("name"),
+                    source,
+                    spec.get("model"),
+                    json.dumps(spec, sort_keys=True),
+                    state,
+                    str(Path(output_path).resolve()) if output_path else None,
+                    now,
+                    now,
+                ),
+            ),
+            ("INSERT INTO transitions (generation_id, state, at) VALUES (?, ?, ?)", (generation.id, state, now)),
+        ])
+
+    def record_state(self, generation):
+        # Call with every fresh Generation the poller sees; only real changes are written
+        job = self.get(generation.id)
+        if job is None or job["state"] == generation.state:
+            return
+        now = time.time()
+        asset_url = None
+        if generation.state == "completed" and getattr(generation, "assets", None) is not None:
+            asset_url = generation.assets.video or generation.assets.image
+        self._write([
+            (
+                "UPDATE jobs SET state = ?, failure_reason = ?, asset_url = COALESCE(?, asset_url), "
+                "updated_at = ?, completed_at = CASE WHEN ? = 'completed' THEN ? ELSE completed_at END "
+                "WHERE generation_id = ?",
+                (generation.state, generation.failure_reason, asset_url, now, generation.state, now, generation.id),
+            ),
+            ("INSERT INTO transitions (generation_id, state, at) VALUES (?, ?, ?)", (generation.id, generation.state, now)),
+        ])
+
+    def record_download(self, generation_id, path):
+        now = time.time()
+        self._write([
+            (
+                "UPDATE jobs SET state = 'downloaded', output_path = ?, updated_at = ?, downloaded_at = ? "
+                "WHERE generation_id = ?",
+                (str(Path(path).resolve()), now, now, generation_id),
+            ),
+            ("INSERT INTO transitions (generation_id, state, at) VALUES (?, ?, ?)", (generation_id, "downloaded", now)),
+        ])
+
+    def record_cancelled(self, generation_id):
+        # We deleted the generation at Luma before it finished (e.g. a hedged variant that lost)
+        now = time.time()
+        self._write([
+            ("UPDATE jobs SET state = 'cancelled', updated_at = ? WHERE generation_id = ?", (now, generation_id)),
+            ("INSERT INTO transitions (generation_id, state, at) VALUES (?, ?, ?)", (generation_id, "cancelled", now)),
+        ])
+
+    def get(self, generation_id):
+        with self._lock:
+            row = self._connection.execute("SELECT * FROM jobs WHERE generation_id = ?", (generation_id,)).fetchone()
+        return dict(row) if row else None
+
+    def unfinished(self):
+        # Jobs that are still rendering, or finished but never made it to disk
+        placeholders = ", ".join("?" for _ in FINAL_STATES)
+        with self._lock:
+            rows = self._connection.execute(
+                f"SELECT * FROM jobs WHERE state NOT IN ({placeholders}) ORDER BY submitted_at",
+                FINAL_STATES,
+            ).fetchall()
+        return [dict(row) for row in rows]
+
+    def transitions(self, generation_id):
+        with self._lock:
+            rows = self._connection.execute(
+                "SELECT state, at FROM transitions WHERE generation_id = ? ORDER BY at", (generation_id,)
+            ).fetchall()
+        return [dict(row) for row in rows]
+
+    def recent(self, limit=20):
+        with self._lock:
+            rows = self._connection.execute(
+                "SELECT * FROM jobs ORDER BY submitted_at DESC LIMIT ?", (limit,)
+            ).fetchall()
+        return [dict(row) for row in rows]
+
+    def drafts(self, limit=20):
+        # Draft-mode generations (their spec carries a final_spec), newest first, with the
+        # generation each one was promoted to (if it has been)
+        with self._lock:
+            rows = self._connection.execute(
+                "SELECT draft.*, MAX(final.generation_id) AS promoted_to FROM jobs AS draft "
+                "LEFT JOIN jobs AS final ON json_extract(final.spec, '$.draft_of') = draft.generation_id "
+                "WHERE json_extract(draft.spec, '$.final_spec') IS NOT NULL "
+                "GROUP BY draft.generation_id ORDER BY draft.submitted_at DESC LIMIT ?",
+                (limit,),
+            ).fetchall()
+        return [dict(row) for row in rows]
@@ -0,0 +1,213 @@
+import re
+import ast
+import json
+import tomllib
+from pathlib import Path
+
+# --- Job Manifests ---
+# Feeds batch_generate.py without hand-copying prompts into the scripts. Entries are read lazily,
+# so a manifest (or prompt file) with thousands of jobs is never loaded up front.
+#
+# Supported formats (picked by file extension):
+#   .jsonl  one entry per line, streamed
+#   .json   a JSON list of entries (the original batch_generate.py format)
+#   .toml   a [defaults] table plus [[job]] tables
+#   .txt    a prompt.txt-style prompt file: every prompt in it becomes a job
+#
+# An entry is a generation spec (model, resolution, duration, keyframes, concepts, ...) with either
+#   "prompt":      the prompt text itself, or
+#   "prompt_file": a prompt.txt-style file, plus optionally
+#   "prompt_name": which prompt in it (e.g. "video_prompt_v5"); without it, one job per prompt in the file
+#
+#   {"prompt_file": "prompt.txt", "prompt_name": "video_prompt_v5", "model": "ray-2", "resolution": "4k"}
+#   {"prompt_file": "more_prompts.txt", "model": "ray-2", "duration": "5s"}
+
+ASSIGNMENT = re.compile(r"^([A-Za-z_]\w*)\s*=\s*\((.*)$")
+
+
+def _parse_prompt_block(name, lines):
+    # Prompts in prompt.txt are written like Python: name = ( "part one " "part two" )
+    # Blocks that aren't valid Python (free text inside the parentheses) are joined as plain text.
+    body = "\n".join(lines).strip()
+    if body.endswith(")"):
+        body = body[:-1]
+    try:
+        value = ast.literal_eval(f"({body})")
+        if isinstance(value, str):
+            return value.strip()
+    except (ValueError, SyntaxError):
+        pass
+    text = " ".join(line.strip() for line in lines if line.strip() and line.strip() != ")")
+    return text.strip().strip('"').strip()
+
+
+def iter_prompt_file(prompt_path):
+    # Yield (name, prompt) for every prompt in a prompt.txt-style file, one at a time.
+    #   - `name = ( ... )` blocks use their variable name
+    #   - free-standing paragraphs (separated by blank lines) are named prompt_<line number>
+    #   - `#` comment lines are skipped
+    block_name = None
+    block_lines = []
+    depth = 0
+    paragraph = []
+    paragraph_start = None
+
+    def flush_paragraph():
+        text = " ".join(paragraph).strip().strip('"').strip()
+        return (f"prompt_{paragraph_start}", text) if text else None
+
+    with open(prompt_path, encoding="utf-8") as file:
+        for line_number, raw_line in enumerate(file, start=1):
+            line = raw_line.rstrip("\n")
+            stripped = line.strip()
+
+            if block_name is not None:
+                block_lines.append(line)
+                depth += line.count("(") - line.count(")")
+                if depth <= 0:
+                    yield block_name, _parse_prompt_block(block_name, block_lines)
+                    block_name, block_lines = None, []
+                continue
+
+            match = ASSIGNMENT.match(stripped)
+            if match:
+                if paragraph:
+                    entry = flush_paragraph()
+                    if entry:
+                        yield entry
+                    paragraph = []
+                block_name = match.group(1)
+                block_lines = [match.group(2)]
+                depth = 1 + match.group(2).count("(") - match.group(2).count(")")
+                if depth <= 0:
+                    yield block_name, _parse_prompt_block(block_name, block_lines)
+                    block_name, block_lines = None, []
+                continue
+
+            if paragraph and " ".join(paragraph).count('"') % 2 == 1:
+                # Inside a quoted prompt that spans blank lines, keep collecting
+                if stripped:
+                    paragraph.append(stripped)
+                continue
+
+            if not stripped or stripped.startswith("#"):
+                if paragraph:
+                    entry = flush_paragraph()
+                    if entry:
+                        yield entry
+                    paragraph = []
+                continue
+
+            if not paragraph:
+                paragraph_start = line_number
+            paragraph.append(stripped)
+
+    if block_name is not None:
+        yield block_name, _parse_prompt_block(block_name, block_lines)
+    if paragraph:
+        entry = flush_paragraph()
+        if entry:
+            yield entry
+
+
+class _PromptLookup:
+    # Finds named prompts, remembering everything scanned so far so thousands of entries
+    # pointing at the same prompt file don't rescan it each time
+    def __init__(self):
+        self._seen = {}
+        self._scanners = {}
+
+    def get(self, prompt_path, prompt_name):
+        prompt_path = Path(prompt_path).resolve()
+        seen = self._seen.setdefault(prompt_path, {})
+        if prompt_name in seen:
+            return seen[prompt_name]
+
+        scanner = self._scanners.setdefault(prompt_path, iter_prompt_file(prompt_path))
+        for name, prompt in scanner:
+            # If prompt.txt defines a name twice, the first definition is the one used
+            seen.setdefault(name, prompt)
+            if name == prompt_name:
+                return seen[name]
+        raise ValueError(f"Prompt '{prompt_name}' not found in {prompt_path}")
+
+
+def _expand_entry(entry, defaults, base_dir, lookup, source):
+    # Turn one manifest entry into one or more complete specs
+    spec = dict(defaults)
+    spec.update(entry)
+
+    prompt_file = spec.pop("prompt_file", None)
+    prompt_name = spec.pop("prompt_name", None)
+    if prompt_file is None:
+        # Keyframes alone are enough for a video (an interpolation); model_capabilities.py has the final say
+        if "prompt" not in spec and not spec.get("keyframes"):
+            raise ValueError(f"{source} has no 'prompt', 'prompt_file' or 'keyframes': {entry}")
+        yield spec
+        return
+
+    prompt_path = Path(prompt_file)
+    if not prompt_path.is_absolute():
+        prompt_path = base_dir / prompt_path
+
+    if prompt_name:
+        spec["prompt"] = lookup.get(prompt_path, prompt_name)
+        spec.setdefault("name", prompt_name)
+        yield spec
+        return
+
+    for name, prompt in iter_prompt_file(prompt_path):
+        expanded = dict(spec, prompt=prompt)
+        expanded["name"] = f"{spec['name']}_{name}" if "name" in spec else name
+        yield expanded
+
+
+def _iter_entries(manifest_path):
+    # Yield (defaults, entry, source) without reading more of the file than needed
+    suffix = manifest_path.suffix.lower()
+
+    if suffix == ".jsonl":
+        with open(manifest_path, encoding="utf-8") as file:
+            for line_number, line in enumerate(file, start=1):
+                if line.strip() and not line.lstrip().startswith("#"):
+                    yield {}, json.loads(line), f"{manifest_path.name} line {line_number}"
+
+    elif suffix == ".toml":
+        # tomllib can't stream, but the jobs it points at (prompt files) are still expanded lazily
+        with open(manifest_path, "rb") as file:
+            manifest = tomllib.load(file)
+        defaults = manifest.get("defaults", {})
+        for index, entry in enumerate(manifest.get("job", [])):
+            yield defaults, entry, f"{manifest_path.name} job {index}"
+
+    elif suffix == ".txt":
+        yield {}, {"prompt_file": str(manifest_path)}, manifest_path.name
+
+    else:
+        entries = json.loads(manifest_path.read_text(encoding="utf-8"))
+        for index, entry in enumerate(entries):
+            yield {}, entry, f"{manifest_path.name} entry {index}"
+
+
+def iter_manifest(manifest_path, defaults=None):
+    # Lazily yield complete generation specs from a manifest, each with a unique "name".
+    # `defaults` (e.g. from the command line) sit underneath anything the manifest sets.
+    manifest_path = Path(manifest_path)
+    base_dir = manifest_path.resolve().parent
+    lookup = _PromptLookup()
+
+    index = 0
+    seen_names = set()
+    for manifest_defaults, entry, source in _iter_entries(manifest_path):
+        merged_defaults = dict(defaults or {})
+        merged_defaults.update(manifest_defaults)
+        for spec in _expand_entry(entry, merged_defaults, base_dir, lookup, source):
+            name = spec.setdefault("name", f"job{index:03d}")
+            # prompt.txt re-uses variable names, keep job names unique anyway
+            suffix = 2
+            while spec["name"] in seen_names:
+                spec["name"] = f"{name}_{suffix}"
+                suffix += 1
+            seen_names.add(spec["name"])
+            index += 1
+            yield spec
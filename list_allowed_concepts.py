@@ -1,42 +1,29 @@
-import requests
-import os
-from dotenv import load_dotenv
+import sys
+import httpx
+from concept_catalog import refresh_concepts, CONCEPT_CACHE_PATH
 
 # 1. Load API Key from env/.env
-# We look for the 'env' folder relative to where this script is located
-script_dir = os.path.dirname(os.path.abspath(__file__))
-env_path = os.path.join(script_dir, 'env', '.env')
-load_dotenv(dotenv_path=env_path)
+# luma_client looks for the 'env' folder relative to where the scripts are located,
+# and sends the request over the same pooled connection as the generation scripts
 
-API_KEY = os.getenv('LUMA_API_KEY')
-
-# 2. Define the endpoint URL
-url = "https://api.lumalabs.ai/dream-machine/v1/generations/concepts/list"
-
-# 3. Set the required headers
-headers = {
-    "accept": "application/json",
-    "authorization": f"Bearer {API_KEY}"
-}
+# 2. Fetch the concept list
+# The list is cached in concept_cache.json. Revalidating it is a conditional request
+# (If-None-Match / If-Modified-Since), so an unchanged list costs a tiny 304.
+# Pass --cached to only revalidate once the cached copy is older than a day.
+force = "--cached" not in sys.argv
 
 try:
-    # 4. Make the GET request
-    response = requests.get(url, headers=headers)
-    
-    # 5. Check if the request was successful
-    response.raise_for_status()
-    
-    # 6. Parse and print the data
-    concepts = response.json()
-    
-    print(f"Successfully retrieved {len(concepts)} concepts:")
+    concepts = refresh_concepts(force=force)
+
+    # 3. Print the data
+    print(f"Successfully retrieved {len(concepts)} concepts (cached in {CONCEPT_CACHE_PATH.name}):")
     print("-" * 30)
     for concept in concepts:
         # The API typically returns a list of strings (e.g., 'zoom_in', 'orbit_left')
         print(f"- {concept}")
 
-except requests.exceptions.RequestException as e:
+except httpx.HTTPError as e:
     print(f"Error fetching concepts: {e}")
-    if hasattr(e, 'response') and e.response is not None:
+    if isinstance(e, httpx.HTTPStatusError):
         print(f"Status Code: {e.response.status_code}")
-        print(f"Response Body: {e.response.text}")
\ No newline at end of file
+        print(f"Response Body: {e.response.text}")
@@ -0,0 +1,288 @@
+import os
+import sys
+import argparse
+import tempfile
+import subprocess
+from pathlib import Path
+from concurrent.futures import ThreadPoolExecutor
+import numpy as np
+from PIL import Image
+from video_frames import FFMPEG, FrameExtractionError, extract_frame, probe_video, find_generation_video
+from job_ledger import JobLedger
+
+# --- Local Transitions ---
+# interpolate_videos.py bridges two generations by sending their boundary frames to ray-2 as
+# frame0/frame1: minutes in Luma's queue and a full generation's credits. When the last frame of
+# one clip and the first frame of the next are already close (the same shot, a little further
+# round the orbit), the bridge can be made here in seconds instead:
+#
+#   1. optical flow from the first frame to the second, by coarse-to-fine Lucas-Kanade at 320px
+#      wide; every pixel's 2x2 system is solved at once from box-filtered image gradients
+#   2. each in-between frame t warps the first frame forward by t of the flow and the second back
+#      by 1-t, and blends the two. The flow is smooth at the scale it was measured, so at full size
+#      each warp is a Pillow MESH transform: one quad per 16x16 pixels, with the quads' corners for
+#      every in-between computed in one NumPy pass. The transforms themselves run in C on a thread
+#      pool, which keeps a 4K bridge to seconds per core rather than minutes.
+#
+# How close is close enough is decided on what the flow can't explain: the RMS difference left
+# after warping the second frame onto the first (0-255). Below LOCAL_BRIDGE_THRESHOLD the clips
+# are bridged locally; above it, new content has to appear and the API does a better job.
+#
+# The bridge starts on the first clip's last frame and ends on the second clip's first frame,
+# like an interpolation from Luma, so stitch_segments.py joins it the same way.
+#
+#   python local_transition.py <generation id> <generation id> -o bridge.mp4
+#   python local_transition.py a.mp4 b.mp4 -o bridge.mp4 --seconds 0.5 --check-only
+#   python interpolate_videos.py --local-bridge        # bridge locally when the clips are close enough
+
+FLOW_WIDTH = 320
+FLOW_WINDOW = 3  # Lucas-Kanade window radius, in pixels of each pyramid level
+FLOW_ITERATIONS = 3  # refinements per pyramid level
+LOCAL_BRIDGE_THRESHOLD = 6.0  # RMS difference (0-255) left after flow alignment
+DEFAULT_BRIDGE_SECONDS = 1.0
+MESH_CELL = 16  # output pixels per side of each warp quad
+BRIDGE_WORKERS = os.cpu_count() or 1
+BRIDGE_CRF = "16"
+
+
+def box_mean(image, radius):
+    # Mean over a (2r+1)^2 window around every pixel, from a summed-area table
+    size = 2 * radius + 1
+    padded = np.pad(image, ((radius + 1, radius), (radius + 1, radius)), mode="edge")
+    table = padded.cumsum(axis=0).cumsum(axis=1)
+    total = table[size:, size:] - table[:-size, size:] - table[size:, :-size] + table[:-size, :-size]
+    return total / (size * size)
+
+
+def warp(image, flow):
+    # Sample image (H, W) or (H, W, C) at every (x + u, y + v), bilinearly; flow is (..., H, W, 2),
+    # so a stack of flows gives a stack of warped images in one go
+    height, width = image.shape[:2]
+    y, x = np.mgrid[0:height, 0:width].astype(np.float32)
+    sample_x = np.clip(x + flow[..., 0], 0, width - 1)
+    sample_y = np.clip(y + flow[..., 1], 0, height - 1)
+    x0 = np.floor(sample_x).astype(np.int32)
+    y0 = np.floor(sample_y).astype(np.int32)
+    x1 = np.minimum(x0 + 1, width - 1)
+    y1 = np.minimum(y0 + 1, height - 1)
+    fx = sample_x - x0
+    fy = sample_y - y0
+    if image.ndim == 3:
+        fx = fx[..., None]
+        fy = fy[..., None]
+    upper = image[y0, x0] * (1 - fx) + image[y0, x1] * fx
+    lower = image[y1, x0] * (1 - fx) + image[y1, x1] * fx
+    return upper * (1 - fy) + lower * fy
+
+
+def resize_flow(flow, height, width):
+    # Resample a flow field to another size, scaling the vectors with it
+    scale = (width / flow.shape[1], height / flow.shape[0])
+    channels = [
+        np.asarray(Image.fromarray(flow[..., axis]).resize((width, height), Image.Resampling.BILINEAR)) * scale[axis]
+        for axis in range(2)
+    ]
+    return np.stack(channels, axis=-1).astype(np.float32)
+
+
+def estimate_flow(first, second, window=FLOW_WINDOW, iterations=FLOW_ITERATIONS):
+    # Dense flow (H, W, 2) such that first(p) ~ second(p + flow(p)), for greyscale float images
+    pyramid = [(first, second)]
+    while min(pyramid[-1][0].shape) >= 32:
+        pyramid.append(tuple(
+            image[:image.shape[0] // 2 * 2, :image.shape[1] // 2 * 2].reshape(
+                image.shape[0] // 2, 2, image.shape[1] // 2, 2).mean(axis=(1, 3))
+            for image in pyramid[-1]
+        ))
+
+    flow = np.zeros(pyramid[-1][0].shape + (2,), dtype=np.float32)
+    for level_first, level_second in reversed(pyramid):
+        flow = resize_flow(flow, *level_first.shape)
+        for _ in range(iterations):
+            warped = warp(level_second, flow)
+            gradient_y, gradient_x = np.gradient((level_first + warped) / 2)
+            difference = warped - level_first
+            sxx = box_mean(gradient_x * gradient_x, window)
+            sxy = box_mean(gradient_x * gradient_y, window)
+            syy = box_mean(gradient_y * gradient_y, window)
+            sxt = box_mean(gradient_x * difference, window)
+            syt = box_mean(gradient_y * difference, window)
+            determinant = sxx * syy - sxy * sxy
+            # Flat areas have no gradient to go on; they keep the flow they had (smoothed below)
+            solvable = determinant > 1e-3
+            determinant = np.where(solvable, determinant, 1)
+            du = np.where(solvable, (sxy * syt - syy * sxt) / determinant, 0)
+            dv = np.where(solvable, (sxy * sxt - sxx * syt) / determinant, 0)
+            flow = flow + np.stack([du, dv], axis=-1).astype(np.float32)
+            flow = np.stack([box_mean(flow[..., axis], window) for axis in range(2)], axis=-1)
+    return flow
+
+
+def greyscale(rgb):
+    return rgb @ np.array([0.299, 0.587, 0.114], dtype=np.float32)
+
+
+def rms(difference):
+    return float(np.sqrt(np.mean(np.square(difference))))
+
+
+def analyse(first, second):
+    # (flow at FLOW_WIDTH, difference left after aligning with it, plain difference) for two
+    # full-size RGB images
+    height = max(2, round(FLOW_WIDTH * first.height / first.width))
+    small = [
+        greyscale(np.asarray(image.resize((FLOW_WIDTH, height), Image.Resampling.BOX), dtype=np.float32))
+        for image in (first, second)
+    ]
+    flow = estimate_flow(*small)
+    return flow, rms(warp(small[1], flow) - small[0]), rms(small[1] - small[0])
+
+
+def boundary_frames(first_video, second_video, work_dir):
+    # The first clip's last frame and the second clip's first frame, full size
+    first_path = extract_frame(first_video, Path(work_dir) / "first.png", frame=-1)
+    second_path = extract_frame(second_video, Path(work_dir) / "second.png", frame=0)
+    with Image.open(first_path) as image:
+        first = image.convert("RGB")
+    with Image.open(second_path) as image:
+        second = image.convert("RGB")
+    if second.size != first.size:
+        second = second.resize(first.size, Image.Resampling.LANCZOS)
+    return first, second
+
+
+def warp_meshes(flow, width, height, scales):
+    # Pillow MESH data warping a width x height image by scale * flow, for each scale: every flow
+    # cell becomes an output box, mapped from the source quad its corners' flow points at
+    cells_y, cells_x = flow.shape[:2]
+    padded = np.pad(flow, ((1, 1), (1, 1), (0, 0)), mode="edge")
+    corners = (padded[:-1, :-1] + padded[1:, :-1] + padded[:-1, 1:] + padded[1:, 1:]) / 4
+    corners = corners * np.array([width / cells_x, height / cells_y], dtype=np.float32)
+    grid_x, grid_y = np.meshgrid(np.linspace(0, width, cells_x + 1), np.linspace(0, height, cells_y + 1))
+    box_x = grid_x.round().astype(int)
+    box_y = grid_y.round().astype(int)
+    boxes = [tuple(box) for box in np.stack(
+        [box_x[:-1, :-1], box_y[:-1, :-1], box_x[1:, 1:], box_y[1:, 1:]], axis=-1
+    ).reshape(-1, 4).tolist()]
+
+    scales = np.asarray(scales, dtype=np.float32)[:, None, None]
+    source_x = grid_x + scales * corners[..., 0]
+    source_y = grid_y + scales * corners[..., 1]
+    # Quad corners in Pillow's order: upper left, lower left, lower right, upper right
+    quads = np.stack([
+        source_x[:, :-1, :-1], source_y[:, :-1, :-1], source_x[:, 1:, :-1], source_y[:, 1:, :-1],
+        source_x[:, 1:, 1:], source_y[:, 1:, 1:], source_x[:, :-1, 1:], source_y[:, :-1, 1:],
+    ], axis=-1).reshape(len(scales), -1, 8)
+    return boxes, quads
+
+
+def render_bridge(first, second, flow, fps, output_path, seconds=DEFAULT_BRIDGE_SECONDS):
+    # Write first, the flow-guided in-betweens and second as one clip; returns its frame count
+    width, height = first.size
+    steps = max(2, round(seconds * fps))
+    times = np.arange(1, steps, dtype=np.float32) / steps
+    flow = resize_flow(flow, max(1, height // MESH_CELL), max(1, width // MESH_CELL))
+    boxes, from_first = warp_meshes(flow, width, height, -times)
+    _, from_second = warp_meshes(flow, width, height, 1 - times)
+
+    def in_between(index):
+        warped = [
+            image.transform(first.size, Image.Transform.MESH, list(zip(boxes, map(tuple, quads[index].tolist()))),
+                            Image.Resampling.BILINEAR)
+            for image, quads in ((first, from_first), (second, from_second))
+        ]
+        return Image.blend(*warped, float(times[index])).tobytes()
+
+    output_path = Path(output_path)
+    temporary = output_path.with_name(output_path.stem + ".tmp" + output_path.suffix)
+    encoder = subprocess.Popen([
+        FFMPEG, "-v", "error", "-nostdin", "-y",
+        "-f", "rawvideo", "-pix_fmt", "rgb24", "-s", f"{width}x{height}", "-r", f"{fps:.6f}", "-i", "-",
+        "-c:v", "libx264", "-crf", BRIDGE_CRF, "-preset", "medium", "-pix_fmt", "yuv420p",
+        "-movflags", "+faststart", str(temporary),
+    ], stdin=subprocess.PIPE, stderr=subprocess.PIPE)
+    try:
+        encoder.stdin.write(first.tobytes())
+        with ThreadPoolExecutor(max_workers=BRIDGE_WORKERS) as pool:
+            # A few frames ahead of the encoder at most, so a 4K bridge isn't all held in memory
+            for start in range(0, len(times), BRIDGE_WORKERS * 2):
+                for frame in pool.map(in_between, range(start, min(start + BRIDGE_WORKERS * 2, len(times)))):
+                    encoder.stdin.write(frame)
+        encoder.stdin.write(second.tobytes())
+        encoder.stdin.close()
+        if encoder.wait() != 0:
+            raise FrameExtractionError(f"ffmpeg failed: {encoder.stderr.read().decode('utf-8', 'replace').strip()[-500:]}")
+        temporary.replace(output_path)
+    finally:
+        if encoder.poll() is None:
+            encoder.kill()
+        temporary.unlink(missing_ok=True)
+    return steps + 1
+
+
+def local_bridge(first_video, second_video, output_path, seconds=DEFAULT_BRIDGE_SECONDS,
+                 threshold=LOCAL_BRIDGE_THRESHOLD):
+    # Bridge the two clips locally if they're close enough. Returns (aligned difference, frames
+    # written); frames is None when the difference is over threshold and nothing was written.
+    with tempfile.TemporaryDirectory(prefix="bridge-") as work_dir:
+        first, second = boundary_frames(first_video, second_video, work_dir)
+    flow, difference, _ = analyse(first, second)
+    if threshold is not None and difference > threshold:
+        return difference, None
+    fps = probe_video(first_video)["fps"]
+    return difference, render_bridge(first, second, flow, fps, output_path, seconds)
+
+
+def bridge_spec(first_id, second_id, frames, difference, seconds=DEFAULT_BRIDGE_SECONDS):
+    # What the output store records for a local bridge: how it was made here, not a Luma request
+    return {
+        "method": "optical-flow blend",
+        "flow": f"coarse-to-fine Lucas-Kanade at {FLOW_WIDTH}px wide",
+        "source_clips": [first_id, second_id],
+        "frames": frames,
+        "seconds": seconds,
+        "aligned_difference": round(float(difference), 2),
+        "threshold": LOCAL_BRIDGE_THRESHOLD,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Bridge two clips locally with flow-guided blending.")
+    parser.add_argument("first", help="The clip to bridge from (file or generation ID in the job ledger)")
+    parser.add_argument("second", help="The clip to bridge to")
+    parser.add_argument("-o", "--output", help="Bridge video")
+    parser.add_argument("--seconds", type=float, default=DEFAULT_BRIDGE_SECONDS, help="Length of the bridge")
+    parser.add_argument("--threshold", type=float, default=LOCAL_BRIDGE_THRESHOLD,
+                        help="Largest aligned difference (0-255 RMS) to bridge locally")
+    parser.add_argument("--force", action="store_true", help="Bridge locally however different the clips are")
+    parser.add_argument("--check-only", action="store_true", help="Report how close the clips are and stop")
+    args = parser.parse_args()
+    if not args.check_only and not args.output:
+        parser.error("-o/--output is required unless --check-only is given")
+
+    ledger = JobLedger()
+    try:
+        videos = [Path(video) if Path(video).exists() else find_generation_video(video, ledger)
+                  for video in (args.first, args.second)]
+        if args.check_only:
+            with tempfile.TemporaryDirectory(prefix="bridge-") as work_dir:
+                first, second = boundary_frames(*videos, work_dir)
+            _, difference, plain = analyse(first, second)
+            print(f"Difference: {plain:.1f}, {difference:.1f} after flow alignment (threshold {args.threshold})")
+            print("Close enough to bridge locally" if difference <= args.threshold else "Too different, use the API")
+            return
+        difference, frames = local_bridge(*videos, args.output, args.seconds,
+                                          threshold=None if args.force else args.threshold)
+    except (FileNotFoundError, FrameExtractionError) as e:
+        print(f"Error: {e}")
+        sys.exit(1)
+
+    if frames is None:
+        print(f"The clips differ by {difference:.1f} after flow alignment (threshold {args.threshold}); "
+              "use interpolate_videos.py, or --force")
+        sys.exit(2)
+    print(f"Saved {args.output} ({frames} frames, aligned difference {difference:.1f})")
+
+
+if __name__ == "__main__":
+    main()
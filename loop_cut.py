@@ -0,0 +1,143 @@
+import os
+import sys
+import argparse
+from pathlib import Path
+from collections import namedtuple
+import numpy as np
+from video_frames import FFMPEG, FrameExtractionError, run_tool, probe_video, read_frames, find_generation_video
+from job_ledger import JobLedger
+
+# --- Seamless Loop Cuts ---
+# loop=True can't be combined with start/end keyframes, so an orbit shot comes back with its last
+# frame close to, but not quite, its first. Rather than regenerating until one happens to close,
+# this finds the loop hidden inside the clip we already have:
+#
+#   1. every frame is decoded at 64px wide in greyscale (scaled by ffmpeg, piped out raw)
+#   2. the RMS difference between every pair of frames is one matrix product:
+#        |a - b|^2 = |a|^2 + |b|^2 - 2 a.b
+#   3. each candidate cut (loop from frame a up to frame b, where b looks like a) is scored over a
+#      few frames either side, summing the diagonals around (a, b), so the motion has to line up
+#      as well as the picture
+#   4. the best cut at least --min-seconds long is rendered, with the last half second crossfaded
+#      into the frames just before the loop's start so the seam is invisible
+#
+#   python loop_cut.py 9f1c...e2.mp4                  # -> 9f1c...e2_loop.mp4
+#   python loop_cut.py 9f1c...e2 --find-only          # a generation ID from the job ledger works too
+
+LoopCut = namedtuple("LoopCut", ["start", "end", "score", "whole_clip_score"])
+
+ANALYSIS_WIDTH = 64
+MATCH_WINDOW = 3  # frames either side of a cut that have to match too
+DEFAULT_CROSSFADE = 0.5  # seconds
+LOOP_CRF = "16"
+
+
+def frame_distances(frames):
+    # (n, h, w) frames -> (n, n) RMS pixel difference between every pair, on a 0-255 scale
+    flat = frames.reshape(len(frames), -1).astype(np.float32)
+    squared = np.einsum("ij,ij->i", flat, flat)
+    distances = squared[:, None] + squared[None, :] - 2 * (flat @ flat.T)
+    return np.sqrt(np.clip(distances, 0, None) / flat.shape[1])
+
+
+def cut_scores(distances, window=MATCH_WINDOW):
+    # scores[a, b]: mean distance between frames a+k and b+k for k in -window..window; inf where
+    # the window runs off either end of the clip
+    count = len(distances)
+    size = count - 2 * window
+    scores = np.full(distances.shape, np.inf, dtype=np.float32)
+    if size <= 0:
+        return scores
+    inner = np.zeros((size, size), dtype=np.float32)
+    for k in range(-window, window + 1):
+        inner += distances[window + k:window + k + size, window + k:window + k + size]
+    scores[window:window + size, window:window + size] = inner / (2 * window + 1)
+    return scores
+
+
+def find_loop(frames, min_frames, window=MATCH_WINDOW):
+    # The best loop at least min_frames long: play frames start..end-1, then start again
+    count = len(frames)
+    if min_frames >= count - 2 * window:
+        raise ValueError(f"The clip only has {count} frames, too few for a {min_frames} frame loop")
+    distances = frame_distances(frames)
+    scores = cut_scores(distances, window)
+    start, end = np.indices(scores.shape)
+    scores[end - start < min_frames] = np.inf
+    best = np.unravel_index(np.argmin(scores), scores.shape)
+    # For comparison: the seam if the whole clip were looped as it is
+    return LoopCut(int(best[0]), int(best[1]), float(scores[best]), float(distances[-1, 0]))
+
+
+def render_loop(video_path, cut, info, output_path, crossfade=DEFAULT_CROSSFADE):
+    # Write frames cut.start..cut.end-1 to output_path. The last `crossfade` seconds blend into the
+    # frames leading up to cut.start, so playback wraps around onto exactly what would come next.
+    fade = min(round(crossfade * info["fps"]), cut.start, cut.end - cut.start - 1)
+    body = f"trim=start_frame={cut.start}:end_frame={cut.end},setpts=PTS-STARTPTS"
+    if fade > 0:
+        graph = (
+            f"[0:v]split[body][lead];[body]{body}[main];"
+            f"[lead]trim=start_frame={cut.start - fade}:end_frame={cut.start},setpts=PTS-STARTPTS[tail];"
+            f"[main][tail]xfade=transition=fade:duration={fade / info['fps']:.6f}"
+            f":offset={(cut.end - cut.start - fade) / info['fps']:.6f},format=yuv420p[out]"
+        )
+    else:
+        graph = f"[0:v]{body},format=yuv420p[out]"
+
+    output_path = Path(output_path)
+    temporary = output_path.with_name(output_path.stem + ".tmp" + output_path.suffix)
+    try:
+        run_tool([
+            FFMPEG, "-v", "error", "-nostdin", "-y", "-i", str(video_path),
+            "-filter_complex", graph, "-map", "[out]",
+            "-c:v", "libx264", "-crf", LOOP_CRF, "-preset", "medium", "-movflags", "+faststart",
+            str(temporary),
+        ])
+        os.replace(temporary, output_path)
+    finally:
+        temporary.unlink(missing_ok=True)
+    return fade
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Find the most seamless loop inside a clip and cut it out.")
+    parser.add_argument("video", help="A video file, or a generation ID whose download is in the job ledger")
+    parser.add_argument("-o", "--output", help="Looping video (default: <name>_loop.mp4 in the current directory)")
+    parser.add_argument("--min-seconds", type=float, help="Shortest acceptable loop (default: half the clip)")
+    parser.add_argument("--crossfade", type=float, default=DEFAULT_CROSSFADE,
+                        help="Seconds blended at the seam, 0 for a hard cut")
+    parser.add_argument("--find-only", action="store_true", help="Report the loop point without rendering it")
+    args = parser.parse_args()
+
+    try:
+        video_path = Path(args.video)
+        if not video_path.exists():
+            video_path = find_generation_video(args.video, JobLedger())
+        info = probe_video(video_path)
+        height = max(2, round(ANALYSIS_WIDTH * info["height"] / info["width"] / 2) * 2)
+        frames = read_frames(video_path, ANALYSIS_WIDTH, height)
+        min_seconds = args.min_seconds if args.min_seconds is not None else len(frames) / info["fps"] / 2
+        cut = find_loop(frames, max(2, round(min_seconds * info["fps"])))
+    except (ValueError, FileNotFoundError, FrameExtractionError) as e:
+        print(f"Error: {e}")
+        sys.exit(1)
+
+    fps = info["fps"]
+    print(f"Best loop: frames {cut.start}-{cut.end - 1} ({cut.start / fps:.2f}s-{cut.end / fps:.2f}s, "
+          f"{(cut.end - cut.start) / fps:.2f}s long)")
+    print(f"Seam difference: {cut.score:.1f} (looping the whole clip: {cut.whole_clip_score:.1f}, 0-255 RMS)")
+    if args.find_only:
+        return
+
+    name = args.video if not Path(args.video).exists() else video_path.stem
+    output_path = Path(args.output) if args.output else Path.cwd() / f"{name}_loop.mp4"
+    try:
+        fade = render_loop(video_path, cut, info, output_path, crossfade=args.crossfade)
+    except FrameExtractionError as e:
+        print(f"Error: {e}")
+        sys.exit(1)
+    print(f"Saved {output_path} ({cut.end - cut.start} frames, {fade} crossfaded)")
+
+
+if __name__ == "__main__":
+    main()
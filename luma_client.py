@@ -0,0 +1,117 @@
+import os
+import threading
+from pathlib import Path
+import httpx
+import requests
+from requests.adapters import HTTPAdapter
+from dotenv import load_dotenv
+from lumaai import LumaAI, DefaultHttpxClient
+from rate_limiter import RateLimitedTransport
+
+# --- Shared Luma Client ---
+# Every script used to load .env, build its own LumaAI(...) and make bare requests.get calls,
+# so each API call and each download paid for a fresh TCP + TLS handshake.
+# This module owns the long-lived connections instead:
+#   - one pooled httpx client to api.lumalabs.ai, shared by the SDK and our raw API calls
+#     (e.g. the concept list)
+#   - one pooled requests session for the asset CDN, shared by every download
+# Both are created on first use and reused for the life of the process.
+
+current_script_dir = Path(__file__).resolve().parent
+env_path = current_script_dir / "env" / ".env"
+
+API_BASE_URL = "https://api.lumalabs.ai/dream-machine/v1/"
+# Set LUMA_BASE_URL (in the environment or env/.env) to point everything at another server,
+# e.g. the local mock in mock_luma_server.py
+
+# Enough keep-alive connections for a full batch of pollers + parallel ranged downloads
+MAX_CONNECTIONS = 32
+KEEPALIVE_EXPIRY = 120  # seconds an idle connection is kept open
+
+_lock = threading.Lock()
+_api_key = None
+_http_client = None
+_client = None
+_download_session = None
+
+
+def load_api_key():
+    # Same lookup every script used: env/.env next to the scripts, then the CWD
+    global _api_key
+    with _lock:
+        if _api_key is None:
+            if env_path.exists():
+                load_dotenv(dotenv_path=env_path)
+            else:
+                print(f"Warning: .env file not found at {env_path}")
+                load_dotenv()
+
+            api_key = os.getenv("LUMA_API_KEY")
+            if not api_key:
+                raise ValueError(f"API Key not found. Checked path: {env_path}")
+            _api_key = api_key
+        return _api_key
+
+
+def get_base_url():
+    # Read after load_api_key(), so a LUMA_BASE_URL in env/.env is picked up too
+    load_api_key()
+    return os.getenv("LUMA_BASE_URL") or API_BASE_URL
+
+
+def get_http_client():
+    # The pooled httpx client behind every call to the Luma API
+    global _http_client
+    load_api_key()  # env/.env first: the transport reads the account limits from the environment
+    with _lock:
+        if _http_client is None:
+            # Rate limiting, retries and the circuit breaker live in the transport,
+            # so they apply to the SDK and our raw calls alike (see rate_limiter.py)
+            _http_client = DefaultHttpxClient(
+                transport=RateLimitedTransport(
+                    limits=httpx.Limits(
+                        max_connections=MAX_CONNECTIONS,
+                        max_keepalive_connections=MAX_CONNECTIONS,
+                        keepalive_expiry=KEEPALIVE_EXPIRY,
+                    ),
+                ),
+            )
+        return _http_client
+
+
+def get_client():
+    # The one LumaAI client for this process, riding on the shared connection pool
+    global _client
+    api_key = load_api_key()
+    base_url = get_base_url()
+    http_client = get_http_client()
+    with _lock:
+        if _client is None:
+            # max_retries=0: retries are handled once, centrally, by the transport
+            _client = LumaAI(auth_token=api_key, base_url=base_url, http_client=http_client, max_retries=0)
+        return _client
+
+
+def api_request(method, path, headers=None, **kwargs):
+    # Raw call to an API endpoint the SDK doesn't cover the way we need (conditional requests etc.),
+    # sent over the same pooled connections as the SDK
+    all_headers = {
+        "accept": "application/json",
+        "authorization": f"Bearer {load_api_key()}",
+    }
+    all_headers.update(headers or {})
+    return get_http_client().request(method, get_base_url().rstrip("/") + "/" + path.lstrip("/"), headers=all_headers, **kwargs)
+
+
+def get_download_session():
+    # Pooled session for the asset CDN; the parallel downloader opens several
+    # connections to the same host, so the pool is sized to match
+    global _download_session
+    with _lock:
+        if _download_session is None:
+            session = requests.Session()
+            adapter = HTTPAdapter(pool_connections=4, pool_maxsize=MAX_CONNECTIONS)
+            session.mount("https://", adapter)
+            session.mount("http://", adapter)
+            _download_session = session
+        return _download_session
@@ -1,38 +1,37 @@
-import os
-import time
-import requests
 from pathlib import Path
-from dotenv import load_dotenv
-from lumaai import LumaAI
+from luma_client import get_client
+from model_capabilities import validate_request
+from status_poller import wait_for_generation
+from job_ledger import JobLedger
+from reference_images import get_reference_images
+from generation_timing import TimingTrace
+from asset_download import download_asset
+from output_store import OutputStore
 
 # --- Configuration ---
 # 1. Setup Paths
 # We use the current script directory as the base, just like list_allowed_concepts.py
 current_script_dir = Path(__file__).resolve().parent
 output_dir = current_script_dir / "merged_reference_images"
-env_path = current_script_dir / "env" / ".env"
 
 # Ensure output directory exists to save the result
 output_dir.mkdir(parents=True, exist_ok=True)
 
-# 2. Load Environment Variables
-# Using the same logic that worked in your reference file
-if env_path.exists():
-    load_dotenv(dotenv_path=env_path)
-else:
-    # Fallback: Just try loading without a path (searches CWD) or print explicit warning
-    print(f"Warning: .env file not found at {env_path}")
-    load_dotenv() 
+# 2. Initialize Client
+# luma_client loads env/.env once and hands back the shared client, so every API call
+# and download in this run reuses the same pooled connections
+client = get_client()
 
-# 3. Initialize Client
-api_key = os.getenv("LUMA_API_KEY")
-if not api_key:
-    raise ValueError(f"API Key not found. Checked path: {env_path}")
+# Every submitted generation is written to the local job ledger
+ledger = JobLedger()
 
-client = LumaAI(auth_token=api_key)
+# Per-stage timings (create, queued, dreaming, download speed...) are appended to generation_trace.jsonl
+timings = TimingTrace()
 
 # --- INPUTS ---
-# Replace these with your actual hosted URLs
+# Replace these with your actual hosted URLs, or with local files, e.g.
+#   face_image_url = str(current_script_dir / "face.png")
+# Local files are normalised and hosted for you (see reference_images.py), once per distinct image.
 face_image_url = "https://i.postimg.cc/Y2WQSFtw/face.png"
 pose_image_url = "https://i.postimg.cc/449p3cX4/pose.png"
 
@@ -57,10 +56,13 @@ def bake_character_image():
     print(f"   - Identity Source: {face_image_url}")
     print(f"   - Pose Source: {pose_image_url}")
 
+    save_path = output_dir / "merged_pharaoh.png"
+    timing = None
+
     try:
         # 1. Call the Image API
         # We use 'photon-1' for high-fidelity image synthesis
-        generation = client.generations.image.create(
+        image_spec = dict(
             prompt=image_prompt,
             model="photon-1",
             
@@ -87,40 +89,41 @@ def bake_character_image():
                 }
             ]
         )
+        timing = timings.start(image_spec, source="merge_reference_images.py")
+        image_spec = get_reference_images().resolve_spec(image_spec)
+        validate_request(image_spec)
+        timing.submitting()
+        generation = client.generations.image.create(**image_spec)
+        timing.submitted(generation)
         print(f"Generation started! ID: {generation.id}")
+        ledger.record_submitted(generation, image_spec, output_path=save_path, source="merge_reference_images.py")
 
         # 2. Poll for Completion
-        completed = False
-        while not completed:
-            gen_status = client.generations.get(id=generation.id)
-            
-            if gen_status.state == "completed":
-                completed = True
-                print("Image generation completed successfully.")
-                
-                # 3. Download and Save the Merged Image
-                final_image_url = gen_status.assets.image
-                save_path = output_dir / "merged_pharaoh.png"
-                
-                response = requests.get(final_image_url, stream=True)
-                if response.status_code == 200:
-                    with open(save_path, 'wb') as f:
-                        for chunk in response.iter_content(chunk_size=8192):
-                            f.write(chunk)
-                    print(f"SUCCESS: Merged image saved to: {save_path}")
-                    print(f"URL: {final_image_url}")
-                else:
-                    print(f"Error downloading image: {response.status_code}")
+        # The shared poller checks early and often for photon models, so we pick the image up quickly
+        gen_status = wait_for_generation(
+            client, generation, message="Processing... (Dreaming)", on_state_change=ledger.record_state,
+            on_check=timing.observed,
+        )
+        print("Image generation completed successfully.")
 
-            elif gen_status.state == "failed":
-                raise RuntimeError(f"Generation failed: {gen_status.failure_reason}")
-            
-            else:
-                print("Processing... (Dreaming)")
-                time.sleep(3)
+        # 3. Download and Save the Merged Image
+        final_image_url = gen_status.assets.image
+
+        timing.downloading()
+        download_asset(final_image_url, save_path)
+        timing.downloaded(save_path)
+        # merged_pharaoh.png stays where it is (other scripts point at it); the store gets a link to it
+        OutputStore().add(save_path, generation.id, image_spec, source="merge_reference_images.py",
+                          timings=timing.stages(), asset_url=final_image_url, move=False)
+        ledger.record_download(generation.id, save_path)
+        timing.finish()
+        print(f"SUCCESS: Merged image saved to: {save_path}")
+        print(f"URL: {final_image_url}")
 
     except Exception as e:
         print(f"An error occurred: {e}")
+        if timing is not None:
+            timing.finish(error=str(e))
 
 if __name__ == "__main__":
     bake_character_image()
\ No newline at end of file
@@ -0,0 +1,468 @@
+import re
+import json
+import time
+import uuid
+import random
+import argparse
+import threading
+import urllib.request
+from datetime import datetime, timezone
+from urllib.parse import urlsplit, parse_qs
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+from status_poller import expected_render_seconds
+
+# --- Mock Luma API ---
+# A local stand-in for the Dream Machine API, so the submit/poll/download code can be exercised
+# and benchmarked without spending credits. It implements:
+#   POST   /generations/video          create a video generation
+#   POST   /generations/image          create an image generation
+#   GET    /generations/{id}           status
+#   GET    /generations?limit=&offset= list, newest first
+#   DELETE /generations/{id}
+#   GET    /generations/concepts/list  (with ETag / 304)
+#   GET    /assets/{id}.mp4|.jpg       fake assets, with Range support (and optional 503s / truncation)
+#   GET    /_mock/stats                request counters for the benchmarks
+#
+# A create with a callback_url gets the generation POSTed to that URL when it starts dreaming and
+# when it finishes, like the real API. Deliveries can be dropped or duplicated on purpose.
+#
+# Jobs sit in "queued", then "dreaming" for roughly as long as the real model would take
+# (see status_poller.expected_render_seconds) times --time-scale, then complete or fail.
+#
+#   python mock_luma_server.py --port 8765 --time-scale 0.1 --failure-rate 0.05 --rate-limit-rate 0.02
+#   LUMA_BASE_URL=http://127.0.0.1:8765/dream-machine/v1/ python generate_video.py
+
+API_PREFIX = "/dream-machine/v1"
+MOCK_CONCEPTS = ["dolly_zoom", "orbit_left", "orbit_right", "pan_left", "pan_right", "zoom_in", "zoom_out"]
+FAILURE_REASONS = ["Prompt was flagged by moderation", "Internal render error"]
+
+
+class MockSettings:
+    # Everything that shapes how the mock behaves; the defaults are a fast, well-behaved API
+
+    def __init__(self, time_scale=0.1, queue_seconds=0.5, jitter=0.2, failure_rate=0.0, error_rate=0.0,
+                 rate_limit_rate=0.0, retry_after=1.0, response_latency=0.02, video_mb=8.0, image_kb=512.0,
+                 per_connection_mbps=0.0, ranges=True, callback_drop_rate=0.0, callback_duplicate_rate=0.0,
+                 asset_error_rate=0.0, truncate_rate=0.0, seed=None):
+        self.time_scale = time_scale            # multiplier on the real models' render times
+        self.queue_seconds = queue_seconds      # time spent "queued" before dreaming starts
+        self.jitter = jitter                    # +/- fraction of random variation on render time
+        self.failure_rate = failure_rate        # fraction of generations that end up "failed"
+        self.error_rate = error_rate            # fraction of API calls answered with a 500
+        self.rate_limit_rate = rate_limit_rate  # fraction of API calls answered with a 429
+        self.retry_after = retry_after          # Retry-After sent with those 429s
+        self.response_latency = response_latency  # seconds added to every API response
+        self.video_mb = video_mb
+        self.image_kb = image_kb
+        self.per_connection_mbps = per_connection_mbps  # bandwidth cap per asset connection, 0 = none
+        self.ranges = ranges
+        self.callback_drop_rate = callback_drop_rate            # fraction of callbacks never delivered
+        self.callback_duplicate_rate = callback_duplicate_rate  # fraction of callbacks delivered twice
+        self.asset_error_rate = asset_error_rate  # fraction of asset requests answered with a 503
+        self.truncate_rate = truncate_rate        # fraction of asset responses cut off half way
+        self.seed = seed
+
+
+class MockLumaAPI:
+    # The simulated backend: generations are timestamps, their state is worked out when asked for
+
+    def __init__(self, settings=None):
+        self.settings = settings or MockSettings()
+        self.random = random.Random(self.settings.seed)
+        self.base_url = None
+        self.generations = {}
+        self.order = []  # ids, oldest first
+        self.stats = {}
+        self._lock = threading.Lock()
+        # Asset bytes are a repeating random block, so any size can be served without storing it
+        self._block = self.random.randbytes(64 * 1024)
+
+    def count(self, endpoint):
+        with self._lock:
+            self.stats[endpoint] = self.stats.get(endpoint, 0) + 1
+
+    def roll(self, rate):
+        with self._lock:
+            return rate > 0 and self.random.random() < rate
+
+    def create(self, generation_type, body):
+        settings = self.settings
+        model = body.get("model") or ("photon-1" if generation_type == "image" else "ray-2")
+        render = expected_render_seconds(model, body.get("resolution"), body.get("duration"))
+        with self._lock:
+            render *= settings.time_scale * self.random.uniform(1 - settings.jitter, 1 + settings.jitter)
+            failed = settings.failure_rate > 0 and self.random.random() < settings.failure_rate
+            generation_id = str(uuid.uuid4())
+            size = int(settings.image_kb * 1024) if generation_type == "image" else int(settings.video_mb * 1024 * 1024)
+            self.generations[generation_id] = {
+                "id": generation_id,
+                "generation_type": generation_type,
+                "model": model,
+                "request": dict(body, model=model),
+                "created": time.time(),
+                "dreaming_at": time.monotonic() + settings.queue_seconds,
+                # Failures show up part way through the render, like a moderation or render error would
+                "done_at": time.monotonic() + settings.queue_seconds + (render * 0.3 if failed else render),
+                "failure_reason": self.random.choice(FAILURE_REASONS) if failed else None,
+                "size": size,
+                "deleted": False,
+            }
+            self.order.append(generation_id)
+        if body.get("callback_url"):
+            self.schedule_callbacks(generation_id, body["callback_url"])
+        return self.describe(generation_id)
+
+    def schedule_callbacks(self, generation_id, callback_url):
+        # One timer per state change (a thread each, fine at benchmark sizes). The extra millisecond
+        # makes sure describe() already reports the new state when the timer fires.
+        record = self.generations[generation_id]
+        for at in (record["dreaming_at"], record["done_at"]):
+            timer = threading.Timer(max(0.0, at - time.monotonic()) + 0.001, self.send_callback,
+                                    (generation_id, callback_url))
+            timer.daemon = True
+            timer.start()
+
+    def send_callback(self, generation_id, callback_url):
+        if self.lookup(generation_id) is None:
+            return
+        if self.roll(self.settings.callback_drop_rate):
+            self.count("callback_dropped")
+            return
+        body = json.dumps(self.describe(generation_id)).encode("utf-8")
+        for _ in range(2 if self.roll(self.settings.callback_duplicate_rate) else 1):
+            self.count("callback")
+            request = urllib.request.Request(
+                callback_url, data=body, headers={"Content-Type": "application/json"}, method="POST"
+            )
+            try:
+                urllib.request.urlopen(request, timeout=5).close()
+            except (OSError, ValueError):
+                self.count("callback_error")
+
+    def lookup(self, generation_id):
+        with self._lock:
+            record = self.generations.get(generation_id)
+            return None if record is None or record["deleted"] else record
+
+    def describe(self, generation_id):
+        # The Generation JSON the SDK expects, for the job's state right now
+        record = self.generations[generation_id]
+        now = time.monotonic()
+        assets = None
+        if now < record["dreaming_at"]:
+            state = "queued"
+        elif now < record["done_at"]:
+            state = "dreaming"
+        elif record["failure_reason"]:
+            state = "failed"
+        else:
+            state = "completed"
+            extension = "jpg" if record["generation_type"] == "image" else "mp4"
+            url = f"{self.base_url}/assets/{generation_id}.{extension}"
+            assets = {"image": url} if extension == "jpg" else {"video": url}
+
+        return {
+            "id": generation_id,
+            "state": state,
+            "failure_reason": record["failure_reason"] if state == "failed" else None,
+            "created_at": datetime.fromtimestamp(record["created"], timezone.utc).isoformat(),
+            "generation_type": record["generation_type"],
+            "model": record["model"],
+            "assets": assets,
+            "request": record["request"],
+        }
+
+    def list(self, limit, offset):
+        with self._lock:
+            live = [generation_id for generation_id in reversed(self.order) if not self.generations[generation_id]["deleted"]]
+        page = live[offset:offset + limit]
+        return {
+            "generations": [self.describe(generation_id) for generation_id in page],
+            "count": len(live),
+            "has_more": offset + limit < len(live),
+            "limit": limit,
+            "offset": offset,
+        }
+
+    def delete(self, generation_id):
+        with self._lock:
+            record = self.generations.get(generation_id)
+            if record is None or record["deleted"]:
+                return False
+            record["deleted"] = True
+            return True
+
+    def asset_bytes(self, start, length):
+        block = self._block
+        offset = start % len(block)
+        data = bytearray()
+        while len(data) < length:
+            data += block[offset:offset + length - len(data)]
+            offset = 0
+        return bytes(data)
+
+    def snapshot(self):
+        with self._lock:
+            states = {}
+            for generation_id in self.order:
+                state = self.describe(generation_id)["state"]
+                states[state] = states.get(state, 0) + 1
+            return {"requests": dict(self.stats), "generations": states}
+
+
+def make_handler(api):
+    settings = api.settings
+
+    class MockHandler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+
+        def log_message(self, format, *args):
+            pass
+
+        def send_json(self, status, payload, headers=None):
+            body = json.dumps(payload).encode("utf-8")
+            self.send_response(status)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(body)))
+            for key, value in (headers or {}).items():
+                self.send_header(key, value)
+            self.end_headers()
+            self.wfile.write(body)
+
+        def read_body(self):
+            length = int(self.headers.get("Content-Length") or 0)
+            if not length:
+                return {}
+            return json.loads(self.rfile.read(length))
+
+        def api_path(self):
+            # Accept both /dream-machine/v1/generations/... and bare /generations/...
+            path = urlsplit(self.path).path.rstrip("/")
+            if path.startswith(API_PREFIX):
+                path = path[len(API_PREFIX):]
+            return path
+
+        def check_api_call(self, endpoint):
+            # Shared behaviour of every API endpoint: auth, latency, injected 429s and 500s.
+            # Returns False if the request was already answered.
+            api.count(endpoint)
+            if not self.headers.get("Authorization", "").startswith("Bearer "):
+                self.send_json(401, {"detail": "Missing API key"})
+                return False
+            if settings.response_latency:
+                time.sleep(settings.response_latency)
+            if api.roll(settings.rate_limit_rate):
+                api.count("429")
+                self.send_json(429, {"detail": "Too many requests"}, {"Retry-After": f"{settings.retry_after:g}"})
+                return False
+            if api.roll(settings.error_rate):
+                api.count("500")
+                self.send_json(500, {"detail": "Internal server error"})
+                return False
+            return True
+
+        def do_POST(self):
+            path = self.api_path()
+            match = re.fullmatch(r"/generations(?:/(video|image))?", path)
+            if not match:
+                self.send_json(404, {"detail": "Not found"})
+                return
+            generation_type = match.group(1) or "video"
+            try:
+                body = self.read_body()
+            except ValueError:
+                self.send_json(400, {"detail": "Request body is not valid JSON"})
+                return
+            if not self.check_api_call(f"create_{generation_type}"):
+                return
+            if generation_type == "video" and not body.get("prompt") and not body.get("keyframes"):
+                self.send_json(400, {"detail": "A prompt or keyframes are required"})
+                return
+            if generation_type == "image" and not body.get("prompt"):
+                self.send_json(400, {"detail": "A prompt is required"})
+                return
+            self.send_json(201, api.create(generation_type, body))
+
+        def do_DELETE(self):
+            match = re.fullmatch(r"/generations/([\w-]+)", self.api_path())
+            if not match:
+                self.send_json(404, {"detail": "Not found"})
+                return
+            if not self.check_api_call("delete"):
+                return
+            if not api.delete(match.group(1)):
+                self.send_json(404, {"detail": "Generation not found"})
+                return
+            self.send_response(204)
+            self.send_header("Content-Length", "0")
+            self.end_headers()
+
+        def do_GET(self):
+            path = self.api_path()
+
+            if path.startswith("/assets/"):
+                self.send_asset(path)
+                return
+            if path == "/_mock/stats":
+                self.send_json(200, api.snapshot())
+                return
+
+            if path == "/generations/concepts/list":
+                if not self.check_api_call("concepts"):
+                    return
+                etag = '"mock-concepts-v1"'
+                if self.headers.get("If-None-Match") == etag:
+                    self.send_response(304)
+                    self.send_header("ETag", etag)
+                    self.send_header("Content-Length", "0")
+                    self.end_headers()
+                    return
+                self.send_json(200, MOCK_CONCEPTS, {"ETag": etag})
+                return
+
+            if path == "/generations":
+                if not self.check_api_call("list"):
+                    return
+                query = parse_qs(urlsplit(self.path).query)
+                limit = int(query.get("limit", ["10"])[0])
+                offset = int(query.get("offset", ["0"])[0])
+                self.send_json(200, api.list(limit, offset))
+                return
+
+            match = re.fullmatch(r"/generations/([\w-]+)", path)
+            if match:
+                if not self.check_api_call("get"):
+                    return
+                if api.lookup(match.group(1)) is None:
+                    self.send_json(404, {"detail": "Generation not found"})
+                    return
+                self.send_json(200, api.describe(match.group(1)))
+                return
+
+            self.send_json(404, {"detail": "Not found"})
+
+        def send_asset(self, path):
+            match = re.fullmatch(r"/assets/([\w-]+)\.(mp4|jpg)", path)
+            record = api.lookup(match.group(1)) if match else None
+            if record is None:
+                self.send_json(404, {"detail": "Asset not found"})
+                return
+            api.count("asset")
+            if api.roll(settings.asset_error_rate):
+                api.count("asset_503")
+                self.send_json(503, {"detail": "Service unavailable"})
+                return
+
+            size = record["size"]
+            start, end = 0, size - 1
+            range_match = re.match(r"bytes=(\d+)-(\d*)", self.headers.get("Range") or "")
+            if settings.ranges and range_match:
+                start = int(range_match.group(1))
+                if range_match.group(2):
+                    end = min(int(range_match.group(2)), size - 1)
+                if start >= size:
+                    self.send_response(416)
+                    self.send_header("Content-Range", f"bytes */{size}")
+                    self.send_header("Content-Length", "0")
+                    self.end_headers()
+                    return
+                self.send_response(206)
+                self.send_header("Content-Range", f"bytes {start}-{end}/{size}")
+            else:
+                self.send_response(200)
+
+            self.send_header("Content-Type", "image/jpeg" if match.group(2) == "jpg" else "video/mp4")
+            self.send_header("Content-Length", str(end - start + 1))
+            if settings.ranges:
+                self.send_header("Accept-Ranges", "bytes")
+            self.end_headers()
+
+            # Same 64 KB slicing as bench_download.py, to hold each connection to its bandwidth cap.
+            # A truncated response stops half way and drops the connection, like a flaky CDN.
+            if api.roll(settings.truncate_rate):
+                api.count("asset_truncated")
+                end = start + (end - start) // 2
+                self.close_connection = True
+            cap = settings.per_connection_mbps * 1e6
+            position = start
+            began = time.monotonic()
+            while position <= end:
+                data = api.asset_bytes(position, min(64 * 1024, end - position + 1))
+                try:
+                    self.wfile.write(data)
+                except (BrokenPipeError, ConnectionResetError):
+                    return
+                position += len(data)
+                if cap:
+                    ahead = (position - start) / cap - (time.monotonic() - began)
+                    if ahead > 0:
+                        time.sleep(ahead)
+
+    return MockHandler
+
+
+def serve_mock_api(settings=None, host="127.0.0.1", port=0):
+    # Start the mock in a background thread and return (server, api, base_url).
+    # Point the scripts at it with LUMA_BASE_URL=<base_url>.
+    api = MockLumaAPI(settings)
+    server = ThreadingHTTPServer((host, port), make_handler(api))
+    server.daemon_threads = True
+    api.base_url = f"http://{host}:{server.server_address[1]}"
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, api, f"{api.base_url}{API_PREFIX}/"
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Run a local mock of the Luma Dream Machine API.")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--time-scale", type=float, default=0.1, help="Multiplier on real render times (1 = realistic)")
+    parser.add_argument("--queue-seconds", type=float, default=0.5, help="Time each job spends queued")
+    parser.add_argument("--jitter", type=float, default=0.2, help="Random +/- fraction on render times")
+    parser.add_argument("--failure-rate", type=float, default=0.0, help="Fraction of generations that fail")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="Fraction of API calls answered with a 500")
+    parser.add_argument("--rate-limit-rate", type=float, default=0.0, help="Fraction of API calls answered with a 429")
+    parser.add_argument("--retry-after", type=float, default=1.0, help="Retry-After seconds sent with 429s")
+    parser.add_argument("--response-latency", type=float, default=0.02, help="Seconds added to every API response")
+    parser.add_argument("--video-mb", type=float, default=8.0, help="Size of fake video assets")
+    parser.add_argument("--image-kb", type=float, default=512.0, help="Size of fake image assets")
+    parser.add_argument("--per-connection-mbps", type=float, default=0.0, help="Asset bandwidth cap per connection (MB/s)")
+    parser.add_argument("--no-ranges", action="store_true", help="Ignore Range headers on assets")
+    parser.add_argument("--callback-drop-rate", type=float, default=0.0, help="Fraction of callbacks never delivered")
+    parser.add_argument("--callback-duplicate-rate", type=float, default=0.0, help="Fraction of callbacks sent twice")
+    parser.add_argument("--asset-error-rate", type=float, default=0.0, help="Fraction of asset requests answered with a 503")
+    parser.add_argument("--truncate-rate", type=float, default=0.0, help="Fraction of asset responses cut off half way")
+    parser.add_argument("--seed", type=int, help="Random seed, for repeatable runs")
+    args = parser.parse_args()
+
+    settings = MockSettings(
+        time_scale=args.time_scale,
+        queue_seconds=args.queue_seconds,
+        jitter=args.jitter,
+        failure_rate=args.failure_rate,
+        error_rate=args.error_rate,
+        rate_limit_rate=args.rate_limit_rate,
+        retry_after=args.retry_after,
+        response_latency=args.response_latency,
+        video_mb=args.video_mb,
+        image_kb=args.image_kb,
+        per_connection_mbps=args.per_connection_mbps,
+        ranges=not args.no_ranges,
+        callback_drop_rate=args.callback_drop_rate,
+        callback_duplicate_rate=args.callback_duplicate_rate,
+        asset_error_rate=args.asset_error_rate,
+        truncate_rate=args.truncate_rate,
+        seed=args.seed,
+    )
+    server, api, base_url = serve_mock_api(settings, args.host, args.port)
+    print(f"Mock Luma API listening on {base_url}")
+    print(f"Point the scripts at it with: export LUMA_BASE_URL={base_url}")
+    try:
+        while True:
+            time.sleep(3600)
+    except KeyboardInterrupt:
+        server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
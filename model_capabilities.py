@@ -0,0 +1,213 @@
+import difflib
+from collections import namedtuple
+
+# --- Model Capabilities ---
+# What each model accepts, checked locally before a request is sent. Without this, a 4k photon
+# request or a ray-2 loop with an end keyframe only fails after a create round trip, or worse,
+# after sitting in Luma's queue. validate_request() is a handful of dict and set lookups (a few
+# microseconds), so it runs before every submit, and `batch_generate.py --check` runs it over a
+# whole manifest without submitting anything.
+#
+# The table mirrors the create parameters of the lumaai SDK (1.21) and Luma's documented limits.
+# When Luma adds a model or option, update the table and bump CAPABILITIES_VERSION; the version is
+# quoted in every error so a stale table is easy to spot.
+#
+#   python model_capabilities.py                     # print the table
+
+CAPABILITIES_VERSION = "2025-06"
+
+ModelCapabilities = namedtuple("ModelCapabilities", [
+    "endpoint",             # "video" (client.generations.create) or "image" (client.generations.image.create)
+    "params",               # every request key the model accepts
+    "aspect_ratios",
+    "resolutions",          # () when the model has no resolution setting
+    "durations",
+    "loop_with_end_frame",  # loop=True implies the last frame is the first, so it can't also have a frame1
+    "max_references",       # image_ref / style_ref / character_ref (images per identity) / modify_image_ref
+    "weight_range",         # allowed (min, max) for reference weights
+])
+
+ASPECT_RATIOS = ("1:1", "16:9", "9:16", "4:3", "3:4", "21:9", "9:21")
+COMMON_PARAMS = ("model", "prompt", "aspect_ratio", "callback_url", "generation_type")
+VIDEO_PARAMS = COMMON_PARAMS + ("keyframes", "loop", "concepts", "resolution", "duration")
+IMAGE_PARAMS = COMMON_PARAMS + ("image_ref", "style_ref", "character_ref", "modify_image_ref", "format", "sync",
+                                "sync_timeout")
+
+RAY = ModelCapabilities(
+    endpoint="video",
+    params=frozenset(VIDEO_PARAMS),
+    aspect_ratios=ASPECT_RATIOS,
+    resolutions=("540p", "720p", "1080p", "4k"),
+    durations=("5s", "9s"),
+    loop_with_end_frame=False,
+    max_references={},
+    weight_range=None,
+)
+PHOTON = ModelCapabilities(
+    endpoint="image",
+    params=frozenset(IMAGE_PARAMS),
+    aspect_ratios=ASPECT_RATIOS,
+    resolutions=(),
+    durations=(),
+    loop_with_end_frame=False,
+    max_references={"image_ref": 4, "style_ref": 1, "character_ref": 4, "modify_image_ref": 1},
+    weight_range=(0.0, 1.0),
+)
+
+MODEL_CAPABILITIES = {
+    "ray-2": RAY,
+    "ray-flash-2": RAY,
+    "photon-1": PHOTON,
+    "photon-flash-1": PHOTON,
+}
+
+KEYFRAME_SLOTS = ("frame0", "frame1")
+IMAGE_FORMATS = ("jpg", "png")
+
+
+class InvalidRequestError(ValueError):
+    pass
+
+
+def _reference_problems(field, references, capabilities):
+    # image_ref / style_ref: a list of {"url", "weight"}; modify_image_ref: a single one
+    problems = []
+    if field == "modify_image_ref":
+        references = [references]
+    if not isinstance(references, list):
+        return [f"{field} must be a list of {{'url': ..., 'weight': ...}} objects"]
+    limit = capabilities.max_references[field]
+    if len(references) > limit:
+        problems.append(f"{field} takes at most {limit} image{'s' if limit > 1 else ''}, got {len(references)}")
+    low, high = capabilities.weight_range
+    for index, reference in enumerate(references):
+        name = field if field == "modify_image_ref" else f"{field}[{index}]"
+        if not isinstance(reference, dict) or not isinstance(reference.get("url"), str):
+            problems.append(f"{name} needs a 'url'")
+            continue
+        weight = reference.get("weight")
+        if weight is not None and (isinstance(weight, bool) or not isinstance(weight, (int, float))
+                                   or not low <= weight <= high):
+            problems.append(f"{name} weight must be between {low:g} and {high:g}, got {weight!r}")
+    return problems
+
+
+def _character_problems(character_ref, capabilities):
+    if not isinstance(character_ref, dict) or not character_ref:
+        return ["character_ref must look like {'identity0': {'images': [url, ...]}}"]
+    problems = []
+    limit = capabilities.max_references["character_ref"]
+    for identity, details in character_ref.items():
+        if identity != "identity0":
+            problems.append(f"character_ref only supports 'identity0', not '{identity}'")
+            continue
+        images = details.get("images") if isinstance(details, dict) else None
+        if not isinstance(images, list) or not images or not all(isinstance(image, str) for image in images):
+            problems.append("character_ref identity0 needs a non-empty 'images' list of URLs")
+        elif len(images) > limit:
+            problems.append(f"character_ref identity0 takes at most {limit} images, got {len(images)}")
+    return problems
+
+
+def _keyframe_problems(keyframes, loop, capabilities):
+    if not isinstance(keyframes, dict):
+        return ["keyframes must be an object with 'frame0' and/or 'frame1'"]
+    problems = []
+    for slot, frame in keyframes.items():
+        if slot not in KEYFRAME_SLOTS:
+            problems.append(f"unknown keyframe '{slot}' (expected frame0 or frame1)")
+        elif not isinstance(frame, dict):
+            problems.append(f"keyframe {slot} must be an object")
+        elif frame.get("type") == "image":
+            if not isinstance(frame.get("url"), str):
+                problems.append(f"image keyframe {slot} needs a 'url'")
+        elif frame.get("type") == "generation":
+            if not isinstance(frame.get("id"), str):
+                problems.append(f"generation keyframe {slot} needs an 'id'")
+        else:
+            problems.append(f"keyframe {slot} type must be 'image' or 'generation', got {frame.get('type')!r}")
+    if loop and "frame1" in keyframes and not capabilities.loop_with_end_frame:
+        problems.append("loop=True can't be combined with an end keyframe (frame1)")
+    return problems
+
+
+def request_problems(params):
+    # Everything wrong with a create request (SDK keyword arguments, without our own bookkeeping
+    # keys), as a list of messages; empty when it's fine. No network calls.
+    model = params.get("model")
+    capabilities = MODEL_CAPABILITIES.get(model)
+    if capabilities is None:
+        suggestions = difflib.get_close_matches(str(model), MODEL_CAPABILITIES, n=2)
+        hint = f" Did you mean: {', '.join(suggestions)}?" if suggestions else ""
+        return [f"unknown model {model!r}.{hint}"]
+
+    problems = []
+    unsupported = [key for key in params if key not in capabilities.params]
+    if unsupported:
+        problems.append(f"{model} doesn't take {', '.join(sorted(unsupported))}")
+
+    prompt = params.get("prompt")
+    if prompt is not None and not isinstance(prompt, str):
+        problems.append("prompt must be a string")
+    elif not prompt and (capabilities.endpoint == "image" or not params.get("keyframes")):
+        problems.append("a prompt is required" + (" (or keyframes)" if capabilities.endpoint == "video" else ""))
+
+    aspect_ratio = params.get("aspect_ratio")
+    if aspect_ratio is not None and aspect_ratio not in capabilities.aspect_ratios:
+        problems.append(f"aspect_ratio {aspect_ratio!r} isn't one of {', '.join(ASPECT_RATIOS)}")
+    if capabilities.resolutions and params.get("resolution") not in (None,) + capabilities.resolutions:
+        problems.append(f"{model} resolution must be one of {', '.join(capabilities.resolutions)}, "
+                        f"got {params['resolution']!r}")
+    if capabilities.durations and params.get("duration") not in (None,) + capabilities.durations:
+        problems.append(f"{model} duration must be one of {', '.join(capabilities.durations)}, "
+                        f"got {params['duration']!r}")
+
+    if capabilities.endpoint == "video":
+        loop = params.get("loop")
+        if loop is not None and not isinstance(loop, bool):
+            problems.append(f"loop must be true or false, got {loop!r}")
+        if params.get("keyframes") is not None:
+            problems.extend(_keyframe_problems(params["keyframes"], loop, capabilities))
+        concepts = params.get("concepts")
+        if concepts is not None and not isinstance(concepts, list):
+            problems.append("concepts must be a list")
+    else:
+        for field in ("image_ref", "style_ref", "modify_image_ref"):
+            if params.get(field) is not None:
+                problems.extend(_reference_problems(field, params[field], capabilities))
+        if params.get("character_ref") is not None:
+            problems.extend(_character_problems(params["character_ref"], capabilities))
+        if params.get("format") not in (None,) + IMAGE_FORMATS:
+            problems.append(f"format must be one of {', '.join(IMAGE_FORMATS)}, got {params['format']!r}")
+    return problems
+
+
+def validate_request(params):
+    # Raises InvalidRequestError listing every problem with the request
+    problems = request_problems(params)
+    if problems:
+        raise InvalidRequestError(
+            f"Invalid {params.get('model') or 'request'} request: {'; '.join(problems)} "
+            f"(model capabilities {CAPABILITIES_VERSION}, see model_capabilities.py)"
+        )
+
+
+def print_table():
+    print(f"Model capabilities {CAPABILITIES_VERSION}")
+    for model, capabilities in MODEL_CAPABILITIES.items():
+        print(f"\n{model} ({capabilities.endpoint})")
+        print(f"  aspect ratios: {', '.join(ASPECT_RATIOS)}")
+        if capabilities.resolutions:
+            print(f"  resolutions:   {', '.join(capabilities.resolutions)}")
+            print(f"  durations:     {', '.join(capabilities.durations)}")
+        if capabilities.endpoint == "video":
+            print(f"  loop with an end keyframe: {'yes' if capabilities.loop_with_end_frame else 'no'}")
+        low, high = capabilities.weight_range or (0, 0)
+        for field, limit in capabilities.max_references.items():
+            weights = "" if field == "character_ref" else f", weight {low:g}-{high:g}"
+            print(f"  {field}: up to {limit} image{'s' if limit > 1 else ''}{weights}")
+        print(f"  parameters:    {', '.join(sorted(capabilities.params))}")
+
+
+if __name__ == "__main__":
+    print_table()
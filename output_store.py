@@ -0,0 +1,430 @@
+import os
+import sys
+import json
+import time
+import shutil
+import sqlite3
+import hashlib
+import argparse
+import threading
+from pathlib import Path
+from datetime import datetime
+from concurrent.futures import ThreadPoolExecutor
+from job_ledger import JobLedger
+from video_frames import FrameExtractionError
+from perceptual_hash import hash_file, to_blob, HashIndex, DEFAULT_MAX_DISTANCE
+
+# --- Output Store ---
+# Every downloaded asset ends up here, instead of as a bare {generation.id}.mp4 in whatever
+# directory a script happened to be started from:
+#
+#   outputs/
+#     index.sqlite3                 query index over the sidecars
+#     3f/9a/3f9a...c1.mp4           the file itself, named and sharded by its SHA-256
+#     3f/9a/<generation id>.json    sidecar: spec, model, prompt, parent generations, timings, ...
+#
+# Files are content addressed, so an exact duplicate (the same asset saved twice) is stored once.
+# Each generation still gets its own sidecar next to the file. The sidecars are the source of
+# truth, and `python output_store.py reindex` rebuilds the index from them.
+#
+#   python output_store.py find pharaoh orbit --model ray-2 --since 2026-10-01
+#   python output_store.py find --parent <generation id>     # everything extended/interpolated from it
+#   python output_store.py show <generation id>
+#   python output_store.py import *.mp4 *.jpg                # adopt old {generation.id} files (specs from the ledger)
+#
+# Every asset also gets perceptual hashes (perceptual_hash.py) when it's added, so renders that
+# only look the same as something already paid for can be found too:
+#
+#   python output_store.py similar pharaoh_keyframe.jpg      # or a video, or a generation id
+#   python output_store.py hash                              # hash anything added without them
+
+current_script_dir = Path(__file__).resolve().parent
+DEFAULT_STORE_DIR = current_script_dir / "outputs"
+IMAGE_SUFFIXES = (".jpg", ".jpeg", ".png", ".webp")
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS assets (
+    generation_id   TEXT PRIMARY KEY,
+    sha256          TEXT NOT NULL,
+    path            TEXT NOT NULL,
+    kind            TEXT NOT NULL,
+    model           TEXT,
+    name            TEXT,
+    source          TEXT,
+    prompt          TEXT,
+    bytes           INTEGER NOT NULL,
+    created_at      REAL NOT NULL
+);
+CREATE TABLE IF NOT EXISTS parents (
+    generation_id   TEXT NOT NULL,
+    parent_id       TEXT NOT NULL,
+    PRIMARY KEY (generation_id, parent_id)
+);
+CREATE VIRTUAL TABLE IF NOT EXISTS prompts USING fts5(generation_id UNINDEXED, prompt);
+CREATE TABLE IF NOT EXISTS frame_hashes (
+    sha256          TEXT PRIMARY KEY,
+    frames          INTEGER NOT NULL,
+    phash           BLOB NOT NULL,
+    dhash           BLOB NOT NULL
+);
+CREATE INDEX IF NOT EXISTS assets_model ON assets (model, created_at);
+CREATE INDEX IF NOT EXISTS assets_created ON assets (created_at);
+CREATE INDEX IF NOT EXISTS assets_sha256 ON assets (sha256);
+CREATE INDEX IF NOT EXISTS parents_parent ON parents (parent_id);
+"""
+
+
+def file_sha256(path):
+    digest = hashlib.sha256()
+    with open(path, "rb") as file:
+        for chunk in iter(lambda: file.read(1024 * 1024), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def parent_generations(spec):
+    # Generations this one was made from: keyframes that reference an earlier generation
+    keyframes = (spec or {}).get("keyframes") or {}
+    return sorted({
+        frame["id"] for frame in keyframes.values()
+        if isinstance(frame, dict) and frame.get("type") == "generation" and frame.get("id")
+    })
+
+
+def fts_query(text):
+    # Every word must appear; quoted so punctuation in a prompt can't break the FTS syntax
+    return " ".join('"' + word.replace('"', '""') + '"' for word in text.split())
+
+
+class OutputStore:
+
+    def __init__(self, root=DEFAULT_STORE_DIR, perceptual_hashes=True):
+        self.root = Path(root)
+        # Hash each asset as it's added (keyframes only for videos, so it's quick)
+        self.perceptual_hashes = perceptual_hashes
+        self._hash_warned = False
+        self.root.mkdir(parents=True, exist_ok=True)
+        # One connection shared by the download threads, guarded by a lock (like the job ledger)
+        self._connection = sqlite3.connect(str(self.root / "index.sqlite3"), check_same_thread=False,
+                                           isolation_level=None)
+        self._connection.row_factory = sqlite3.Row
+        self._lock = threading.Lock()
+        with self._lock:
+            self._connection.execute("PRAGMA journal_mode=WAL")
+            self._connection.executescript(SCHEMA)
+
+    def close(self):
+        with self._lock:
+            self._connection.close()
+
+    def shard(self, sha256):
+        return self.root / sha256[:2] / sha256[2:4]
+
+    def add(self, path, generation_id, spec=None, source=None, timings=None, asset_url=None, parents=None, move=True):
+        # Put a downloaded file into the store and index it; returns where it now lives.
+        # parents adds generations the spec doesn't reference (e.g. a clip continued from a still of one).
+        # move=False leaves the original in place (the store gets a hard link or a copy).
+        path = Path(path)
+        sha256 = file_sha256(path)
+        shard = self.shard(sha256)
+        shard.mkdir(parents=True, exist_ok=True)
+        stored = shard / f"{sha256}{path.suffix.lower()}"
+
+        if stored.exists():
+            # Exact duplicate of something already stored
+            if move and path.resolve() != stored.resolve():
+                path.unlink()
+        elif move:
+            shutil.move(str(path), stored)
+        else:
+            temporary = stored.with_name(stored.name + ".tmp")
+            try:
+                os.link(path, temporary)
+            except OSError:
+                shutil.copy2(path, temporary)
+            os.replace(temporary, stored)
+
+        previous = self.get(generation_id)
+        if previous is not None and previous["sha256"] != sha256:
+            # Re-added with different content: its old sidecar would otherwise come back on reindex
+            (self.shard(previous["sha256"]) / f"{generation_id}.json").unlink(missing_ok=True)
+
+        spec = spec or {}
+        record = {
+            "generation_id": generation_id,
+            "sha256": sha256,
+            "path": str(stored.relative_to(self.root)),
+            "kind": "image" if stored.suffix in IMAGE_SUFFIXES else "video",
+            "model": spec.get("model"),
+            "name": spec.get("name"),
+            "source": source,
+            "prompt": spec.get("prompt"),
+            "bytes": stored.stat().st_size,
+            "created_at": time.time(),
+            "asset_url": asset_url,
+            "parents": sorted(set(parent_generations(spec)) | set(parents or [])),
+            "spec": spec,
+            "timings": timings,
+        }
+        sidecar = shard / f"{generation_id}.json"
+        temporary = sidecar.with_name(sidecar.name + ".tmp")
+        temporary.write_text(json.dumps(record, indent=2, default=str), encoding="utf-8")
+        os.replace(temporary, sidecar)
+        self._index(record)
+        if self.perceptual_hashes and not self.has_hashes(sha256):
+            try:
+                self.hash_asset(stored, sha256)
+            except (FrameExtractionError, OSError) as e:
+                # Not worth failing a download over; say so once, `output_store.py hash` retries later
+                if not self._hash_warned:
+                    self._hash_warned = True
+                    print(f"Warning: could not compute perceptual hashes for {stored} ({e})")
+        return stored
+
+    def _index(self, record):
+        generation_id = record["generation_id"]
+        with self._lock:
+            self._connection.execute("BEGIN")
+            try:
+                self._connection.execute(
+                    "INSERT OR REPLACE INTO assets (generation_id, sha256, path, kind, model, name, source, prompt, "
+                    "bytes, created_at) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                    tuple(record[key] for key in (
+                        "generation_id", "sha256", "path", "kind", "model", "name", "source", "prompt", "bytes",
+                        "created_at",
+                    )),
+                )
+                self._connection.execute("DELETE FROM parents WHERE generation_id = ?", (generation_id,))
+                self._connection.executemany(
+                    "INSERT INTO parents (generation_id, parent_id) VALUES (?, ?)",
+                    [(generation_id, parent) for parent in record["parents"]],
+                )
+                self._connection.execute("DELETE FROM prompts WHERE generation_id = ?", (generation_id,))
+                if record["prompt"]:
+                    self._connection.execute(
+                        "INSERT INTO prompts (generation_id, prompt) VALUES (?, ?)", (generation_id, record["prompt"])
+                    )
+                self._connection.execute("COMMIT")
+            except Exception:
+                self._connection.execute("ROLLBACK")
+                raise
+
+    def hash_asset(self, path, sha256):
+        # Store the perceptual hashes of a stored file (raises if it can't be decoded)
+        phashes, dhashes = hash_file(path)
+        with self._lock:
+            self._connection.execute(
+                "INSERT OR REPLACE INTO frame_hashes (sha256, frames, phash, dhash) VALUES (?, ?, ?, ?)",
+                (sha256, len(phashes), to_blob(phashes), to_blob(dhashes)),
+            )
+
+    def has_hashes(self, sha256):
+        with self._lock:
+            return self._connection.execute(
+                "SELECT 1 FROM frame_hashes WHERE sha256 = ?", (sha256,)
+            ).fetchone() is not None
+
+    def unhashed(self):
+        # (sha256, path) of stored files without perceptual hashes
+        with self._lock:
+            rows = self._connection.execute(
+                "SELECT DISTINCT sha256, path FROM assets WHERE sha256 NOT IN (SELECT sha256 FROM frame_hashes)"
+            ).fetchall()
+        return [(row["sha256"], self.root / row["path"]) for row in rows]
+
+    def hash_index(self):
+        # Every asset's perceptual hashes, keyed by sha256, ready for Hamming-distance searches
+        with self._lock:
+            rows = self._connection.execute("SELECT sha256, phash, dhash FROM frame_hashes").fetchall()
+        return HashIndex(rows)
+
+    def similar(self, path, max_distance=DEFAULT_MAX_DISTANCE, limit=20, index=None):
+        # Stored assets that look like the image or video at path: [(asset, phash distance, dhash distance)].
+        # An identical file (same sha256) is left out, find() already knows about those.
+        phashes, dhashes = hash_file(path)
+        own_sha256 = file_sha256(path)
+        index = index if index is not None else self.hash_index()
+        matches = [match for match in index.search(phashes, dhashes, max_distance, limit + 1) if match[0] != own_sha256]
+        results = []
+        for sha256, phash_distance, dhash_distance in matches[:limit]:
+            for asset in self.with_sha256(sha256):
+                results.append((asset, phash_distance, dhash_distance))
+        return results
+
+    def with_sha256(self, sha256):
+        with self._lock:
+            rows = self._connection.execute(
+                "SELECT * FROM assets WHERE sha256 = ? ORDER BY created_at DESC", (sha256,)
+            ).fetchall()
+        return [dict(row) for row in rows]
+
+    def get(self, generation_id):
+        with self._lock:
+            row = self._connection.execute(
+                "SELECT * FROM assets WHERE generation_id = ?", (generation_id,)
+            ).fetchone()
+        return dict(row) if row else None
+
+    def path_for(self, generation_id):
+        row = self.get(generation_id)
+        return self.root / row["path"] if row else None
+
+    def sidecar(self, generation_id):
+        row = self.get(generation_id)
+        if row is None:
+            return None
+        sidecar = self.shard(row["sha256"]) / f"{generation_id}.json"
+        return json.loads(sidecar.read_text(encoding="utf-8"))
+
+    def find(self, text=None, model=None, since=None, until=None, parent=None, limit=50):
+        # Newest first. text matches words in the prompt, since/until are timestamps,
+        # parent finds everything made from that generation.
+        sql = "SELECT assets.* FROM assets"
+        where = []
+        params = []
+        if text:
+            sql += " JOIN prompts ON prompts.generation_id = assets.generation_id"
+            where.append("prompts MATCH ?")
+            params.append(fts_query(text))
+        if model:
+            where.append("assets.model = ?")
+            params.append(model)
+        if since is not None:
+            where.append("assets.created_at >= ?")
+            params.append(since)
+        if until is not None:
+            where.append("assets.created_at < ?")
+            params.append(until)
+        if parent:
+            where.append("assets.generation_id IN (SELECT generation_id FROM parents WHERE parent_id = ?)")
+            params.append(parent)
+        if where:
+            sql += " WHERE " + " AND ".join(where)
+        sql += " ORDER BY assets.created_at DESC LIMIT ?"
+        params.append(limit)
+        with self._lock:
+            rows = self._connection.execute(sql, params).fetchall()
+        return [dict(row) for row in rows]
+
+    def reindex(self):
+        # Rebuild the index from the sidecars on disk
+        with self._lock:
+            self._connection.executescript("DELETE FROM assets; DELETE FROM parents; DELETE FROM prompts;")
+        count = 0
+        for sidecar in self.root.glob("*/*/*.json"):
+            self._index(json.loads(sidecar.read_text(encoding="utf-8")))
+            count += 1
+        return count
+
+
+def parse_date(value):
+    return datetime.strptime(value, "%Y-%m-%d").timestamp() if value else None
+
+
+def print_assets(store, assets):
+    print(f"{'created':<20} {'model':<15} {'generation id':<37} path")
+    print("-" * 30)
+    for asset in assets:
+        created = datetime.fromtimestamp(asset["created_at"]).strftime("%Y-%m-%d %H:%M:%S")
+        print(f"{created:<20} {asset['model'] or '':<15} {asset['generation_id']:<37} {store.root / asset['path']}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Query and maintain the indexed store of downloaded assets.")
+    parser.add_argument("--store", default=str(DEFAULT_STORE_DIR), help="Store directory")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    find = commands.add_parser("find", help="Search by prompt words, model, date or parent generation")
+    find.add_argument("words", nargs="*", help="Words that must all appear in the prompt")
+    find.add_argument("--model")
+    find.add_argument("--since", help="YYYY-MM-DD")
+    find.add_argument("--until", help="YYYY-MM-DD (exclusive)")
+    find.add_argument("--parent", help="Generation ID the results were extended/interpolated from")
+    find.add_argument("--limit", type=int, default=50)
+
+    show = commands.add_parser("show", help="Print an asset's sidecar")
+    show.add_argument("generation_id")
+
+    adopt = commands.add_parser("import", help="Move existing {generation.id}.mp4/.jpg files into the store")
+    adopt.add_argument("files", nargs="+")
+
+    commands.add_parser("reindex", help="Rebuild the index from the sidecars")
+
+    similar = commands.add_parser("similar", help="Find stored assets that look like an image, video or generation")
+    similar.add_argument("target", help="An image or video file, or the generation ID of a stored asset")
+    similar.add_argument("--max-distance", type=int, default=DEFAULT_MAX_DISTANCE,
+                         help="Bits (of 64) two frames' hashes may differ by")
+    similar.add_argument("--limit", type=int, default=20)
+
+    rehash = commands.add_parser("hash", help="Compute perceptual hashes for stored assets that have none")
+    rehash.add_argument("--workers", type=int, default=4)
+    args = parser.parse_args()
+
+    store = OutputStore(args.store)
+    if args.command == "find":
+        started = time.perf_counter()
+        assets = store.find(" ".join(args.words), args.model, parse_date(args.since), parse_date(args.until),
+                            args.parent, args.limit)
+        print_assets(store, assets)
+        print(f"{len(assets)} results in {(time.perf_counter() - started) * 1000:.1f} ms")
+
+    elif args.command == "show":
+        sidecar = store.sidecar(args.generation_id)
+        if sidecar is None:
+            print(f"Error: {args.generation_id} is not in the store")
+            sys.exit(1)
+        print(json.dumps(sidecar, indent=2))
+
+    elif args.command == "import":
+        # Old downloads are named after their generation; the ledger knows the spec that made them
+        ledger = JobLedger()
+        for file in args.files:
+            generation_id = Path(file).stem
+            job = ledger.get(generation_id)
+            spec = json.loads(job["spec"]) if job else None
+            stored = store.add(file, generation_id, spec, source=job["source"] if job else "import")
+            if job:
+                ledger.record_download(generation_id, stored)
+            print(f"{file} -> {stored}{'' if job else ' (not in the job ledger, no spec recorded)'}")
+
+    elif args.command == "reindex":
+        print(f"Indexed {store.reindex()} assets")
+
+    elif args.command == "similar":
+        target = Path(args.target)
+        if not target.exists():
+            target = store.path_for(args.target)
+            if target is None:
+                print(f"Error: {args.target} is neither a file nor a generation in the store")
+                sys.exit(1)
+        try:
+            index = store.hash_index()
+            started = time.perf_counter()
+            matches = store.similar(target, args.max_distance, args.limit, index=index)
+        except (FrameExtractionError, OSError) as e:
+            print(f"Error: could not hash {target} ({e})")
+            sys.exit(1)
+        print(f"{'phash':>5} {'dhash':>5}  {'model':<15} {'generation id':<37} path")
+        print("-" * 30)
+        for asset, phash_distance, dhash_distance in matches:
+            print(f"{phash_distance:>5} {dhash_distance:>5}  {asset['model'] or '':<15} {asset['generation_id']:<37} "
+                  f"{store.root / asset['path']}")
+        print(f"{len(matches)} near-duplicates among {len(index)} hashed assets "
+              f"in {(time.perf_counter() - started) * 1000:.1f} ms")
+
+    elif args.command == "hash":
+        pending = store.unhashed()
+        with ThreadPoolExecutor(max_workers=args.workers) as pool:
+            futures = {pool.submit(store.hash_asset, path, sha256): path for sha256, path in pending}
+        hashed = 0
+        for future, path in futures.items():
+            try:
+                future.result()
+                hashed += 1
+            except (FrameExtractionError, OSError) as e:
+                print(f"Could not hash {path} ({e})")
+        print(f"Hashed {hashed} of {len(pending)} assets")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,148 @@
+from pathlib import Path
+import numpy as np
+from PIL import Image, ImageOps
+from video_frames import read_frames
+
+# --- Perceptual Hashes ---
+# Near-duplicate detection for stills and clips. Unlike the SHA-256 the output store files assets
+# under, these hashes stay close when two renders merely *look* the same (a near-identical render of
+# the same prompt, a re-encode, a slightly different crop).
+#
+#   pHash  DCT of a 32x32 greyscale thumbnail; bit set where a low-frequency coefficient is above
+#          the median of the 8x8 lowest frequencies (excluding DC)
+#   dHash  9x8 thumbnail; bit set where a pixel is brighter than its left neighbour
+#
+# Both are 64 bits, packed into one uint64 per frame. Images get one hash of each. Videos get one
+# per sampled frame: only the keyframes are decoded (-skip_frame nokey), already scaled to 32x32 by
+# ffmpeg, so a 4K clip costs a fraction of a second. The DCT and resampling are matrix products
+# over the whole stack of frames at once.
+#
+# HashIndex holds every stored hash in flat uint64 arrays. A query is an XOR + popcount pass over
+# them per query frame, which takes milliseconds for 100k assets (~800k frame hashes).
+
+THUMBNAIL_SIZE = 32
+VIDEO_SAMPLES = 8  # frames hashed per video, spread evenly over its keyframes
+DEFAULT_MAX_DISTANCE = 10  # bits out of 64 that may differ for two frames to count as near-duplicates
+IMAGE_SUFFIXES = (".jpg", ".jpeg", ".png", ".webp")
+
+
+def dct_matrix(size):
+    # Orthonormal DCT-II basis: dct_matrix(n) @ x is the DCT of the column vector x
+    k = np.arange(size)[:, None]
+    n = np.arange(size)[None, :]
+    matrix = np.cos(np.pi * (2 * n + 1) * k / (2 * size)) * np.sqrt(2 / size)
+    matrix[0] /= np.sqrt(2)
+    return matrix.astype(np.float32)
+
+
+def area_matrix(out_size, in_size):
+    # Box-filter resampling as a matrix: each output sample is the mean of the input it covers
+    edges = np.linspace(0, in_size, out_size + 1)
+    left = np.arange(in_size)[None, :]
+    overlap = np.minimum(left + 1, edges[1:, None]) - np.maximum(left, edges[:-1, None])
+    weights = np.clip(overlap, 0, None)
+    return (weights / weights.sum(axis=1, keepdims=True)).astype(np.float32)
+
+
+DCT = dct_matrix(THUMBNAIL_SIZE)
+DHASH_ROWS = area_matrix(8, THUMBNAIL_SIZE)
+DHASH_COLUMNS = area_matrix(9, THUMBNAIL_SIZE)
+
+
+def pack_bits(bits):
+    # (n, 64) booleans -> (n,) uint64
+    return np.packbits(bits, axis=1).view(">u8").ravel().astype(np.uint64)
+
+
+def phash(thumbnails):
+    # (n, 32, 32) greyscale -> (n,) uint64
+    coefficients = (DCT @ thumbnails @ DCT.T)[:, :8, :8].reshape(len(thumbnails), 64)
+    median = np.median(coefficients[:, 1:], axis=1, keepdims=True)
+    return pack_bits(coefficients > median)
+
+
+def dhash(thumbnails):
+    # (n, 32, 32) greyscale -> (n,) uint64
+    small = DHASH_ROWS @ thumbnails @ DHASH_COLUMNS.T  # (n, 8, 9)
+    return pack_bits((small[:, :, 1:] > small[:, :, :-1]).reshape(len(thumbnails), 64))
+
+
+if hasattr(np, "bitwise_count"):
+    popcount = np.bitwise_count
+else:
+    BYTE_POPCOUNT = np.array([bin(byte).count("1") for byte in range(256)], dtype=np.uint8)
+
+    def popcount(values):
+        return BYTE_POPCOUNT[values.view(np.uint8)].reshape(len(values), 8).sum(axis=1, dtype=np.uint8)
+
+
+def image_thumbnails(path):
+    with Image.open(path) as image:
+        image = ImageOps.exif_transpose(image).convert("L")
+        image = image.resize((THUMBNAIL_SIZE, THUMBNAIL_SIZE), Image.Resampling.BOX)
+        return np.asarray(image, dtype=np.float32)[None]
+
+
+def video_thumbnails(path, samples=VIDEO_SAMPLES):
+    frames = read_frames(path, THUMBNAIL_SIZE, THUMBNAIL_SIZE, keyframes_only=True)
+    if len(frames) > samples:
+        frames = frames[np.linspace(0, len(frames) - 1, samples).round().astype(int)]
+    return frames.astype(np.float32)
+
+
+def hash_file(path):
+    # (phashes, dhashes): one of each for an image, one per sampled keyframe for a video
+    path = Path(path)
+    if path.suffix.lower() in IMAGE_SUFFIXES:
+        thumbnails = image_thumbnails(path)
+    else:
+        thumbnails = video_thumbnails(path)
+    return phash(thumbnails), dhash(thumbnails)
+
+
+def to_blob(hashes):
+    return np.asarray(hashes, dtype="<u8").tobytes()
+
+
+def from_blob(blob):
+    return np.frombuffer(blob, dtype="<u8").astype(np.uint64)
+
+
+class HashIndex:
+
+    def __init__(self, rows):
+        # rows: (key, phash blob, dhash blob) per asset, e.g. OutputStore.frame_hashes()
+        keys, phash_blobs, dhash_blobs = [], [], []
+        for key, phash_blob, dhash_blob in rows:
+            keys.append(key)
+            phash_blobs.append(phash_blob)
+            dhash_blobs.append(dhash_blob)
+        self.keys = keys
+        # Every frame hash of every asset end to end, decoded in one go; starts[i] is where asset
+        # i's frames begin
+        counts = np.fromiter((len(blob) // 8 for blob in phash_blobs), dtype=np.int64, count=len(keys))
+        self.starts = np.concatenate(([0], np.cumsum(counts)[:-1])) if keys else counts
+        self.phash = from_blob(b"".join(phash_blobs))
+        self.dhash = from_blob(b"".join(dhash_blobs))
+
+    def __len__(self):
+        return len(self.keys)
+
+    def distances(self, hashes, query):
+        # Per asset: the fewest differing bits between any of its frames and any query frame
+        nearest = np.full(len(hashes), 64, dtype=np.uint8)
+        for value in query:
+            np.minimum(nearest, popcount(hashes ^ value), out=nearest)
+        return np.minimum.reduceat(nearest, self.starts)
+
+    def search(self, phashes, dhashes, max_distance=DEFAULT_MAX_DISTANCE, limit=20):
+        # [(key, phash distance, dhash distance)], closest first. Both hashes have to agree, which
+        # keeps pHash's occasional false positives on flat, low-detail frames out.
+        if not self.keys:
+            return []
+        phash_distance = self.distances(self.phash, np.asarray(phashes, dtype=np.uint64))
+        dhash_distance = self.distances(self.dhash, np.asarray(dhashes, dtype=np.uint64))
+        matches = np.flatnonzero((phash_distance <= max_distance) & (dhash_distance <= max_distance))
+        total = phash_distance[matches].astype(np.int64) + dhash_distance[matches]
+        matches = matches[np.argsort(total, kind="stable")][:limit]
+        return [(self.keys[index], int(phash_distance[index]), int(dhash_distance[index])) for index in matches]
@@ -0,0 +1,103 @@
+import sys
+import json
+import argparse
+from datetime import datetime
+from luma_client import get_client
+from batch_generate import run_batch, default_output_dir
+from concept_catalog import refresh_concepts
+from generation_cache import GenerationCache
+from job_ledger import JobLedger
+from generation_timing import TimingTrace
+from reference_images import get_reference_images
+from output_store import OutputStore
+
+# --- Draft Promotion ---
+# `batch_generate.py --draft` and `generate_video.py --draft` render each spec at the cheap tier
+# (ray-flash-2 / 540p / 5s for video, photon-flash-1 for stills). The full spec is stored alongside
+# the draft in the job ledger. Once a draft looks right, this renders that full spec with the same
+# prompt, keyframes and concepts, so nothing is copied back into a script by hand.
+#
+#   python promote_draft.py                      # recent drafts, and what they were promoted to
+#   python promote_draft.py <draft id> [<id>...] # render the approved drafts at full quality
+#
+# Pipelines are promoted by re-running run_pipeline.py without --draft.
+
+
+def final_spec_for(job):
+    # The full quality spec a draft stood in for, tagged with the draft it was approved from
+    spec = json.loads(job["spec"])
+    final = spec.get("final_spec")
+    if final is None:
+        raise ValueError(f"{job['generation_id']} is not a draft")
+    keyframes = (final.get("keyframes") or {}).values()
+    if any(isinstance(frame, dict) and "node" in frame for frame in keyframes):
+        raise ValueError(
+            f"{job['generation_id']} is a pipeline node; re-run run_pipeline.py without --draft to promote it"
+        )
+    return dict(final, name=final.get("name") or job["generation_id"], draft_of=job["generation_id"])
+
+
+def list_drafts(ledger, limit):
+    print(f"{'submitted':<20} {'state':<11} {'name':<24} {'draft id':<37} promoted to")
+    print("-" * 30)
+    for job in ledger.drafts(limit):
+        submitted = datetime.fromtimestamp(job["submitted_at"]).strftime("%Y-%m-%d %H:%M:%S")
+        print(f"{submitted:<20} {job['state']:<11} {job['name'] or '':<24} {job['generation_id']:<37} "
+              f"{job['promoted_to'] or ''}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Render approved draft generations at their full quality settings.")
+    parser.add_argument("drafts", nargs="*", help="Generation IDs of the drafts to promote (none: list recent drafts)")
+    parser.add_argument("--limit", type=int, default=20, help="How many drafts the listing shows")
+    parser.add_argument("--output-dir", default=str(default_output_dir),
+                        help="Where assets are downloaded to (and left, with --no-store)")
+    parser.add_argument("--no-store", action="store_true", help="Leave downloads in --output-dir instead of the output store")
+    parser.add_argument("--no-cache", action="store_true", help="Don't read or write the generation cache")
+    parser.add_argument("--ledger", default=None, help="Path to the ledger database")
+    args = parser.parse_args()
+
+    ledger = JobLedger(args.ledger) if args.ledger else JobLedger()
+    if not args.drafts:
+        list_drafts(ledger, args.limit)
+        return
+
+    specs = []
+    for generation_id in args.drafts:
+        job = ledger.get(generation_id)
+        try:
+            if job is None:
+                raise ValueError(f"{generation_id} is not in the job ledger")
+            specs.append(final_spec_for(job))
+        except ValueError as e:
+            print(f"Error: {e}")
+            sys.exit(1)
+        if job["state"] != "downloaded":
+            print(f"Warning: draft {generation_id} is {job['state']}, promoting it anyway")
+
+    try:
+        refresh_concepts()
+    except Exception as e:
+        print(f"Warning: could not load the concept catalogue ({e})")
+
+    results = run_batch(
+        get_client(),
+        specs,
+        args.output_dir,
+        cache=None if args.no_cache else GenerationCache(),
+        ledger=ledger,
+        timings=TimingTrace(),
+        references=get_reference_images(),
+        store=None if args.no_store else OutputStore(),
+    )
+
+    failed = [result for result in results if result["error"]]
+    print("-" * 30)
+    for result in results:
+        print(f"- {result['name']}: {result['generation_id']} {result['error'] or result['path']}")
+    if failed:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,214 @@
+import os
+import time
+import random
+import threading
+from collections import namedtuple
+from email.utils import parsedate_to_datetime
+import httpx
+
+# --- API Rate Limiting ---
+# Every call to the Luma API goes through one transport (see luma_client.py), which:
+#   1. waits for a token from a token bucket sized to our account's request limits
+#      (plus a separate, slower bucket for generation creates)
+#   2. retries 429s, honouring Retry-After, for every call
+#   3. retries 5xx / connection errors with jittered backoff, but only for idempotent calls
+#      (GET/DELETE). A create that hit a 5xx may have gone through, so it's never replayed.
+#   4. opens a circuit breaker after a run of 5xx/connection failures: every caller then waits
+#      out a cooldown and a single probe request decides whether the API is healthy again
+# So a 500-job batch slows down when Luma pushes back instead of dying on the first 429.
+
+# Account limits, override with environment variables (or env/.env) to match your plan
+AccountLimits = namedtuple("AccountLimits", ["requests_per_second", "request_burst", "creates_per_minute", "create_burst"])
+
+MAX_RETRIES = 6
+BACKOFF_BASE = 1.0   # seconds
+BACKOFF_CAP = 60.0   # seconds
+MAX_RETRY_AFTER = 300.0
+
+BREAKER_FAILURE_THRESHOLD = 5
+BREAKER_COOLDOWN = 30.0  # seconds
+
+IDEMPOTENT_METHODS = ("GET", "HEAD", "OPTIONS", "DELETE")
+
+
+def account_limits():
+    # Read when a transport is built rather than at import, so values loaded from env/.env by
+    # luma_client.load_api_key() count too
+    return AccountLimits(
+        requests_per_second=float(os.getenv("LUMA_REQUESTS_PER_SECOND", "10")),
+        request_burst=int(os.getenv("LUMA_REQUEST_BURST", "20")),
+        creates_per_minute=float(os.getenv("LUMA_CREATES_PER_MINUTE", "20")),
+        create_burst=int(os.getenv("LUMA_CREATE_BURST", "5")),
+    )
+
+
+class TokenBucket:
+    # Classic token bucket: `rate` tokens per second, holding at most `capacity`.
+    # acquire() blocks until a token is available.
+
+    def __init__(self, rate, capacity):
+        self.rate = rate
+        self.capacity = capacity
+        self._tokens = float(capacity)
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def acquire(self):
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+                self._updated = now
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return
+                wait = (1 - self._tokens) / self.rate
+            time.sleep(wait)
+
+    def drain(self, seconds):
+        # A 429 means our idea of the limit was too generous: stop handing out tokens for a while
+        with self._lock:
+            self._tokens = min(self._tokens, -seconds * self.rate)
+
+
+class CircuitBreaker:
+    # closed -> (threshold consecutive failures) -> open -> (cooldown) -> half-open -> one probe
+    # A successful probe closes the breaker, a failed one re-opens it.
+
+    def __init__(self, failure_threshold=BREAKER_FAILURE_THRESHOLD, cooldown=BREAKER_COOLDOWN):
+        self.failure_threshold = failure_threshold
+        self.cooldown = cooldown
+        self.state = "closed"
+        self._failures = 0
+        self._opened_at = 0.0
+        self._probe_in_flight = False
+        self._lock = threading.Lock()
+
+    def before_call(self):
+        # Block (rather than fail) while the breaker is open, so callers simply slow down
+        while True:
+            with self._lock:
+                if self.state == "closed":
+                    return
+                remaining = self._opened_at + self.cooldown - time.monotonic()
+                if remaining <= 0 and not self._probe_in_flight:
+                    self.state = "half-open"
+                    self._probe_in_flight = True
+                    return
+            time.sleep(max(remaining, 0.5))
+
+    def record_success(self):
+        with self._lock:
+            if self.state != "closed":
+                print("API looks healthy again, circuit breaker closed")
+            self.state = "closed"
+            self._failures = 0
+            self._probe_in_flight = False
+
+    def record_failure(self):
+        with self._lock:
+            self._failures += 1
+            self._probe_in_flight = False
+            if self.state == "half-open" or self._failures >= self.failure_threshold:
+                if self.state != "open":
+                    print(f"API degraded ({self._failures} failures in a row), pausing requests for {self.cooldown:.0f}s")
+                self.state = "open"
+                self._opened_at = time.monotonic()
+
+
+def retry_after_seconds(response):
+    # Retry-After is either a number of seconds or an HTTP date (some gateways send retry-after-ms)
+    milliseconds = response.headers.get("retry-after-ms")
+    if milliseconds:
+        try:
+            return min(max(float(milliseconds) / 1000.0, 0.0), MAX_RETRY_AFTER)
+        except ValueError:
+            pass
+
+    value = response.headers.get("Retry-After")
+    if not value:
+        return None
+    try:
+        return min(max(float(value), 0.0), MAX_RETRY_AFTER)
+    except ValueError:
+        pass
+    try:
+        return min(max(parsedate_to_datetime(value).timestamp() - time.time(), 0.0), MAX_RETRY_AFTER)
+    except (TypeError, ValueError):
+        return None
+
+
+def backoff_seconds(attempt):
+    # "Full jitter" exponential backoff, so many waiting workers don't retry in lockstep
+    return random.uniform(0, min(BACKOFF_CAP, BACKOFF_BASE * 2 ** attempt))
+
+
+def is_create(request):
+    return request.method == "POST" and request.url.path.rstrip("/").endswith(
+        ("/generations", "/generations/video", "/generations/image")
+    )
+
+
+class RateLimitedTransport(httpx.HTTPTransport):
+    # httpx transport that applies the token buckets, retries and circuit breaker to every request
+
+    def __init__(self, request_bucket=None, create_bucket=None, breaker=None, max_retries=MAX_RETRIES, **kwargs):
+        super().__init__(**kwargs)
+        limits = account_limits()
+        self.request_bucket = request_bucket or TokenBucket(limits.requests_per_second, limits.request_burst)
+        self.create_bucket = create_bucket or TokenBucket(limits.creates_per_minute / 60.0, limits.create_burst)
+        self.breaker = breaker or CircuitBreaker()
+        self.max_retries = max_retries
+
+        # Stats for the benchmarks / timing reports
+        self.throttled = 0
+        self.retried = 0
+
+    def handle_request(self, request):
+        idempotent = request.method in IDEMPOTENT_METHODS
+        attempt = 0
+        while True:
+            self.breaker.before_call()
+            if is_create(request):
+                self.create_bucket.acquire()
+            self.request_bucket.acquire()
+
+            try:
+                response = super().handle_request(request)
+            except (httpx.ConnectError, httpx.ConnectTimeout) as e:
+                # The request never reached the server, so even a create is safe to replay
+                self.breaker.record_failure()
+                if attempt >= self.max_retries:
+                    raise
+                wait = backoff_seconds(attempt)
+                print(f"Connection to the Luma API failed ({e}), retrying in {wait:.1f}s...")
+            except httpx.TransportError:
+                self.breaker.record_failure()
+                if not idempotent or attempt >= self.max_retries:
+                    raise
+                wait = backoff_seconds(attempt)
+            else:
+                if response.status_code == 429:
+                    # Rejected before it was processed: safe to retry any call
+                    self.breaker.record_success()
+                    self.throttled += 1
+                    wait = retry_after_seconds(response) or backoff_seconds(attempt)
+                    self.request_bucket.drain(wait)
+                    if is_create(request):
+                        self.create_bucket.drain(wait)
+                elif response.status_code >= 500:
+                    self.breaker.record_failure()
+                    if not idempotent:
+                        return response
+                    wait = retry_after_seconds(response) or backoff_seconds(attempt)
+                else:
+                    self.breaker.record_success()
+                    return response
+
+                if attempt >= self.max_retries:
+                    return response
+                response.close()
+
+            attempt += 1
+            self.retried += 1
+            time.sleep(wait)
@@ -0,0 +1,329 @@
+import io
+import os
+import sys
+import json
+import shutil
+import hashlib
+import argparse
+import threading
+import functools
+from pathlib import Path
+from urllib.parse import urlsplit
+from urllib.request import url2pathname
+from concurrent.futures import ProcessPoolExecutor
+from http.server import ThreadingHTTPServer, SimpleHTTPRequestHandler
+from PIL import Image, ImageOps, ImageCms
+
+# --- Local Reference Images ---
+# Keyframes, image_ref / style_ref / character_ref images used to be uploaded to postimg by hand
+# and pasted into the scripts as URLs. Now a spec can point at local files instead:
+#   1. each file is normalised in a process pool: EXIF rotation applied, keyframes cropped to the
+#      video's aspect ratio, downscaled to MAX_LONG_EDGE, metadata stripped, re-encoded
+#   2. the result is uploaded through a pluggable StorageBackend
+#   3. content hash -> hosted URL is cached in reference_cache/index.json, so an image reused
+#      across hundreds of jobs (or runs) is processed and uploaded exactly once
+#
+# The default backend copies files into REFERENCE_UPLOAD_DIR, which must be served at
+# REFERENCE_BASE_URL (any static web server or synced bucket). For local testing:
+#   python reference_images.py face.png pose.png --serve 8800
+
+current_script_dir = Path(__file__).resolve().parent
+DEFAULT_CACHE_DIR = current_script_dir / "reference_cache"
+
+MAX_LONG_EDGE = 2048  # larger references don't improve results, they just upload slower
+JPEG_QUALITY = 92
+
+ASPECT_RATIOS = {
+    "1:1": (1, 1), "3:4": (3, 4), "4:3": (4, 3), "9:16": (9, 16),
+    "16:9": (16, 9), "9:21": (9, 21), "21:9": (21, 9),
+}
+
+
+def is_local_reference(value):
+    # A plain path or a file:// URL. Anything else with a scheme (https:, data:, gs://, s3://...) is
+    # already hosted somewhere and passed through untouched. A one-letter scheme is a Windows drive.
+    if isinstance(value, Path):
+        return True
+    if not isinstance(value, str) or not value:
+        return False
+    scheme = urlsplit(value).scheme
+    return not scheme or len(scheme) == 1 or scheme.lower() == "file"
+
+
+def local_path(value):
+    if isinstance(value, str) and urlsplit(value).scheme.lower() == "file":
+        return Path(url2pathname(urlsplit(value).path))
+    return Path(value)
+
+
+def normalize_image(source_path, output_path, aspect_ratio=None, max_long_edge=MAX_LONG_EDGE, quality=JPEG_QUALITY):
+    # Runs in a worker process. Writes a clean copy of source_path to output_path (extension
+    # decides the format) and returns it. Nothing from the original file's metadata survives.
+    with Image.open(source_path) as original:
+        image = ImageOps.exif_transpose(original)
+        if image.mode not in ("RGB", "RGBA"):
+            image = image.convert("RGBA" if "transparency" in original.info or "A" in image.mode else "RGB")
+
+        icc_profile = original.info.get("icc_profile")
+        if icc_profile:
+            # The profile is about to be stripped, so bake it into plain sRGB pixels first
+            try:
+                image = ImageCms.profileToProfile(
+                    image, ImageCms.ImageCmsProfile(io.BytesIO(icc_profile)), ImageCms.createProfile("sRGB"),
+                    outputMode=image.mode,
+                )
+            except ImageCms.PyCMSError:
+                pass
+
+        if aspect_ratio:
+            # Keyframes become video frames: centre-crop to the video's aspect ratio
+            width, height = ASPECT_RATIOS[aspect_ratio]
+            target_height = min(image.height, round(image.width * height / width))
+            target_width = min(image.width, round(target_height * width / height))
+            image = ImageOps.fit(image, (target_width, target_height), Image.Resampling.LANCZOS)
+
+        if max(image.size) > max_long_edge:
+            scale = max_long_edge / max(image.size)
+            image = image.resize((round(image.width * scale), round(image.height * scale)), Image.Resampling.LANCZOS)
+
+        # A fresh image object carries no EXIF, ICC, XMP or text chunks
+        clean = Image.new(image.mode, image.size)
+        clean.paste(image)
+        buffer = io.BytesIO()
+        if Path(output_path).suffix == ".png":
+            clean.save(buffer, format="PNG", optimize=True)
+        else:
+            clean.convert("RGB").save(buffer, format="JPEG", quality=quality, optimize=True)
+
+    temporary = Path(f"{output_path}.tmp{os.getpid()}")
+    temporary.write_bytes(buffer.getvalue())
+    os.replace(temporary, output_path)
+    return output_path
+
+
+def _has_alpha(source_path):
+    with Image.open(source_path) as image:
+        return image.mode in ("RGBA", "LA", "PA") or "transparency" in image.info
+
+
+class StorageBackend:
+    # Where normalised references are hosted. upload() must return a URL Luma can fetch.
+    # The name is part of the cache key, so switching backends re-uploads.
+    name = "base"
+
+    def upload(self, path, object_name):
+        raise NotImplementedError
+
+
+class LocalDirectoryBackend(StorageBackend):
+    # Copies files into a directory that something else serves at base_url
+    # (serve_directory() below, nginx, a synced bucket...)
+
+    def __init__(self, directory, base_url):
+        self.directory = Path(directory)
+        self.directory.mkdir(parents=True, exist_ok=True)
+        self.base_url = base_url.rstrip("/")
+        self.name = f"local:{self.base_url}"
+
+    def upload(self, path, object_name):
+        destination = self.directory / object_name
+        if not destination.exists():
+            temporary = destination.with_name(destination.name + ".tmp")
+            shutil.copyfile(path, temporary)
+            os.replace(temporary, destination)
+        return f"{self.base_url}/{object_name}"
+
+
+class _QuietHandler(SimpleHTTPRequestHandler):
+    def log_message(self, format, *args):
+        pass
+
+
+def serve_directory(directory, port=0, host="127.0.0.1"):
+    # Serve a LocalDirectoryBackend directory over HTTP from a background thread; returns (server, base_url)
+    handler = functools.partial(_QuietHandler, directory=str(directory))
+    server = ThreadingHTTPServer((host, port), handler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, f"http://{host}:{server.server_address[1]}"
+
+
+def default_backend():
+    upload_dir = os.getenv("REFERENCE_UPLOAD_DIR")
+    base_url = os.getenv("REFERENCE_BASE_URL")
+    if not upload_dir or not base_url:
+        raise ValueError(
+            "Local reference images need somewhere to be hosted: set REFERENCE_UPLOAD_DIR and REFERENCE_BASE_URL "
+            "(or pass a StorageBackend)"
+        )
+    return LocalDirectoryBackend(upload_dir, base_url)
+
+
+class ReferenceImages:
+    # Turns local image paths into hosted URLs, normalising and uploading each distinct image once
+
+    def __init__(self, backend=None, cache_dir=DEFAULT_CACHE_DIR, max_workers=None, max_long_edge=MAX_LONG_EDGE):
+        self.backend = backend
+        self.cache_dir = Path(cache_dir)
+        self.cache_dir.mkdir(parents=True, exist_ok=True)
+        self.index_path = self.cache_dir / "index.json"
+        self.max_workers = max_workers
+        self.max_long_edge = max_long_edge
+        self._lock = threading.Lock()
+        self._hashes = {}  # (path, size, mtime) -> sha256 of the file, so reused files are read once
+        self._index = json.loads(self.index_path.read_text(encoding="utf-8")) if self.index_path.exists() else {}
+
+    def _file_hash(self, path):
+        stat = path.stat()
+        marker = (str(path), stat.st_size, stat.st_mtime_ns)
+        if marker not in self._hashes:
+            digest = hashlib.sha256()
+            with open(path, "rb") as file:
+                for block in iter(lambda: file.read(1024 * 1024), b""):
+                    digest.update(block)
+            self._hashes[marker] = digest.hexdigest()
+        return self._hashes[marker]
+
+    def _key(self, path, aspect_ratio):
+        # Same file + same normalisation = same key, whatever the file is called
+        settings = f"{aspect_ratio or 'original'}:{self.max_long_edge}:{JPEG_QUALITY}"
+        return hashlib.sha256(f"{self._file_hash(path)}:{settings}".encode()).hexdigest()[:32]
+
+    def _save_index(self):
+        temporary = self.index_path.with_name(self.index_path.name + ".tmp")
+        temporary.write_text(json.dumps(self._index, indent=2), encoding="utf-8")
+        os.replace(temporary, self.index_path)
+
+    def resolve(self, references):
+        # references: iterable of (path, aspect_ratio or None). Returns {(path, aspect_ratio): url}.
+        # URLs are passed through untouched.
+        if self.backend is None:
+            self.backend = default_backend()
+
+        urls = {}
+        pending = {}
+        with self._lock:
+            for source, aspect_ratio in set(references):
+                if not is_local_reference(source):
+                    urls[(source, aspect_ratio)] = source
+                    continue
+                path = local_path(source).expanduser().resolve()
+                if not path.exists():
+                    raise FileNotFoundError(f"Reference image not found: {source}")
+                key = self._key(path, aspect_ratio)
+                entry = self._index.get(f"{self.backend.name}:{key}")
+                if entry:
+                    urls[(source, aspect_ratio)] = entry["url"]
+                else:
+                    pending.setdefault(key, (path, aspect_ratio, []))[2].append((source, aspect_ratio))
+
+            if not pending:
+                return urls
+
+            # Normalise every new image in parallel; decoding and resampling big photos is CPU bound
+            jobs = {}
+            with ProcessPoolExecutor(max_workers=self.max_workers) as pool:
+                for key, (path, aspect_ratio, _) in pending.items():
+                    extension = ".png" if _has_alpha(path) and not aspect_ratio else ".jpg"
+                    output_path = self.cache_dir / f"{key}{extension}"
+                    jobs[key] = pool.submit(
+                        normalize_image, str(path), str(output_path), aspect_ratio, self.max_long_edge
+                    )
+
+            for key, future in jobs.items():
+                normalized = Path(future.result())
+                path, aspect_ratio, wanted = pending[key]
+                url = self.backend.upload(normalized, normalized.name)
+                self._index[f"{self.backend.name}:{key}"] = {
+                    "url": url,
+                    "source": str(path),
+                    "aspect_ratio": aspect_ratio,
+                    "bytes": normalized.stat().st_size,
+                }
+                print(f"Uploaded reference image {path.name} -> {url}")
+                for reference in wanted:
+                    urls[reference] = url
+            self._save_index()
+        return urls
+
+    def url_for(self, source, aspect_ratio=None):
+        return self.resolve([(source, aspect_ratio)])[(source, aspect_ratio)]
+
+    def resolve_spec(self, spec):
+        # Return a copy of a generation spec with every local image path replaced by its hosted URL.
+        # Keyframes are cropped to the spec's aspect ratio; the other references keep their shape.
+        spec = json.loads(json.dumps(spec, default=str))
+        aspect_ratio = spec.get("aspect_ratio")
+        slots = []  # (container, key, aspect_ratio) for every image URL field in the spec
+
+        for frame in (spec.get("keyframes") or {}).values():
+            if isinstance(frame, dict) and frame.get("type") == "image":
+                slots.append((frame, "url", aspect_ratio if aspect_ratio in ASPECT_RATIOS else None))
+        for field in ("image_ref", "style_ref"):
+            for reference in spec.get(field) or []:
+                slots.append((reference, "url", None))
+        if isinstance(spec.get("modify_image_ref"), dict):
+            slots.append((spec["modify_image_ref"], "url", None))
+        for identity in (spec.get("character_ref") or {}).values():
+            images = identity.get("images") or []
+            for index in range(len(images)):
+                slots.append((images, index, None))
+
+        # An entry without a url is left for model_capabilities.py to complain about
+        slots = [(container, key, ratio) for container, key, ratio in slots
+                 if is_local_reference(container.get(key) if isinstance(container, dict) else container[key])]
+        if not slots:
+            return spec
+        urls = self.resolve((container[key], ratio) for container, key, ratio in slots)
+        for container, key, ratio in slots:
+            container[key] = urls[(container[key], ratio)]
+        return spec
+
+
+_default = None
+_default_lock = threading.Lock()
+
+
+def get_reference_images():
+    # Shared resolver for the scripts, using the backend configured in the environment
+    global _default
+    with _default_lock:
+        if _default is None:
+            _default = ReferenceImages()
+        return _default
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Normalise and upload local reference images, printing their URLs.")
+    parser.add_argument("images", nargs="+", help="Local image files")
+    parser.add_argument("--aspect-ratio", choices=sorted(ASPECT_RATIOS), help="Crop to this aspect ratio (for keyframes)")
+    parser.add_argument("--upload-dir", default=os.getenv("REFERENCE_UPLOAD_DIR"), help="LocalDirectoryBackend directory")
+    parser.add_argument("--base-url", default=os.getenv("REFERENCE_BASE_URL"), help="URL the upload directory is served at")
+    parser.add_argument("--serve", type=int, metavar="PORT", help="Serve the upload directory on this port (for testing)")
+    args = parser.parse_args()
+
+    server = None
+    upload_dir = Path(args.upload_dir or DEFAULT_CACHE_DIR / "uploads")
+    base_url = args.base_url
+    if args.serve is not None:
+        upload_dir.mkdir(parents=True, exist_ok=True)
+        server, base_url = serve_directory(upload_dir, args.serve)
+    if not base_url:
+        print("Set --base-url (or REFERENCE_BASE_URL) to where the upload directory is served, or use --serve")
+        sys.exit(1)
+
+    references = ReferenceImages(LocalDirectoryBackend(upload_dir, base_url))
+    urls = references.resolve((image, args.aspect_ratio) for image in args.images)
+    for image in args.images:
+        print(f"{image}: {urls[(image, args.aspect_ratio)]}")
+
+    if server is not None:
+        print(f"Serving {upload_dir} at {base_url} (Ctrl+C to stop)")
+        try:
+            threading.Event().wait()
+        except KeyboardInterrupt:
+            server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,121 @@
+import sys
+import json
+import argparse
+from pathlib import Path
+from datetime import datetime
+from concurrent.futures import ThreadPoolExecutor
+from luma_client import get_client
+from batch_generate import is_image_spec
+from status_poller import StatusPoller, TERMINAL_STATES, log_poll_error
+from asset_download import download_asset, download_asset_parallel
+from job_ledger import JobLedger
+from output_store import OutputStore
+
+# --- Resume ---
+# Picks up every job in the ledger that never made it to disk:
+#   - still queued/dreaming   -> reattach the poller and download when it finishes
+#   - completed, not on disk  -> download it now
+# Nothing is ever re-submitted, so a killed script never costs a second generation.
+
+
+def output_path_for(job):
+    if job["output_path"]:
+        return Path(job["output_path"])
+    extension = "jpg" if is_image_spec(json.loads(job["spec"])) else "mp4"
+    return Path.cwd() / f"{job['generation_id']}.{extension}"
+
+
+def download_finished(generation, job, ledger, store=None):
+    save_path = output_path_for(job)
+    save_path.parent.mkdir(parents=True, exist_ok=True)
+    spec = json.loads(job["spec"])
+    asset_url = generation.assets.image if is_image_spec(spec) else generation.assets.video
+    if is_image_spec(spec):
+        download_asset(asset_url, save_path)
+    else:
+        download_asset_parallel(asset_url, save_path)
+    if store is not None:
+        save_path = store.add(save_path, generation.id, spec, source=job["source"], asset_url=asset_url)
+    ledger.record_download(generation.id, save_path)
+    print(f"[{job['name'] or job['generation_id']}] File downloaded as {save_path}")
+    return save_path
+
+
+def list_jobs(ledger, limit):
+    print(f"{'submitted':<20} {'state':<11} {'model':<15} {'generation id':<37} output")
+    print("-" * 30)
+    for job in ledger.recent(limit):
+        submitted = datetime.fromtimestamp(job["submitted_at"]).strftime("%Y-%m-%d %H:%M:%S")
+        print(f"{submitted:<20} {job['state']:<11} {job['model'] or '':<15} {job['generation_id']:<37} {job['output_path'] or ''}")
+
+
+def resume(client, ledger, download_workers=4, store=None):
+    jobs = {job["generation_id"]: job for job in ledger.unfinished()}
+    if not jobs:
+        print("Nothing to resume, every job in the ledger is downloaded, failed or cancelled.")
+        return 0
+
+    print(f"Resuming {len(jobs)} jobs from {ledger.path}")
+    poller = StatusPoller(client, on_state_change=ledger.record_state, on_error=log_poll_error)
+    failures = 0
+
+    with ThreadPoolExecutor(max_workers=download_workers) as pool:
+        downloads = []
+
+        def handle(generation):
+            nonlocal failures
+            job = jobs[generation.id]
+            if generation.state == "failed":
+                failures += 1
+                print(f"[{job['name'] or generation.id}] Generation failed: {generation.failure_reason}")
+            else:
+                downloads.append(pool.submit(download_finished, generation, job, ledger, store))
+
+        # One fresh GET per job tells us whether it's finished or needs watching
+        for generation_id, job in jobs.items():
+            try:
+                generation = client.generations.get(id=generation_id)
+            except Exception as e:
+                failures += 1
+                print(f"[{job['name'] or generation_id}] Could not fetch status: {e}")
+                continue
+            ledger.record_state(generation)
+            if generation.state in TERMINAL_STATES:
+                handle(generation)
+            else:
+                print(f"[{job['name'] or generation_id}] Still {generation.state}, reattaching...")
+                poller.add(generation)
+
+        for generation in poller.as_completed():
+            handle(generation)
+
+        for future in downloads:
+            try:
+                future.result()
+            except Exception as e:
+                failures += 1
+                print(f"An error occurred during the download process: {e}")
+
+    return failures
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Reattach to unfinished generations recorded in the job ledger.")
+    parser.add_argument("--list", action="store_true", help="Show the most recent jobs in the ledger and exit")
+    parser.add_argument("--limit", type=int, default=20, help="How many jobs --list shows")
+    parser.add_argument("--ledger", default=None, help="Path to the ledger database")
+    parser.add_argument("--no-store", action="store_true", help="Leave downloads where the ledger says instead of the output store")
+    args = parser.parse_args()
+
+    ledger = JobLedger(args.ledger) if args.ledger else JobLedger()
+    if args.list:
+        list_jobs(ledger, args.limit)
+        return
+
+    failures = resume(get_client(), ledger, store=None if args.no_store else OutputStore())
+    if failures:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
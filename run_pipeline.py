@@ -0,0 +1,277 @@
+import sys
+import json
+import copy
+import time
+import argparse
+from pathlib import Path
+from concurrent.futures import ThreadPoolExecutor
+from luma_client import get_client
+from batch_generate import (submit_generation, download_generation, is_image_spec, draft_spec, default_output_dir,
+                            check_manifest, restore_cached)
+from status_poller import StatusPoller, log_poll_error
+from generation_cache import GenerationCache
+from job_ledger import JobLedger
+from generation_timing import TimingTrace
+from reference_images import get_reference_images
+from output_store import OutputStore
+
+# --- Generation Pipelines ---
+# extend_video.py and interpolate_videos.py chain off earlier generations through keyframes like
+#   {"frame0": {"type": "generation", "id": "<uuid>"}}
+# A pipeline file lets those chains be written down once. Instead of a hard-coded id, a keyframe
+# can point at another node with "node": the node is submitted the moment all its parents
+# complete, and independent branches run side by side.
+#
+#   {
+#     "nodes": {
+#       "front":   {"model": "ray-2", "prompt": "...", "keyframes": {"frame0": {"type": "image", "url": "..."}}},
+#       "orbit1":  {"model": "ray-2", "prompt": "...", "keyframes": {"frame0": {"type": "generation", "node": "front"}}},
+#       "orbit2":  {"model": "ray-2", "prompt": "...", "keyframes": {"frame0": {"type": "generation", "node": "orbit1"}}},
+#       "bridge":  {"model": "ray-2", "prompt": "...", "keyframes": {
+#                       "frame0": {"type": "generation", "node": "orbit2"},
+#                       "frame1": {"type": "generation", "node": "front"}}}
+#     }
+#   }
+
+
+def node_parents(spec):
+    # Every keyframe that references another node is an edge parent -> this node
+    keyframes = spec.get("keyframes") or {}
+    return sorted({frame["node"] for frame in keyframes.values() if isinstance(frame, dict) and "node" in frame})
+
+
+def load_pipeline(pipeline_path):
+    pipeline = json.loads(Path(pipeline_path).read_text(encoding="utf-8"))
+    nodes = pipeline.get("nodes")
+    if not nodes:
+        raise ValueError(f"Pipeline {pipeline_path} has no 'nodes'")
+
+    for name, spec in nodes.items():
+        # What a node needs (a prompt, or keyframes alone for a bridge) is checked with the rest of
+        # the request by check_manifest() before anything runs
+        spec["name"] = name
+        for parent in node_parents(spec):
+            if parent not in nodes:
+                raise ValueError(f"Node '{name}' depends on unknown node '{parent}'")
+
+    topological_order(nodes)  # raises on cycles
+    return nodes
+
+
+def topological_order(nodes):
+    # Kahn's algorithm; also tells us the pipeline has no cycles
+    remaining = {name: set(node_parents(spec)) for name, spec in nodes.items()}
+    order = []
+    while remaining:
+        ready = sorted(name for name, parents in remaining.items() if not parents)
+        if not ready:
+            raise ValueError(f"Pipeline has a dependency cycle between: {', '.join(sorted(remaining))}")
+        for name in ready:
+            order.append(name)
+            del remaining[name]
+        for parents in remaining.values():
+            parents.difference_update(ready)
+    return order
+
+
+def resolve_spec(spec, generation_ids):
+    # Swap every {"node": ...} keyframe for the real generation id of the finished parent
+    resolved = copy.deepcopy(spec)
+    for frame in (resolved.get("keyframes") or {}).values():
+        if isinstance(frame, dict) and "node" in frame:
+            frame["id"] = generation_ids[frame.pop("node")]
+    return resolved
+
+
+def run_pipeline(client, nodes, output_dir, max_concurrency=4, download_workers=4, cache=None, ledger=None,
+                 timings=None, references=None, store=None):
+    output_dir = Path(output_dir)
+    output_dir.mkdir(parents=True, exist_ok=True)
+
+    children = {name: [] for name in nodes}
+    waiting_on = {}
+    for name, spec in nodes.items():
+        parents = node_parents(spec)
+        waiting_on[name] = set(parents)
+        for parent in parents:
+            children[parent].append(name)
+
+    poller = StatusPoller(
+        client,
+        on_state_change=ledger.record_state if ledger is not None else None,
+        on_error=log_poll_error,
+        on_check=timings.observe if timings is not None else None,
+    )
+    ready = [name for name in topological_order(nodes) if not waiting_on[name]]
+    generation_ids = {}
+    in_flight = {}
+    results = {name: {"generation_id": None, "path": None, "error": None} for name in nodes}
+    started = time.monotonic()
+
+    def skip_descendants(name, reason):
+        for child in children[name]:
+            if results[child]["error"] is None:
+                results[child]["error"] = reason
+                print(f"[{child}] Skipped: {reason}")
+                skip_descendants(child, reason)
+
+    def node_finished(name, generation_id):
+        # A parent is done: release any child whose parents are now all complete
+        generation_ids[name] = generation_id
+        results[name]["finished"] = round(time.monotonic() - started, 1)
+        for child in children[name]:
+            waiting_on[child].discard(name)
+            if not waiting_on[child] and results[child]["error"] is None:
+                ready.append(child)
+
+    def submit_ready():
+        while ready and len(in_flight) < max_concurrency:
+            name = ready.pop(0)
+            spec = resolve_spec(nodes[name], generation_ids)
+            if references is not None:
+                # Local image keyframes / references -> hosted URLs, uploaded once per distinct image
+                try:
+                    spec = references.resolve_spec(spec)
+                except Exception as e:
+                    results[name]["error"] = f"Reference image problem: {e}"
+                    print(f"[{name}] {results[name]['error']}")
+                    skip_descendants(name, f"parent '{name}' failed")
+                    continue
+            timing = timings.start(spec, name=name, source="run_pipeline.py") if timings is not None else None
+
+            cached = cache.lookup(spec) if cache is not None else None
+            if cached:
+                results[name]["generation_id"] = cached["generation_id"]
+                restored = restore_cached(cache, cached, spec, output_dir, store, source="run_pipeline.py")
+                results[name]["path"] = str(restored)
+                print(f"[{name}] Identical request found in cache! ID: {cached['generation_id']}")
+                node_finished(name, cached["generation_id"])
+                continue
+
+            try:
+                generation = submit_generation(client, spec, timing)
+            except Exception as e:
+                results[name]["error"] = str(e)
+                if timing is not None:
+                    timing.finish(error=results[name]["error"])
+                print(f"[{name}] An error occurred during generation: {e}")
+                skip_descendants(name, f"parent '{name}' failed")
+                continue
+
+            print(f"[{name}] Generation started successfully! ID: {generation.id}")
+            results[name]["generation_id"] = generation.id
+            if ledger is not None:
+                extension = "jpg" if is_image_spec(spec) else "mp4"
+                ledger.record_submitted(
+                    generation, spec, output_path=output_dir / f"{generation.id}.{extension}", source="run_pipeline.py"
+                )
+            in_flight[generation.id] = (name, spec, timing)
+            poller.add(generation)
+
+    def download(generation, name, spec, timing):
+        if timing is not None:
+            timing.downloading()
+        save_path = download_generation(generation, output_dir, image=is_image_spec(spec))
+        if timing is not None:
+            timing.downloaded(save_path)
+        asset_url = generation.assets.image if is_image_spec(spec) else generation.assets.video
+        if store is not None:
+            save_path = store.add(save_path, generation.id, spec, source="run_pipeline.py",
+                                  timings=timing.stages() if timing is not None else None, asset_url=asset_url)
+        results[name]["path"] = str(save_path)
+        if ledger is not None:
+            ledger.record_download(generation.id, save_path)
+        if cache is not None:
+            cache.store(spec, generation.id, asset_url, save_path)
+        print(f"[{name}] File downloaded as {save_path}")
+
+    submit_ready()
+    with ThreadPoolExecutor(max_workers=download_workers) as pool:
+        downloads = []
+        for generation in poller.as_completed():
+            name, spec, timing = in_flight.pop(generation.id)
+            if generation.state == "failed":
+                results[name]["error"] = f"Generation failed: {generation.failure_reason}"
+                if timing is not None:
+                    timing.finish(error=results[name]["error"])
+                print(f"[{name}] {results[name]['error']}")
+                skip_descendants(name, f"parent '{name}' failed")
+            else:
+                print(f"[{name}] Generation completed after {time.monotonic() - started:.0f}s")
+                # Children only need the generation id, so they're submitted before the download finishes
+                node_finished(name, generation.id)
+                downloads.append((name, timing, pool.submit(download, generation, name, spec, timing)))
+            submit_ready()
+
+        for name, timing, future in downloads:
+            try:
+                future.result()
+            except Exception as e:
+                results[name]["error"] = f"Download failed: {e}"
+                print(f"[{name}] An error occurred during the download process: {e}")
+            if timing is not None:
+                timing.finish(error=results[name]["error"])
+
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Run a pipeline of chained extend/interpolate generations.")
+    parser.add_argument("pipeline", help="JSON pipeline definition")
+    parser.add_argument("--concurrency", type=int, default=4, help="Maximum number of generations in flight at once")
+    parser.add_argument("--output-dir", default=str(default_output_dir),
+                        help="Where assets are downloaded to (and left, with --no-store)")
+    parser.add_argument("--no-store", action="store_true", help="Leave downloads in --output-dir instead of the output store")
+    parser.add_argument("--no-cache", action="store_true", help="Don't read or write the generation cache")
+    parser.add_argument("--draft", action="store_true",
+                        help="Run every node at the cheap draft tier (re-run without --draft for the real thing)")
+    args = parser.parse_args()
+
+    try:
+        nodes = load_pipeline(args.pipeline)
+    except (ValueError, FileNotFoundError) as e:
+        print(f"Error: {e}")
+        sys.exit(1)
+    if args.draft:
+        nodes = {name: dict(draft_spec(spec), name=name) for name, spec in nodes.items()}
+
+    # Every node is checked against the model capability table before the first one is submitted.
+    # Parent references stand in for the generation IDs they'll become.
+    invalid, _ = check_manifest(resolve_spec(spec, {name: name for name in nodes}) for spec in nodes.values())
+    for name, problems in invalid:
+        print(f"[{name}] {'; '.join(problems)}")
+    if invalid:
+        print(f"{len(invalid)}/{len(nodes)} nodes are invalid, nothing was submitted")
+        sys.exit(1)
+    print(f"Pipeline order: {' -> '.join(topological_order(nodes))}")
+
+    started = time.monotonic()
+    results = run_pipeline(
+        get_client(),
+        nodes,
+        args.output_dir,
+        max_concurrency=args.concurrency,
+        cache=None if args.no_cache else GenerationCache(),
+        ledger=JobLedger(),
+        timings=TimingTrace(),
+        references=get_reference_images(),
+        store=None if args.no_store else OutputStore(),
+    )
+
+    # Write node -> generation id next to the pipeline so later stages (and humans) can find the chain
+    results_path = Path(args.pipeline).with_suffix(".draft.results.json" if args.draft else ".results.json")
+    results_path.write_text(json.dumps(results, indent=2), encoding="utf-8")
+
+    failed = {name: result for name, result in results.items() if result["error"]}
+    print("-" * 30)
+    print(f"Finished {len(results) - len(failed)}/{len(results)} nodes in {time.monotonic() - started:.1f}s")
+    for name, result in results.items():
+        print(f"- {name}: {result['generation_id']} {result['error'] or result['path']}")
+    print(f"Results written to {results_path}")
+
+    if failed:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
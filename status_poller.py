@@ -0,0 +1,347 @@
+import time
+import heapq
+import threading
+from collections import namedtuple
+
+# --- Poll Schedules ---
+# Instead of a flat time.sleep(3) per job, every generation gets a schedule based on
+# how long its model usually takes at that resolution and duration.
+#   first_check:  seconds before the first status check (catches instant validation failures)
+#   min_interval: the tightest spacing we use around the expected finish time
+#   max_interval: the sparse spacing we use while the job is clearly still rendering
+#   expected:     rough render time in seconds for the base resolution/duration
+PollProfile = namedtuple("PollProfile", ["first_check", "min_interval", "max_interval", "expected"])
+
+POLL_PROFILES = {
+    "photon-flash-1": PollProfile(first_check=1.0, min_interval=1.0, max_interval=2.0, expected=6),
+    "photon-1": PollProfile(first_check=2.0, min_interval=1.5, max_interval=4.0, expected=15),
+    "ray-flash-2": PollProfile(first_check=3.0, min_interval=2.0, max_interval=10.0, expected=40),
+    "ray-2": PollProfile(first_check=3.0, min_interval=3.0, max_interval=30.0, expected=90),
+}
+DEFAULT_PROFILE = PollProfile(first_check=3.0, min_interval=3.0, max_interval=15.0, expected=60)
+
+# Multipliers on the expected render time (relative to 720p / 5s)
+RESOLUTION_FACTORS = {"540p": 0.6, "720p": 1.0, "1080p": 1.6, "4k": 4.0}
+DURATION_FACTORS = {"5s": 1.0, "9s": 1.8}
+
+TERMINAL_STATES = ("completed", "failed")
+
+
+def describe_generation(generation):
+    # The Generation object echoes back the request it was created with,
+    # so we can read model/resolution/duration straight off it.
+    request = getattr(generation, "request", None)
+    model = getattr(request, "model", None) or getattr(generation, "model", None)
+    resolution = getattr(request, "resolution", None)
+    duration = getattr(request, "duration", None)
+    return model, resolution, duration
+
+
+def expected_render_seconds(model, resolution=None, duration=None):
+    profile = POLL_PROFILES.get(model, DEFAULT_PROFILE)
+    if model in ("photon-1", "photon-flash-1"):
+        # Stills don't scale with video resolution/duration
+        return profile.expected
+    return (
+        profile.expected
+        * RESOLUTION_FACTORS.get(resolution, 1.0)
+        * DURATION_FACTORS.get(duration, 1.0)
+    )
+
+
+def next_poll_delay(model, resolution, duration, elapsed, checks, state=None):
+    # elapsed: seconds since the job started dreaming (or since submit, if we never saw it dream)
+    # checks:  how many status checks we've already made for this job
+    profile = POLL_PROFILES.get(model, DEFAULT_PROFILE)
+    if checks == 0:
+        return profile.first_check
+
+    # Still waiting in Luma's queue, nothing to gain by checking often
+    if state == "queued":
+        return profile.max_interval
+
+    expected = expected_render_seconds(model, resolution, duration)
+    ramp_start = expected * 0.7
+    if elapsed < ramp_start:
+        # Sparse checks while rendering, but don't sleep past the start of the ramp
+        return min(profile.max_interval, max(profile.min_interval, ramp_start - elapsed))
+
+    # Around (and after) the expected finish time: check tightly, backing off again
+    # gradually if the job overruns so a stuck job doesn't cost a GET every second.
+    overrun = max(0.0, elapsed - expected)
+    return min(profile.max_interval, profile.min_interval * (1.0 + overrun / expected) ** 2)
+
+
+class _Tracked:
+    def __init__(self, generation, model, resolution, duration, callback):
+        self.generation = generation
+        self.model = model
+        self.resolution = resolution
+        self.duration = duration
+        self.callback = callback
+        self.submitted_at = time.monotonic()
+        self.dreaming_since = None
+        self.checks = 0
+
+
+class StatusPoller:
+    # One poller multiplexes any number of in-flight generation IDs.
+    # Jobs are kept in a heap ordered by their next due check. When several are due at once
+    # we fetch them in bulk through client.generations.list instead of one GET per job.
+    #
+    # When statuses are delivered to us instead (completion callbacks, see callback_receiver.py),
+    # hand them to push() and set sweep_interval: polling then drops to a slow safety-net sweep
+    # on one shared clock, so each sweep of every job is a single bulk list call.
+
+    def __init__(self, client, bulk_threshold=4, list_page_size=100, on_complete=None, on_state_change=None,
+                 on_error=None, on_check=None, sweep_interval=None):
+        self.client = client
+        self.sweep_interval = sweep_interval
+        self.bulk_threshold = bulk_threshold
+        self.list_page_size = list_page_size
+        self.on_complete = on_complete
+        # Called with every generation whose state differs from the last one we saw (e.g. for the job ledger)
+        self.on_state_change = on_state_change
+        # Called with every status we fetch for a tracked job, changed or not (e.g. for timings)
+        self.on_check = on_check
+        # If set, a failed status check is handed to on_error and retried later instead of raised,
+        # so one bad GET (after the transport's own retries) doesn't end a whole batch
+        self.on_error = on_error
+
+        self._tracked = {}
+        self._schedule = []
+        self._pushed = []
+        self._started = time.monotonic()
+        self._lock = threading.Lock()
+        self._wakeup = threading.Event()
+        self._closed = False
+
+        # Stats, handy for comparing against the old fixed 3 second loops
+        self.get_requests = 0
+        self.list_requests = 0
+
+    def add(self, generation, model=None, resolution=None, duration=None, callback=None):
+        # Start tracking a submitted generation. Explicit model/resolution/duration override
+        # whatever we can read off the generation's echoed request.
+        seen_model, seen_resolution, seen_duration = describe_generation(generation)
+        tracked = _Tracked(
+            generation,
+            model or seen_model,
+            resolution or seen_resolution,
+            duration or seen_duration,
+            callback,
+        )
+        delay = self._sweep_delay() if self.sweep_interval else next_poll_delay(
+            tracked.model, tracked.resolution, tracked.duration, 0.0, 0
+        )
+        with self._lock:
+            self._tracked[generation.id] = tracked
+            heapq.heappush(self._schedule, (time.monotonic() + delay, generation.id))
+        self._wakeup.set()
+
+    def push(self, generation):
+        # A status delivered to us rather than fetched. Handled like a poll result, and a finished
+        # generation is yielded by as_completed() straight away. Safe to call from another thread.
+        finished = self._update(generation.id, generation, was_due=False)
+        if finished is not None:
+            with self._lock:
+                self._pushed.append(finished)
+            self._wakeup.set()
+
+    def _sweep_delay(self):
+        # Time to the next tick of the shared sweep clock
+        return self.sweep_interval - (time.monotonic() - self._started) % self.sweep_interval
+
+    def remove(self, generation_id):
+        # Stop tracking a generation (e.g. one we've cancelled); its queued checks are skipped
+        with self._lock:
+            tracked = self._tracked.pop(generation_id, None)
+        return tracked.generation if tracked is not None else None
+
+    def pending(self):
+        with self._lock:
+            return len(self._tracked)
+
+    def close(self):
+        # Ends an idle_wait as_completed() loop
+        self._closed = True
+        self._wakeup.set()
+
+    def as_completed(self, timeout=None, idle_wait=False):
+        # Yield each generation (completed or failed) the moment we detect it finished.
+        # Jobs added while iterating are picked up on the next pass. Normally this returns once
+        # nothing is left to watch; with idle_wait it sleeps until the next add() instead, until close().
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while True:
+            with self._lock:
+                pushed, self._pushed = self._pushed, []
+            for generation in pushed:
+                yield generation
+
+            with self._lock:
+                idle = not self._tracked and not self._pushed
+                if idle and (not idle_wait or self._closed):
+                    return
+                if not idle and not self._tracked:
+                    continue
+                next_due = self._schedule[0][0] if not idle else None
+
+            if idle:
+                self._wakeup.wait()
+                self._wakeup.clear()
+                continue
+
+            now = time.monotonic()
+            if deadline is not None and now >= deadline:
+                raise TimeoutError(f"{self.pending()} generations still running after {timeout}s")
+
+            wait = next_due - now
+            if deadline is not None:
+                wait = min(wait, deadline - now)
+            if wait > 0:
+                # add() sets the event, so a newly added job with an earlier check wakes us up
+                self._wakeup.wait(wait)
+                self._wakeup.clear()
+                continue
+
+            for generation in self._poll_due():
+                yield generation
+
+    def wait(self, generation, timeout=None):
+        # Block until one specific generation finishes
+        self.add(generation)
+        for finished in self.as_completed(timeout=timeout):
+            if finished.id == generation.id:
+                return finished
+
+    def _pop_due(self):
+        now = time.monotonic()
+        due = []
+        with self._lock:
+            while self._schedule and self._schedule[0][0] <= now:
+                _, generation_id = heapq.heappop(self._schedule)
+                if generation_id in self._tracked:
+                    due.append(generation_id)
+        return due
+
+    def _poll_due(self):
+        due = self._pop_due()
+        if not due:
+            return []
+
+        fresh = {}
+        try:
+            if len(due) >= self.bulk_threshold:
+                fresh = self._fetch_bulk(due)
+
+            # Anything the list endpoint didn't return (or a small batch) gets a plain GET
+            for generation_id in due:
+                if generation_id not in fresh:
+                    self.get_requests += 1
+                    fresh[generation_id] = self.client.generations.get(id=generation_id)
+        except Exception as e:
+            # Put the jobs we couldn't check back on the schedule so they aren't lost
+            self._reschedule(due)
+            if self.on_error is None:
+                raise
+            self.on_error(e)
+            return []
+
+        finished = []
+        for generation_id, generation in fresh.items():
+            result = self._update(generation_id, generation, generation_id in due)
+            if result is not None:
+                finished.append(result)
+        return finished
+
+    def _reschedule(self, generation_ids):
+        with self._lock:
+            for generation_id in generation_ids:
+                tracked = self._tracked.get(generation_id)
+                if tracked is not None:
+                    profile = POLL_PROFILES.get(tracked.model, DEFAULT_PROFILE)
+                    heapq.heappush(self._schedule, (time.monotonic() + profile.min_interval, generation_id))
+
+    def _fetch_bulk(self, due):
+        # Page through the newest generations until every due ID has been seen.
+        # The list endpoint returns newest first, so our in-flight jobs are near the top.
+        wanted = set(due)
+        with self._lock:
+            tracked_ids = set(self._tracked)
+        max_pages = len(tracked_ids) // self.list_page_size + 2
+
+        found = {}
+        for page in range(max_pages):
+            self.list_requests += 1
+            response = self.client.generations.list(
+                limit=self.list_page_size, offset=page * self.list_page_size
+            )
+            generations = response.generations or []
+            for generation in generations:
+                # Opportunistically pick up any tracked job, not just the due ones
+                if generation.id in tracked_ids:
+                    found[generation.id] = generation
+            if wanted.issubset(found) or len(generations) < self.list_page_size:
+                break
+        return found
+
+    def _update(self, generation_id, generation, was_due):
+        with self._lock:
+            tracked = self._tracked.get(generation_id)
+            if tracked is None:
+                return None
+            changed = tracked.generation.state != generation.state
+            tracked.generation = generation
+            tracked.checks += 1
+
+            finished = generation.state in TERMINAL_STATES
+            if finished:
+                del self._tracked[generation_id]
+            else:
+                if generation.state == "dreaming" and tracked.dreaming_since is None:
+                    tracked.dreaming_since = time.monotonic()
+                if was_due and self.sweep_interval:
+                    heapq.heappush(self._schedule, (time.monotonic() + self._sweep_delay(), generation_id))
+                elif was_due:
+                    started = tracked.dreaming_since or tracked.submitted_at
+                    delay = next_poll_delay(
+                        tracked.model,
+                        tracked.resolution,
+                        tracked.duration,
+                        time.monotonic() - started,
+                        tracked.checks,
+                        generation.state,
+                    )
+                    heapq.heappush(self._schedule, (time.monotonic() + delay, generation_id))
+
+        if self.on_check is not None:
+            self.on_check(generation)
+        if changed and self.on_state_change is not None:
+            self.on_state_change(generation)
+        if not finished:
+            return None
+
+        if tracked.callback is not None:
+            tracked.callback(generation)
+        if self.on_complete is not None:
+            self.on_complete(generation)
+        return generation
+
+
+def log_poll_error(error):
+    print(f"Warning: status check failed ({error}), retrying shortly")
+
+
+def wait_for_generation(client, generation, message=None, timeout=None, on_state_change=None, on_check=None,
+                        **profile):
+    # Drop-in replacement for the per-script `while not completed` loops.
+    # Returns the completed generation, raises RuntimeError if it failed.
+    poller = StatusPoller(client, on_state_change=on_state_change, on_check=on_check)
+    poller.add(generation, **profile)
+
+    if message:
+        print(message)
+    for finished in poller.as_completed(timeout=timeout):
+        if finished.state == "failed":
+            raise RuntimeError(f"Generation failed: {finished.failure_reason}")
+        return finished
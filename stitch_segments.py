@@ -0,0 +1,290 @@
+import os
+import sys
+import json
+import argparse
+import tempfile
+from pathlib import Path
+from collections import namedtuple
+from concurrent.futures import ThreadPoolExecutor
+from video_frames import FFMPEG, FFPROBE, FrameExtractionError, run_tool, probe_video, find_generation_video
+from job_ledger import JobLedger
+from run_pipeline import load_pipeline
+
+# --- Segment Stitching ---
+# Joins a chain of extend/interpolate segments into one video without re-encoding.
+# ffmpeg's concat demuxer copies the compressed packets of each segment one after another, so
+# twenty 4K segments join in the time it takes to read and write them (no CPU transcode).
+#
+# A segment that continues from the previous one starts on that segment's last frame, so the
+# boundary frame would show twice. The previous segment's `outpoint` is set just before its last
+# frame to drop the duplicate. This works with stream copy because it trims the end of a segment,
+# never the start (which would need a keyframe there).
+#
+# That only holds when frames are stored in display order. With B-frames the concat demuxer cuts
+# in decode order, which is not the order frames are shown in, so a plain outpoint keeps or drops
+# the wrong frames. For those segments everything up to the last keyframe is still copied, and
+# only the final GOP (at most a second or so) is re-encoded without its last frame.
+#
+# If the segments don't share codec, resolution, pixel format and frame rate, stream copy would
+# produce a broken file, so the join falls back to a single re-encode.
+#
+#   python stitch_segments.py a.mp4 b.mp4 c.mp4 -o orbit.mp4       # files, in this order
+#   python stitch_segments.py --chain <last generation id> -o orbit.mp4
+#   python stitch_segments.py --pipeline orbit.json -o orbit.mp4
+
+# Segment: the clip, and whether its last frame is repeated as the next segment's first frame
+Segment = namedtuple("Segment", ["path", "trim_end"])
+
+# Stream properties that must match for the packets to be copied into one file
+COPY_COMPATIBLE_KEYS = ("codec", "profile", "width", "height", "pix_fmt", "frame_rate")
+
+# Encoders for re-encoding a B-frame segment's last GOP, by codec
+GOP_ENCODERS = {"h264": "libx264", "hevc": "libx265"}
+GOP_CRF = "16"
+
+
+def parent_generation(spec):
+    # The generation a spec continues from: its frame0 keyframe, if that's a generation
+    frame = (spec.get("keyframes") or {}).get("frame0")
+    if isinstance(frame, dict) and frame.get("type") == "generation":
+        return frame.get("id")
+    return None
+
+
+def segments_from_chain(ledger, last_generation_id):
+    # Walk the ledger back from the last segment through each frame0 parent, then play it forwards
+    chain = []
+    generation_id = last_generation_id
+    while generation_id and generation_id not in chain:
+        chain.append(generation_id)
+        job = ledger.get(generation_id)
+        generation_id = parent_generation(json.loads(job["spec"])) if job and job.get("spec") else None
+    chain.reverse()
+
+    paths = [find_generation_video(generation_id, ledger) for generation_id in chain]
+    return [Segment(path, trim_end=index < len(paths) - 1) for index, path in enumerate(paths)]
+
+
+def playback_chain(nodes):
+    # Node names in playback order, and the ones whose last frame is the next one's first frame.
+    #   frame0 = {"node": A}  this node starts on A's last frame, so it plays right after A
+    #   frame1 = {"node": B}  this node (a bridge) ends on B's first frame, so B plays right after it
+    # Either way the earlier clip of the pair repeats a frame and gets trimmed.
+    following = {}
+    preceding = {}
+
+    def link(before, after):
+        if following.get(before, after) != after:
+            raise ValueError(f"Pipeline branches after '{before}' ('{following[before]}' and '{after}' both "
+                             f"continue from it), list the segments to stitch in playback order instead")
+        if preceding.get(after, before) != before:
+            raise ValueError(f"Pipeline branches before '{after}' (it follows both '{preceding[after]}' and "
+                             f"'{before}'), list the segments to stitch in playback order instead")
+        following[before] = after
+        preceding[after] = before
+
+    for name, spec in sorted(nodes.items()):
+        keyframes = spec.get("keyframes") or {}
+        for slot in ("frame0", "frame1"):
+            frame = keyframes.get(slot)
+            if isinstance(frame, dict) and "node" in frame:
+                if slot == "frame0":
+                    link(frame["node"], name)
+                else:
+                    link(name, frame["node"])
+
+    starts = [name for name in sorted(nodes) if name not in preceding]
+    if len(starts) != 1:
+        raise ValueError(f"Pipeline isn't a single chain (it starts at {', '.join(starts) or 'no node'}), "
+                         f"list the segments to stitch in playback order instead")
+    order = [starts[0]]
+    while order[-1] in following and following[order[-1]] not in order:
+        order.append(following[order[-1]])
+    if len(order) != len(nodes):
+        left_over = sorted(set(nodes) - set(order))
+        raise ValueError(f"Pipeline isn't a single chain ({', '.join(left_over)} not reachable from "
+                         f"'{starts[0]}'), list the segments to stitch in playback order instead")
+    return order, following
+
+
+def segments_from_pipeline(pipeline_path, draft=False):
+    # Nodes in playback order (see playback_chain), using the downloads listed in
+    # <pipeline>.results.json (or .draft.results.json). A segment is trimmed when the clip after it
+    # starts on its last frame.
+    nodes = load_pipeline(pipeline_path)
+    results_path = Path(pipeline_path).with_suffix(".draft.results.json" if draft else ".results.json")
+    if not results_path.exists():
+        raise FileNotFoundError(f"No {results_path.name} yet, run the pipeline first")
+    results = json.loads(results_path.read_text(encoding="utf-8"))
+
+    chain, following = playback_chain(nodes)
+    order = [name for name in chain if results.get(name, {}).get("path")]
+    missing = [name for name in chain if name not in order]
+    if missing:
+        print(f"Warning: no downloaded video for {', '.join(missing)}, leaving them out")
+
+    segments = []
+    for index, name in enumerate(order):
+        after = order[index + 1] if index + 1 < len(order) else None
+        trim_end = after is not None and following.get(name) == after
+        segments.append(Segment(Path(results[name]["path"]), trim_end=trim_end))
+    return segments
+
+
+def copy_compatible(infos):
+    # Returns None if every segment can be stream copied together, otherwise why not
+    first = infos[0]
+    for index, info in enumerate(infos[1:], start=1):
+        for key in COPY_COMPATIBLE_KEYS:
+            if info[key] != first[key]:
+                return f"segment {index + 1} has {key} {info[key]}, segment 1 has {first[key]}"
+    return None
+
+
+def last_keyframe(video_path):
+    # (pts, dts) of the last keyframe, read from the packet index without decoding anything
+    output = run_tool([
+        FFPROBE, "-v", "error", "-select_streams", "v:0",
+        "-show_entries", "packet=pts_time,dts_time,flags", "-of", "csv=p=0", str(video_path),
+    ])
+    keyframes = [line.split(",") for line in output.splitlines() if "K" in line.rpartition(",")[2]]
+    if not keyframes:
+        raise FrameExtractionError(f"No keyframes in {video_path}")
+    pts, dts = keyframes[-1][:2]
+    return float(pts), float(dts)
+
+
+def encode_last_gop(segment, info, keyframe_pts, output_path):
+    # Re-encode from the last keyframe up to (not including) the last frame, in the segment's own
+    # codec, pixel format and timescale so its packets can sit between copied ones
+    first_frame = round((keyframe_pts - info["start_time"]) * info["fps"])
+    frames = info["frame_count"] - 1 - first_frame
+    if frames <= 0:
+        return None
+    run_tool([
+        FFMPEG, "-v", "error", "-nostdin", "-y",
+        "-ss", f"{keyframe_pts:.6f}", "-i", str(segment.path),
+        "-map", "0:v", "-frames:v", str(frames),
+        "-c:v", GOP_ENCODERS[info["codec"]], "-crf", GOP_CRF, "-pix_fmt", info["pix_fmt"],
+        "-video_track_timescale", info["time_base"].split("/")[1],
+        str(output_path),
+    ])
+    return output_path
+
+
+def concat_entries(index, segment, info, work_dir):
+    # ffconcat lines for one segment, dropping its last frame if it's repeated by the next one
+    path = str(Path(segment.path).resolve()).replace("'", "'\\''")
+    if not segment.trim_end:
+        return [f"file '{path}'"]
+
+    if not info["has_b_frames"]:
+        # End just before the last frame's timestamp, dropping the duplicated boundary frame
+        last_frame = info["start_time"] + (info["frame_count"] - 1) / info["fps"]
+        return [f"file '{path}'", f"outpoint {last_frame:.6f}"]
+
+    # Copy every packet decoded before the last keyframe (outpoint compares decode timestamps, so
+    # stop half a frame short of it), then splice in the re-encoded final GOP
+    keyframe_pts, keyframe_dts = last_keyframe(segment.path)
+    lines = [
+        f"file '{path}'",
+        f"outpoint {keyframe_dts - 0.5 / info['fps']:.6f}",
+        f"duration {keyframe_pts - info['start_time']:.6f}",
+    ]
+    tail = encode_last_gop(segment, info, keyframe_pts, Path(work_dir) / f"tail{index}.mp4")
+    if tail is not None:
+        lines.append(f"file '{tail}'")
+    return lines
+
+
+def write_concat_list(segments, infos, list_path, work_dir):
+    with ThreadPoolExecutor(max_workers=4) as pool:
+        entries = list(pool.map(
+            lambda index: concat_entries(index, segments[index], infos[index], work_dir), range(len(segments))
+        ))
+    lines = ["ffconcat version 1.0"] + [line for segment_lines in entries for line in segment_lines]
+    Path(list_path).write_text("\n".join(lines) + "\n", encoding="utf-8")
+
+
+def stitch(segments, output_path, reencode=False):
+    # Join segments (in order) into output_path. Returns the output's probe info.
+    if not segments:
+        raise ValueError("Nothing to stitch")
+    output_path = Path(output_path)
+    with ThreadPoolExecutor(max_workers=8) as pool:
+        infos = list(pool.map(lambda segment: probe_video(segment.path), segments))
+
+    reason = "re-encode requested" if reencode else copy_compatible(infos)
+    if reason is None and infos[0]["codec"] not in GOP_ENCODERS and any(
+            segment.trim_end and info["has_b_frames"] for segment, info in zip(segments, infos)):
+        reason = f"can't trim B-frame {infos[0]['codec']} segments in place"
+    if reason is not None:
+        # The re-encode decodes every frame anyway, so the plain outpoint trim is exact
+        infos = [dict(info, has_b_frames=0) for info in infos]
+
+    work_dir = tempfile.TemporaryDirectory(dir=output_path.resolve().parent, prefix=".stitch-")
+    list_path = Path(work_dir.name) / "segments.ffconcat"
+    temporary = output_path.with_name(output_path.stem + ".tmp" + output_path.suffix)
+
+    command = [FFMPEG, "-v", "error", "-nostdin", "-y", "-f", "concat", "-safe", "0", "-i", str(list_path)]
+    if reason is None:
+        command += ["-map", "0", "-c", "copy"]
+    else:
+        print(f"Can't stream copy ({reason}), re-encoding instead")
+        first = infos[0]
+        command += [
+            "-map", "0:v",
+            "-vf", f"scale={first['width']}:{first['height']},fps={first['frame_rate']},format=yuv420p",
+            "-c:v", "libx264", "-crf", "16", "-preset", "medium",
+        ]
+    command += ["-movflags", "+faststart", str(temporary)]
+
+    try:
+        write_concat_list(segments, infos, list_path, work_dir.name)
+        run_tool(command)
+        os.replace(temporary, output_path)
+    finally:
+        work_dir.cleanup()
+        temporary.unlink(missing_ok=True)
+
+    result = probe_video(output_path)
+    expected = sum(info["frame_count"] - (1 if segment.trim_end else 0) for segment, info in zip(segments, infos))
+    if result["frame_count"] != expected:
+        print(f"Warning: expected {expected} frames in {output_path}, got {result['frame_count']}")
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Join extend/interpolate segments into one video without re-encoding.")
+    parser.add_argument("segments", nargs="*", help="Segment files in playback order")
+    parser.add_argument("--chain", metavar="GENERATION_ID", help="Follow the job ledger back from this generation")
+    parser.add_argument("--pipeline", help="Stitch a finished run_pipeline.py pipeline, in playback order")
+    parser.add_argument("--draft", action="store_true", help="With --pipeline, stitch its draft run")
+    parser.add_argument("-o", "--output", required=True, help="Output video")
+    parser.add_argument("--no-trim", action="store_true", help="Keep the repeated frame at segment boundaries")
+    parser.add_argument("--reencode", action="store_true", help="Re-encode instead of stream copying")
+    args = parser.parse_args()
+
+    try:
+        if args.chain:
+            segments = segments_from_chain(JobLedger(), args.chain)
+        elif args.pipeline:
+            segments = segments_from_pipeline(args.pipeline, draft=args.draft)
+        else:
+            segments = [Segment(Path(path), trim_end=index < len(args.segments) - 1)
+                        for index, path in enumerate(args.segments)]
+        if args.no_trim:
+            segments = [segment._replace(trim_end=False) for segment in segments]
+
+        for segment in segments:
+            print(f"- {segment.path}{' (last frame trimmed)' if segment.trim_end else ''}")
+        result = stitch(segments, args.output, reencode=args.reencode)
+    except (ValueError, FileNotFoundError, FrameExtractionError) as e:
+        print(f"Error: {e}")
+        sys.exit(1)
+    print(f"Stitched {len(segments)} segments into {args.output} "
+          f"({result['frame_count']} frames, {result['duration']:.2f}s)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,129 @@
+import sys
+import json
+import argparse
+import http.client
+from pathlib import Path
+
+# --- Daemon Client ---
+# Hands specs to a running generation_daemon.py and prints its progress. Standard library only,
+# so nothing here pays for the lumaai/requests imports, .env parsing or a TLS handshake; that all
+# happened once, when the daemon started.
+#
+#   python submit_job.py shot.json                   # a spec (or a list of them), .json or .jsonl
+#   python submit_job.py shot.json --wait            # stream progress until it's downloaded
+#   echo '{"prompt": "...", "model": "ray-2"}' | python submit_job.py - --wait
+#   python submit_job.py --list
+#   python submit_job.py --status <job id>
+#   python submit_job.py --cancel <job id>
+#
+# Anything that can make an HTTP request works just as well, e.g. from another service:
+#   curl -H "X-Daemon-Token: <token from daemon.json>" --data @shot.json "http://127.0.0.1:8790/jobs?wait=1"
+
+current_script_dir = Path(__file__).resolve().parent
+DAEMON_FILE = current_script_dir / "daemon.json"  # written by the running daemon: port and access token
+DEFAULT_PORT = 8790
+
+
+class DaemonError(RuntimeError):
+    pass
+
+
+def daemon_address(daemon_file=DAEMON_FILE):
+    try:
+        details = json.loads(Path(daemon_file).read_text(encoding="utf-8"))
+    except FileNotFoundError:
+        raise DaemonError("The daemon isn't running (start it with: python generation_daemon.py)")
+    return details["port"], details["token"]
+
+
+def request(method, path, body=None, daemon_file=DAEMON_FILE, timeout=30):
+    # Returns the open response; the caller reads it (whole, or line by line for a stream)
+    port, token = daemon_address(daemon_file)
+    connection = http.client.HTTPConnection("127.0.0.1", port, timeout=timeout)
+    headers = {"X-Daemon-Token": token}
+    payload = None
+    if body is not None:
+        payload = json.dumps(body).encode("utf-8")
+        headers["Content-Type"] = "application/json"
+    try:
+        connection.request(method, path, body=payload, headers=headers)
+        response = connection.getresponse()
+    except ConnectionRefusedError:
+        raise DaemonError(f"Nothing is listening on port {port}; is the daemon still running?")
+    if response.status >= 400:
+        raise DaemonError(f"{response.status}: {response.read().decode('utf-8', 'replace')}")
+    return response
+
+
+def read_specs(source):
+    # A spec or list of specs from a .json file, one spec per line from .jsonl, or JSON on stdin
+    text = sys.stdin.read() if source == "-" else Path(source).read_text(encoding="utf-8")
+    if source.endswith(".jsonl"):
+        return [json.loads(line) for line in text.splitlines() if line.strip()]
+    specs = json.loads(text)
+    return specs if isinstance(specs, list) else [specs]
+
+
+def print_event(event):
+    details = event.get("generation_id") or ""
+    if event.get("path"):
+        details = event["path"]
+    if event.get("error"):
+        details = event["error"]
+    print(f"[{event['name']}] {event['state']} {details}".rstrip(), flush=True)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Submit generation specs to the running generation daemon.")
+    parser.add_argument("specs", nargs="*", help="Spec files (.json or .jsonl), or - for stdin")
+    parser.add_argument("--wait", action="store_true", help="Stream progress until every job is finished")
+    parser.add_argument("--draft", action="store_true", help="Render at the cheap draft tier")
+    parser.add_argument("--list", action="store_true", help="Show the daemon's recent jobs")
+    parser.add_argument("--status", metavar="JOB_ID", help="Show one job and its progress so far")
+    parser.add_argument("--cancel", metavar="JOB_ID", help="Cancel a job that hasn't finished rendering")
+    args = parser.parse_args()
+
+    try:
+        if args.list:
+            for job in json.load(request("GET", "/jobs"))["jobs"]:
+                print(f"{job['id']:<14} {job['state']:<12} {job['name'] or '':<24} {job['generation_id'] or ''} "
+                      f"{job['path'] or job['error'] or ''}")
+            status = json.load(request("GET", "/status"))
+            print(f"{status['in_flight']} in flight, {status['waiting']} waiting, up {status['uptime']:.0f}s")
+            return
+        if args.status:
+            print(json.dumps(json.load(request("GET", f"/jobs/{args.status}")), indent=2))
+            return
+        if args.cancel:
+            response = request("DELETE", f"/jobs/{args.cancel}")
+            job = json.load(response)
+            if response.status == 202:
+                print(f"{job['id']} is being submitted; it will be deleted at Luma as soon as it's created")
+            else:
+                print(f"{job['id']} is {job['state']}")
+            return
+        if not args.specs:
+            parser.error("give at least one spec file (or --list / --status / --cancel)")
+
+        specs = [spec for source in args.specs for spec in read_specs(source)]
+        query = "&".join(flag for flag, wanted in (("wait=1", args.wait), ("draft=1", args.draft)) if wanted)
+        response = request("POST", "/jobs" + (f"?{query}" if query else ""), specs, timeout=None if args.wait else 30)
+        if not args.wait:
+            for job in json.load(response)["jobs"]:
+                print(f"{job['id']} {job['name']}")
+            return
+
+        failed = False
+        for line in response:
+            event = json.loads(line)
+            print_event(event)
+            failed = failed or event["state"] in ("failed", "cancelled")
+    except (DaemonError, OSError, ValueError) as e:
+        print(f"Error: {e}")
+        sys.exit(1)
+    if failed:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,62 @@
+import os
+import sys
+from pathlib import Path
+import httpx
+import pytest
+from lumaai import LumaAI, DefaultHttpxClient
+
+# --- Test Setup ---
+# The scripts are flat modules next to this folder, so put the repo root on the path. Nothing here
+# talks to the real API: tests that need one start mock_luma_server.py on an ephemeral port.
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+os.environ.setdefault("LUMA_API_KEY", "mock-key")
+
+import asset_download  # noqa: E402
+import rate_limiter  # noqa: E402
+import status_poller  # noqa: E402
+from mock_luma_server import MockSettings, serve_mock_api  # noqa: E402
+from rate_limiter import RateLimitedTransport, TokenBucket, CircuitBreaker  # noqa: E402
+from status_poller import PollProfile  # noqa: E402
+
+# Render times and poll schedules both run at 1/100 of the real clock (a ray-flash-2 540p job
+# takes ~0.25s on the mock), and retries back off in milliseconds rather than seconds
+TIME_SCALE = 0.01
+
+
+@pytest.fixture
+def fast_clock(monkeypatch):
+    # The mock works out render times from the same profiles, so scaling them speeds up both sides
+    for model, profile in status_poller.POLL_PROFILES.items():
+        monkeypatch.setitem(status_poller.POLL_PROFILES, model, PollProfile(*(value * TIME_SCALE for value in profile)))
+    monkeypatch.setattr(status_poller, "DEFAULT_PROFILE",
+                        PollProfile(*(value * TIME_SCALE for value in status_poller.DEFAULT_PROFILE)))
+    monkeypatch.setattr(rate_limiter, "BACKOFF_BASE", 0.01)
+    monkeypatch.setattr(asset_download, "RETRY_BACKOFF", 0.01)
+
+
+@pytest.fixture
+def mock_api(fast_clock):
+    # start(**settings) -> (api, client): a fresh mock on an ephemeral port and a LumaAI client
+    # on the same rate limited transport the scripts use, with limits that won't slow a test down
+    servers = []
+
+    def start(**settings):
+        options = dict(time_scale=1.0, queue_seconds=0.05, jitter=0.0, response_latency=0.0, video_mb=0.25,
+                       image_kb=32, seed=1)
+        options.update(settings)
+        server, api, base_url = serve_mock_api(MockSettings(**options))
+        servers.append(server)
+        transport = RateLimitedTransport(
+            request_bucket=TokenBucket(1000, 100),
+            create_bucket=TokenBucket(1000, 100),
+            breaker=CircuitBreaker(cooldown=0.1),
+        )
+        client = LumaAI(auth_token="mock-key", base_url=base_url,
+                        http_client=DefaultHttpxClient(transport=transport, timeout=httpx.Timeout(10.0)),
+                        max_retries=0)
+        return api, client
+
+    yield start
+    for server in servers:
+        server.shutdown()
+        server.server_close()
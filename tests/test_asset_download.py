@@ -0,0 +1,142 @@
+import pytest
+import requests
+import asset_download
+from asset_download import download_asset, download_asset_parallel, DownloadError
+
+
+def finished_asset(api, client):
+    generation = client.generations.create(prompt="a lighthouse", model="ray-flash-2", resolution="540p",
+                                           duration="5s")
+    record = api.generations[generation.id]
+    record["dreaming_at"] = record["done_at"] = 0  # skip the render
+    return client.generations.get(id=generation.id).assets.video, record["size"]
+
+
+def test_download_asset(mock_api, tmp_path):
+    api, client = mock_api()
+    url, size = finished_asset(api, client)
+
+    path = download_asset(url, tmp_path / "clip.mp4", session=requests.Session(), chunk_size=4096)
+
+    assert path.read_bytes() == api.asset_bytes(0, size)
+    assert not (tmp_path / "clip.mp4.part").exists()
+
+
+def test_download_asset_resumes_a_truncated_stream(mock_api, tmp_path):
+    # Every response stops half way through: each retry resumes from what's on disk, and once the
+    # server behaves the download completes from there
+    api, client = mock_api(truncate_rate=1.0)
+    url, size = finished_asset(api, client)
+    session = requests.Session()
+    save_path = tmp_path / "clip.mp4"
+
+    with pytest.raises(DownloadError, match="Giving up"):
+        download_asset(url, save_path, session=session, chunk_size=4096, max_retries=2)
+    # Three attempts, each one got half of what was left, and none of it was thrown away
+    part_path = tmp_path / "clip.mp4.part"
+    assert api.stats["asset_truncated"] == 3
+    assert size // 2 < part_path.stat().st_size < size
+    assert not save_path.exists()
+
+    api.settings.truncate_rate = 0.0
+    path = download_asset(url, save_path, session=session, chunk_size=4096)
+    assert path.read_bytes() == api.asset_bytes(0, size)
+    assert not part_path.exists()
+
+
+def test_download_asset_restarts_a_part_file_that_doesnt_fit(mock_api, tmp_path):
+    # Left over from some bigger file: the server answers 416 for a different size
+    api, client = mock_api()
+    url, size = finished_asset(api, client)
+    part_path = tmp_path / "clip.mp4.part"
+    part_path.write_bytes(b"x" * (size + 10))
+
+    path = download_asset(url, tmp_path / "clip.mp4", session=requests.Session(), chunk_size=4096)
+
+    assert path.read_bytes() == api.asset_bytes(0, size)
+    assert not part_path.exists()
+
+
+def test_download_asset_restarts_when_the_asset_changes_size(mock_api, tmp_path):
+    # The first response is cut off half way, and by the time we resume the asset has grown
+    api, client = mock_api(truncate_rate=1.0)
+    url, size = finished_asset(api, client)
+    record = next(iter(api.generations.values()))
+    session = requests.Session()
+    statuses = []
+
+    def change_asset(response, *args, **kwargs):
+        statuses.append(response.status_code)
+        if len(statuses) == 1:
+            record["size"] = size * 2
+        else:
+            api.settings.truncate_rate = 0.0
+
+    session.hooks["response"].append(change_asset)
+
+    path = download_asset(url, tmp_path / "clip.mp4", session=session, chunk_size=4096)
+
+    # The resumed 206 reports the new size, so the half we had is thrown away and we start over
+    assert statuses == [200, 206, 200]
+    assert path.read_bytes() == api.asset_bytes(0, size * 2)
+
+
+def test_download_asset_retries_503s(mock_api, tmp_path):
+    api, client = mock_api(asset_error_rate=0.5)
+    url, size = finished_asset(api, client)
+
+    path = download_asset(url, tmp_path / "clip.mp4", session=requests.Session(), max_retries=20)
+
+    assert path.read_bytes() == api.asset_bytes(0, size)
+
+
+def test_download_asset_gives_up_on_404(mock_api, tmp_path):
+    api, client = mock_api()
+    url, _ = finished_asset(api, client)
+    missing = url.rsplit("/", 1)[0] + "/00000000-0000-0000-0000-000000000000.mp4"
+
+    session = requests.Session()
+    statuses = []
+    session.hooks["response"].append(lambda response, *args, **kwargs: statuses.append(response.status_code))
+
+    with pytest.raises(requests.exceptions.HTTPError):
+        download_asset(missing, tmp_path / "clip.mp4", session=session)
+    # Not retried: a 404 won't get better
+    assert statuses == [404]
+
+
+def test_parallel_download_with_flaky_segments(mock_api, tmp_path):
+    api, client = mock_api(asset_error_rate=0.2, truncate_rate=0.2)
+    url, size = finished_asset(api, client)
+
+    path = download_asset_parallel(url, tmp_path / "clip.mp4", session=requests.Session(), connections=4,
+                                   min_parallel_size=0, chunk_size=4096, max_retries=20)
+
+    assert path.read_bytes() == api.asset_bytes(0, size)
+    assert api.stats["asset"] > 4
+    assert not (tmp_path / "clip.mp4.part").exists()
+
+
+def test_parallel_download_falls_back_without_ranges(mock_api, tmp_path):
+    api, client = mock_api(ranges=False)
+    url, size = finished_asset(api, client)
+
+    path = download_asset_parallel(url, tmp_path / "clip.mp4", session=requests.Session(), connections=4,
+                                   min_parallel_size=0)
+
+    assert path.read_bytes() == api.asset_bytes(0, size)
+    # One probe, then a single full-size stream
+    assert api.stats["asset"] == 2
+
+
+def test_parallel_download_rejects_a_size_mismatch(mock_api, tmp_path, monkeypatch):
+    # A segment that writes more or less than it should is caught before the rename
+    api, client = mock_api()
+    url, _ = finished_asset(api, client)
+    monkeypatch.setattr(asset_download, "_download_segment", lambda url, part_path, start, end, *args: end - start)
+
+    with pytest.raises(DownloadError, match="expected"):
+        download_asset_parallel(url, tmp_path / "clip.mp4", session=requests.Session(), connections=4,
+                                min_parallel_size=0)
+    assert not (tmp_path / "clip.mp4").exists()
+    assert not (tmp_path / "clip.mp4.part").exists()
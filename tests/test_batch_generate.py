@@ -0,0 +1,105 @@
+from pathlib import Path
+from batch_generate import run_batch, check_manifest, draft_spec
+from generation_cache import GenerationCache
+from job_ledger import JobLedger
+from output_store import OutputStore
+
+
+def video_spec(name, prompt, **extra):
+    return dict({"name": name, "prompt": prompt, "model": "ray-flash-2", "resolution": "540p", "duration": "5s"},
+                **extra)
+
+
+def test_run_batch_downloads_every_job(mock_api, tmp_path):
+    api, client = mock_api()
+    specs = [video_spec(f"shot{index}", f"a lighthouse at dusk, take {index}") for index in range(5)]
+    specs.append({"name": "still", "prompt": "a lighthouse at dusk", "model": "photon-flash-1"})
+    ledger = JobLedger(tmp_path / "ledger.sqlite3")
+
+    results = run_batch(client, specs, tmp_path / "out", max_concurrency=3, ledger=ledger)
+
+    assert sorted(result["name"] for result in results) == sorted(spec["name"] for spec in specs)
+    for result in results:
+        assert result["error"] is None
+        path = Path(result["path"])
+        size = path.stat().st_size
+        assert path.read_bytes() == api.asset_bytes(0, size)
+        assert path.suffix == (".jpg" if result["name"] == "still" else ".mp4")
+        assert ledger.get(result["generation_id"])["state"] == "downloaded"
+    assert ledger.unfinished() == []
+    assert api.stats["create_video"] + api.stats["create_image"] == len(specs)
+
+
+def test_run_batch_reports_failures_and_carries_on(mock_api, tmp_path):
+    api, client = mock_api(failure_rate=0.5)
+    specs = [video_spec(f"shot{index}", f"prompt {index}") for index in range(8)]
+    # Rejected locally before any create call
+    specs.append(video_spec("bad", "a 3s clip", duration="3s"))
+
+    results = {result["name"]: result for result in run_batch(client, specs, tmp_path / "out", max_concurrency=4)}
+
+    assert "duration must be one of" in results["bad"]["error"]
+    assert results["bad"]["generation_id"] is None
+    failed = [name for name, result in results.items() if name != "bad" and result["error"]]
+    finished = [name for name, result in results.items() if result["path"]]
+    assert failed and finished
+    assert len(failed) + len(finished) == 8
+    for name in failed:
+        assert results[name]["error"].startswith("Generation failed: ")
+        assert results[name]["path"] is None
+
+
+def test_run_batch_retries_server_errors(mock_api, tmp_path):
+    # 500s on status checks and 503s / cut-off responses on assets are retried, not reported.
+    # A create that gets a 500 isn't replayed (it may have gone through), so it's the only error.
+    api, client = mock_api(error_rate=0.2, asset_error_rate=0.15, truncate_rate=0.15)
+    specs = [video_spec(f"shot{index}", f"prompt {index}") for index in range(8)]
+
+    results = run_batch(client, specs, tmp_path / "out", max_concurrency=4)
+
+    submitted = [result for result in results if result["generation_id"]]
+    assert submitted
+    for result in results:
+        if result["generation_id"] is None:
+            assert "500" in result["error"] or "Internal server error" in result["error"]
+            continue
+        assert result["error"] is None
+        path = Path(result["path"])
+        assert path.read_bytes() == api.asset_bytes(0, path.stat().st_size)
+    requests = api.snapshot()["requests"]
+    assert requests["500"] > 0
+    assert requests.get("asset_503", 0) + requests.get("asset_truncated", 0) > 0
+
+
+def test_run_batch_cache_hit_skips_the_api(mock_api, tmp_path):
+    api, client = mock_api()
+    cache = GenerationCache(tmp_path / "cache")
+    store = OutputStore(tmp_path / "store", perceptual_hashes=False)
+    specs = [video_spec("shot", "a lighthouse at dusk")]
+
+    first = run_batch(client, specs, tmp_path / "out", cache=cache, store=store)
+    creates = api.stats["create_video"]
+    # Same request under another name: a cache hit, filed through the store rather than output_dir
+    second = run_batch(client, [dict(specs[0], name="again")], tmp_path / "out", cache=cache, store=store)
+
+    assert api.stats["create_video"] == creates
+    assert second[0]["generation_id"] == first[0]["generation_id"]
+    assert second[0]["path"] == first[0]["path"]
+    assert Path(second[0]["path"]).is_relative_to(tmp_path / "store")
+    assert list((tmp_path / "out").iterdir()) == []
+
+    # refresh=True renders it again
+    run_batch(client, specs, tmp_path / "out", cache=cache, store=store, refresh=True)
+    assert api.stats["create_video"] == creates + 1
+    store.close()
+
+
+def test_check_manifest_checks_draft_final_specs():
+    good = video_spec("good", "a lighthouse")
+    draft = draft_spec(video_spec("orbit", "an orbit", resolution="8k"))
+    invalid, count = check_manifest([good, draft, {"name": "empty", "model": "ray-2"}])
+
+    assert count == 3
+    assert [name for name, _ in invalid] == ["orbit-draft", "empty"]
+    assert invalid[0][1] == ["final spec: ray-flash-2 resolution must be one of 540p, 720p, 1080p, 4k, got '8k'"]
+    assert invalid[1][1] == ["a prompt is required (or keyframes)"]
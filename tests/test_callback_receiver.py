@@ -0,0 +1,82 @@
+import json
+import urllib.error
+import urllib.request
+import pytest
+from batch_generate import run_batch
+from callback_receiver import CALLBACK_PATH, CallbackReceiver
+
+
+@pytest.fixture
+def receiver():
+    received = []
+    receiver = CallbackReceiver(on_generation=received.append)
+    receiver.generations = received
+    yield receiver
+    receiver.close()
+
+
+def generation_body(api, client, state):
+    generation = client.generations.create(prompt="a lighthouse", model="ray-flash-2", resolution="540p",
+                                           duration="5s")
+    return json.dumps(dict(json.loads(client.generations.get(id=generation.id).model_dump_json()), state=state))
+
+
+def post(url, body):
+    request = urllib.request.Request(url, data=body.encode("utf-8"), method="POST",
+                                     headers={"Content-Type": "application/json"})
+    try:
+        with urllib.request.urlopen(request, timeout=5) as response:
+            return response.status
+    except urllib.error.HTTPError as e:
+        return e.code
+
+
+def test_posts_without_the_token_are_refused(receiver, mock_api):
+    api, client = mock_api()
+    body = generation_body(api, client, "completed")
+    base_url = receiver.url[:-len(receiver.token)]
+
+    assert post(base_url + "not-the-token", body) == 403
+    assert post(base_url.rstrip("/"), body) == 403
+    assert post(f"http://127.0.0.1:{receiver.port}/", body) == 403
+    assert receiver.rejected == 3
+    assert receiver.generations == []
+
+    assert post(receiver.url, body) == 200
+    assert [generation.state for generation in receiver.generations] == ["completed"]
+
+
+def test_each_generation_state_is_handled_once(receiver, mock_api):
+    api, client = mock_api()
+    dreaming = generation_body(api, client, "dreaming")
+    completed = json.dumps(dict(json.loads(dreaming), state="completed"))
+    path = CALLBACK_PATH + receiver.token
+
+    statuses = [receiver.handle(path, body) for body in (dreaming, dreaming, completed, completed, dreaming)]
+
+    # Duplicates are still acknowledged, so Luma stops resending them
+    assert statuses == [200] * 5
+    assert [generation.state for generation in receiver.generations] == ["dreaming", "completed"]
+    assert (receiver.received, receiver.duplicates) == (2, 3)
+    assert receiver.handle(path, b"{not json") == 400
+    assert receiver.handle(path, b'{"id": 1}') == 400
+
+
+def test_a_batch_finishes_on_callbacks_alone(mock_api, tmp_path):
+    # Every callback is delivered twice, and the safety-net sweep is too slow to matter here
+    api, client = mock_api(callback_duplicate_rate=1.0)
+    callbacks = CallbackReceiver(sweep_interval=600)
+    specs = [{"name": f"shot{index}", "prompt": f"take {index}", "model": "ray-flash-2", "resolution": "540p",
+              "duration": "5s"} for index in range(4)]
+
+    try:
+        results = run_batch(client, specs, tmp_path / "out", max_concurrency=4, callbacks=callbacks)
+    finally:
+        callbacks.close()
+
+    assert all(result["error"] is None for result in results)
+    assert all(record["request"]["callback_url"] == callbacks.url for record in api.generations.values())
+    # dreaming and completed for each job, each sent twice and handled once
+    assert callbacks.received == 8 and callbacks.duplicates == 8
+    assert api.stats["callback"] == 16 and "callback_error" not in api.stats
+    assert "get" not in api.stats and "list" not in api.stats
@@ -0,0 +1,59 @@
+import json
+import pytest
+import concept_catalog
+from concept_catalog import InvalidConceptError, refresh_concepts, validate_concepts
+from mock_luma_server import MOCK_CONCEPTS
+
+
+@pytest.fixture
+def catalogue(mock_api, tmp_path, monkeypatch):
+    # (api, cache path): the catalogue cached in tmp_path, fetched from a fresh mock
+    api, client = mock_api()
+    monkeypatch.setenv("LUMA_BASE_URL", str(client.base_url))
+    monkeypatch.setattr(concept_catalog, "CONCEPT_CACHE_PATH", tmp_path / "concept_cache.json")
+    monkeypatch.setattr(concept_catalog, "_known", None)
+    return api, tmp_path / "concept_cache.json"
+
+
+def age_cache(cache_path, seconds, **changes):
+    cache = json.loads(cache_path.read_text(encoding="utf-8"))
+    cache.update(changes, fetched_at=cache["fetched_at"] - seconds)
+    cache_path.write_text(json.dumps(cache), encoding="utf-8")
+
+
+def test_an_unchanged_catalogue_is_revalidated_with_a_304(catalogue):
+    api, cache_path = catalogue
+
+    assert refresh_concepts() == MOCK_CONCEPTS
+    assert json.loads(cache_path.read_text(encoding="utf-8"))["etag"] == '"mock-concepts-v1"'
+
+    # Within the TTL the cache is used as it is, without a request
+    assert refresh_concepts() == MOCK_CONCEPTS
+    assert api.stats["concepts"] == 1
+
+    # Once it's stale the ETag goes back to the API, and its 304 keeps the cached list (marked here,
+    # so a full download would show) and restarts the TTL
+    age_cache(cache_path, concept_catalog.CONCEPT_TTL + 1, concepts=["orbit_left", "cached_only"])
+    assert refresh_concepts() == ["orbit_left", "cached_only"]
+    assert api.stats["concepts"] == 2
+    refresh_concepts()
+    assert api.stats["concepts"] == 2
+
+
+def test_a_changed_etag_downloads_the_list_again(catalogue):
+    api, cache_path = catalogue
+    refresh_concepts()
+
+    age_cache(cache_path, 0, etag='"older"', concepts=["cached_only"])
+    assert refresh_concepts(force=True) == MOCK_CONCEPTS
+    assert json.loads(cache_path.read_text(encoding="utf-8"))["concepts"] == MOCK_CONCEPTS
+
+
+def test_validate_concepts_uses_the_cache(catalogue):
+    api, _ = catalogue
+    refresh_concepts()
+    validate_concepts({"concepts": [{"key": "orbit_left"}, "zoom_in"]})
+
+    with pytest.raises(InvalidConceptError, match="Did you mean: orbit_left"):
+        validate_concepts({"concepts": [{"key": "orbit_lefft"}]})
+    assert api.stats["concepts"] == 1
@@ -0,0 +1,91 @@
+from types import SimpleNamespace
+import pytest
+import generation_cache
+from generation_cache import GenerationCache, spec_key
+
+SPEC = {"prompt": "a lighthouse", "model": "ray-2", "resolution": "720p", "duration": "5s",
+        "keyframes": {"frame0": {"type": "image", "url": "https://example.com/a.jpg"}}}
+
+
+def test_spec_key_ignores_bookkeeping_order_and_unset_values():
+    reordered = dict(reversed(list(SPEC.items())))
+    assert spec_key(reordered) == spec_key(SPEC)
+    assert spec_key(dict(SPEC, name="shot", callback_url="http://x", draft_of="abc")) == spec_key(SPEC)
+    assert spec_key(dict(SPEC, loop=None)) == spec_key(SPEC)
+    assert spec_key(dict(SPEC, final_spec=dict(SPEC, resolution="4k"))) == spec_key(SPEC)
+
+
+def test_spec_key_changes_with_anything_luma_renders():
+    assert spec_key(dict(SPEC, resolution="4k")) != spec_key(SPEC)
+    assert spec_key(dict(SPEC, loop=False)) != spec_key(SPEC)
+    assert spec_key(dict(SPEC, keyframes={"frame0": {"type": "image", "url": "https://example.com/b.jpg"}})) \
+        != spec_key(SPEC)
+
+
+def write(path, size):
+    path.write_bytes(b"x" * size)
+    return path
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    # Every call to time.time() in the cache is one second later, so LRU order is unambiguous
+    ticks = iter(range(1_000_000))
+    monkeypatch.setattr(generation_cache, "time", SimpleNamespace(time=lambda: float(next(ticks))))
+
+
+def test_store_lookup_restore(tmp_path, clock):
+    cache = GenerationCache(tmp_path / "cache")
+    cache.store(SPEC, "gen-1", "https://cdn/gen-1.mp4", write(tmp_path / "gen-1.mp4", 100))
+
+    entry = cache.lookup(dict(SPEC, name="other name"))
+    assert entry["generation_id"] == "gen-1"
+    assert entry["asset_url"] == "https://cdn/gen-1.mp4"
+    assert entry["key"] == spec_key(SPEC)
+    restored = cache.restore(entry, tmp_path / "out" / "copy.mp4")
+    assert restored.read_bytes() == b"x" * 100
+    assert cache.lookup(dict(SPEC, resolution="4k")) is None
+
+    # The index survives a restart
+    assert GenerationCache(tmp_path / "cache").lookup(SPEC)["generation_id"] == "gen-1"
+
+
+def test_lookup_forgets_entries_whose_media_was_deleted(tmp_path, clock):
+    cache = GenerationCache(tmp_path / "cache")
+    cache.store(SPEC, "gen-1", "url", write(tmp_path / "gen-1.mp4", 10))
+    for media in (tmp_path / "cache" / "media").iterdir():
+        media.unlink()
+
+    assert cache.lookup(SPEC) is None
+    assert cache.total_bytes() == 0
+
+
+def test_eviction_drops_the_least_recently_used(tmp_path, clock):
+    cache = GenerationCache(tmp_path / "cache", max_bytes=250)
+    specs = [dict(SPEC, prompt=f"prompt {index}") for index in range(3)]
+    cache.store(specs[0], "gen-0", "url", write(tmp_path / "0.mp4", 100))
+    cache.store(specs[1], "gen-1", "url", write(tmp_path / "1.mp4", 100))
+    cache.lookup(specs[0])  # gen-0 is now more recently used than gen-1
+
+    cache.store(specs[2], "gen-2", "url", write(tmp_path / "2.mp4", 100))
+
+    assert cache.lookup(specs[1]) is None
+    assert cache.lookup(specs[0])["generation_id"] == "gen-0"
+    assert cache.lookup(specs[2])["generation_id"] == "gen-2"
+    assert cache.total_bytes() == 200
+    assert len(list((tmp_path / "cache" / "media").iterdir())) == 2
+
+
+def test_invalidate(tmp_path, clock):
+    cache = GenerationCache(tmp_path / "cache")
+    cache.store(SPEC, "gen-1", "url", write(tmp_path / "gen-1.mp4", 10))
+    cache.invalidate(SPEC)
+
+    assert cache.lookup(SPEC) is None
+    assert list((tmp_path / "cache" / "media").iterdir()) == []
+
+
+def test_corrupt_index_starts_empty(tmp_path):
+    (tmp_path / "cache").mkdir()
+    (tmp_path / "cache" / "index.json").write_text("{not json", encoding="utf-8")
+    assert GenerationCache(tmp_path / "cache").lookup(SPEC) is None
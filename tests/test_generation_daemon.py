@@ -0,0 +1,175 @@
+import json
+import threading
+import http.client
+from http.server import ThreadingHTTPServer
+import pytest
+import generation_daemon
+import submit_job
+from generation_daemon import GenerationDaemon, make_handler, write_daemon_file
+from submit_job import DaemonError
+
+SPEC = {"prompt": "a lighthouse at dusk", "model": "ray-flash-2", "resolution": "540p", "duration": "5s"}
+TOKEN = "test-token"
+
+
+@pytest.fixture
+def daemon(mock_api, tmp_path):
+    # start(max_concurrency=...) -> (api, daemon) on a fresh mock
+    daemons = []
+
+    def start(max_concurrency=4, **settings):
+        api, client = mock_api(**settings)
+        daemons.append(GenerationDaemon(client, tmp_path / "outputs", max_concurrency=max_concurrency))
+        return api, daemons[-1]
+
+    yield start
+    for running in daemons:
+        running.close()
+
+
+@pytest.fixture
+def served(daemon, tmp_path):
+    # (api, daemon, daemon file) with the HTTP server submit_job.py talks to
+    api, running = daemon()
+    server = ThreadingHTTPServer(("127.0.0.1", 0), make_handler(running, TOKEN))
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    daemon_file = tmp_path / "daemon.json"
+    write_daemon_file(server.server_address[1], TOKEN, daemon_file)
+    yield api, running, daemon_file
+    server.shutdown()
+    server.server_close()
+
+
+def finish(running, jobs):
+    return [event["state"] for event in running.stream(jobs)]
+
+
+def test_jobs_run_through_every_state_to_completion(daemon):
+    api, running = daemon()
+
+    jobs = [running.submit(dict(SPEC, name=f"shot{index}")) for index in range(3)]
+    states = finish(running, jobs)
+
+    assert [job.state for job in jobs] == ["completed"] * 3
+    for state in ("waiting", "dreaming", "downloading", "completed"):
+        assert states.count(state) == 3
+    for job in jobs:
+        with open(job.path, "rb") as file:
+            assert file.read() == api.asset_bytes(0, api.generations[job.generation_id]["size"])
+    assert running.status()["in_flight"] == 0
+
+
+def test_a_waiting_job_is_dropped_without_reaching_luma(daemon):
+    api, running = daemon(max_concurrency=1)
+
+    first, second = running.submit(SPEC), running.submit(SPEC)
+    assert running.cancel(second.id).state == "cancelled"
+    finish(running, [first, second])
+
+    assert first.state == "completed"
+    assert api.stats["create_video"] == 1
+
+
+def test_cancel_during_the_create_call_deletes_the_generation(daemon, monkeypatch):
+    api, running = daemon()
+    entered, release = threading.Event(), threading.Event()
+    original = generation_daemon.submit_generation
+
+    def slow_submit(client, spec, timing):
+        entered.set()
+        release.wait(5)
+        return original(client, spec, timing)
+
+    monkeypatch.setattr(generation_daemon, "submit_generation", slow_submit)
+    job = running.submit(SPEC)
+    assert entered.wait(5)
+
+    assert running.cancel(job.id).cancel_requested
+    assert job.state == "waiting"
+    release.set()
+    finish(running, [job])
+
+    assert job.state == "cancelled"
+    assert api.generations[job.generation_id]["deleted"]
+    assert running.status()["in_flight"] == 0
+
+
+def test_an_unexpected_error_after_create_fails_the_job_and_frees_its_slot(daemon, monkeypatch):
+    api, running = daemon(max_concurrency=1)
+
+    original = running.poller.add
+    calls = []
+
+    def add_fails_once(generation):
+        calls.append(generation.id)
+        if len(calls) == 1:
+            raise RuntimeError("poller is gone")
+        original(generation)
+
+    monkeypatch.setattr(running.poller, "add", add_fails_once)
+    job = running.submit(SPEC)
+    finish(running, [job])
+
+    assert job.state == "failed" and "poller is gone" in job.error
+    assert running.status()["in_flight"] == 0
+    assert job.generation_id not in running._by_generation
+
+    # The slot really is free: the next job gets submitted
+    second = running.submit(SPEC)
+    finish(running, [second])
+    assert second.state == "completed"
+
+
+def test_requests_need_the_token(served):
+    _, _, daemon_file = served
+    port, _ = submit_job.daemon_address(daemon_file)
+    connection = http.client.HTTPConnection("127.0.0.1", port, timeout=5)
+    connection.request("GET", "/status", headers={"X-Daemon-Token": "wrong"})
+    assert connection.getresponse().status == 401
+
+
+def test_submit_job_streams_progress(served):
+    api, _, daemon_file = served
+
+    response = submit_job.request("POST", "/jobs?wait=1", [dict(SPEC, name="orbit")], daemon_file=daemon_file)
+    events = [json.loads(line) for line in response]
+
+    assert events[0]["state"] == "waiting" and events[-1]["state"] == "completed"
+    assert {event["name"] for event in events} == {"orbit"}
+    jobs = json.load(submit_job.request("GET", "/jobs", daemon_file=daemon_file))["jobs"]
+    assert [job["state"] for job in jobs] == ["completed"]
+
+
+def test_invalid_specs_are_rejected_before_anything_is_queued(served):
+    api, running, daemon_file = served
+
+    with pytest.raises(DaemonError, match="422"):
+        submit_job.request("POST", "/jobs", [SPEC, dict(SPEC, model="photon-1")], daemon_file=daemon_file)
+    assert not running.jobs and not api.generations
+
+
+def test_submit_job_cancel_reports_a_pending_cancel(served, monkeypatch, capsys):
+    api, running, daemon_file = served
+    entered, release = threading.Event(), threading.Event()
+    original = generation_daemon.submit_generation
+
+    def slow_submit(client, spec, timing):
+        entered.set()
+        release.wait(5)
+        return original(client, spec, timing)
+
+    monkeypatch.setattr(generation_daemon, "submit_generation", slow_submit)
+    address = submit_job.daemon_address
+    monkeypatch.setattr(submit_job, "daemon_address", lambda ignored: address(daemon_file))
+    job = json.load(submit_job.request("POST", "/jobs", SPEC))["jobs"][0]
+    assert entered.wait(5)
+
+    monkeypatch.setattr("sys.argv", ["submit_job.py", "--cancel", job["id"]])
+    submit_job.main()
+    assert "deleted at Luma as soon as it's created" in capsys.readouterr().out
+
+    release.set()
+    finish(running, [running.jobs[job["id"]]])
+    assert running.jobs[job["id"]].state == "cancelled"
+    assert api.generations[running.jobs[job["id"]].generation_id]["deleted"]
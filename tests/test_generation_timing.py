@@ -0,0 +1,107 @@
+import json
+import urllib.request
+from types import SimpleNamespace
+import pytest
+import generation_timing
+from batch_generate import run_batch
+from generation_timing import TimingTrace, serve_metrics
+
+SPEC = {"name": "shot", "prompt": "p", "model": "ray-2", "resolution": "720p", "duration": "5s"}
+
+
+class FakeClock:
+
+    def __init__(self):
+        self.now = 1_000.0
+
+    def monotonic(self):
+        return self.now
+
+    def time(self):
+        return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = FakeClock()
+    monkeypatch.setattr(generation_timing, "time", clock)
+    return clock
+
+
+def generation(state):
+    return SimpleNamespace(id="gen-1", state=state, request=None)
+
+
+def test_stages_follow_the_status_checks(clock, tmp_path):
+    trace = TimingTrace(tmp_path / "trace.jsonl")
+    timing = trace.start(SPEC, source="test")
+
+    clock.now += 0.5
+    timing.submitting()
+    clock.now += 1.0
+    timing.submitted(generation("queued"))
+    for seconds, state in ((10, "queued"), (20, "dreaming"), (60, "dreaming"), (15, "completed")):
+        clock.now += seconds
+        trace.observe(generation(state))
+    clock.now += 4
+    timing.downloading()
+    clock.now += 2
+    path = tmp_path / "clip.mp4"
+    path.write_bytes(b"x" * 1000)
+    timing.downloaded(path)
+    timing.finish()
+
+    record = json.loads((tmp_path / "trace.jsonl").read_text(encoding="utf-8"))
+    assert record["stages"] == {"build": 0.5, "create": 1.0, "queued": 30.0, "dreaming": 75.0, "render": 105.0,
+                                "detection_lag": 15.0, "download": 2.0, "total": 112.5}
+    assert (record["generation_id"], record["state"], record["checks"]) == ("gen-1", "completed", 4)
+    assert record["download_bytes_per_sec"] == 500
+
+
+def test_metrics_text_is_prometheus_histograms(clock):
+    trace = TimingTrace(path=None)
+    for seconds, error in ((3, None), (40, None), (700, "boom")):
+        timing = trace.start(SPEC)
+        timing.submitting()
+        timing.submitted(generation("queued"))
+        clock.now += seconds
+        trace.observe(generation("completed"))
+        timing.finish(error=error)
+    trace.start(SPEC).submitted(SimpleNamespace(id="gen-2", state="queued", request=None))
+
+    lines = trace.metrics_text().splitlines()
+
+    labels = 'stage="render",model="ray-2",resolution="720p"'
+    assert f'luma_generation_stage_seconds_bucket{{{labels},le="5"}} 1' in lines
+    assert f'luma_generation_stage_seconds_bucket{{{labels},le="60"}} 2' in lines
+    assert f'luma_generation_stage_seconds_bucket{{{labels},le="600"}} 2' in lines
+    assert f'luma_generation_stage_seconds_bucket{{{labels},le="+Inf"}} 3' in lines
+    assert f"luma_generation_stage_seconds_sum{{{labels}}} 743.000" in lines
+    assert f"luma_generation_stage_seconds_count{{{labels}}} 3" in lines
+    assert 'luma_generations_total{model="ray-2",resolution="720p",outcome="completed"} 2' in lines
+    assert 'luma_generations_total{model="ray-2",resolution="720p",outcome="error"} 1' in lines
+    assert "luma_generations_in_flight 1" in lines
+    assert "# TYPE luma_generation_stage_seconds histogram" in lines
+
+
+def test_a_batch_is_traced_and_served_as_metrics(mock_api, tmp_path):
+    api, client = mock_api()
+    trace = TimingTrace(tmp_path / "trace.jsonl")
+    server = serve_metrics(trace, 0)
+    specs = [dict(SPEC, name=f"shot{index}", model="ray-flash-2", resolution="540p") for index in range(3)]
+
+    try:
+        run_batch(client, specs, tmp_path / "out", timings=trace)
+        with urllib.request.urlopen(f"http://127.0.0.1:{server.server_address[1]}/metrics", timeout=5) as response:
+            metrics = response.read().decode("utf-8")
+    finally:
+        server.shutdown()
+        server.server_close()
+
+    records = [json.loads(line) for line in (tmp_path / "trace.jsonl").read_text(encoding="utf-8").splitlines()]
+    assert sorted(record["name"] for record in records) == ["shot0", "shot1", "shot2"]
+    for record in records:
+        assert record["state"] == "completed" and record["checks"] >= 1
+        assert all(record["stages"][stage] is not None for stage in ("create", "render", "download", "total"))
+    assert 'luma_generations_total{model="ray-flash-2",resolution="540p",outcome="completed"} 3' in metrics
+    assert "luma_generations_in_flight 0" in metrics
@@ -0,0 +1,85 @@
+import pytest
+import hedged_generation
+from hedged_generation import hedged_generate, variant_specs
+from job_ledger import JobLedger
+
+SPEC = {"name": "shot", "prompt": "a lighthouse at dusk", "model": "ray-flash-2", "resolution": "540p",
+        "duration": "5s"}
+
+
+def test_variant_specs_cycle_through_phrasings():
+    variants = variant_specs(SPEC, 3, phrasings=["a lighthouse, golden hour"])
+    assert [variant["name"] for variant in variants] == ["shot#1", "shot#2", "shot#3"]
+    assert [variant["prompt"] for variant in variants] == [
+        "a lighthouse at dusk", "a lighthouse, golden hour", "a lighthouse at dusk",
+    ]
+
+
+def test_first_finisher_wins_and_the_rest_are_cancelled(mock_api, tmp_path):
+    api, client = mock_api()
+    ledger = JobLedger(tmp_path / "ledger.sqlite3")
+    output_dir = tmp_path / "not" / "there" / "yet"
+
+    generation, path, variant = hedged_generate(client, SPEC, count=3, output_dir=output_dir, ledger=ledger)
+
+    assert path.parent == output_dir
+    assert path.read_bytes() == api.asset_bytes(0, path.stat().st_size)
+    assert ledger.get(generation.id)["state"] == "downloaded"
+    losers = [generation_id for generation_id in api.generations if generation_id != generation.id]
+    assert len(losers) == 2
+    for generation_id in losers:
+        assert api.generations[generation_id]["deleted"]
+        assert ledger.get(generation_id)["state"] == "cancelled"
+    assert variant["name"].startswith("shot#")
+
+
+def test_losers_are_cancelled_before_the_winner_downloads(mock_api, tmp_path, monkeypatch):
+    api, client = mock_api()
+    deleted_at_download = []
+
+    def download(generation, output_dir, image=False):
+        deleted_at_download.extend(record["deleted"] for record in api.generations.values()
+                                   if record["id"] != generation.id)
+        return original(generation, output_dir, image=image)
+
+    original = hedged_generation.download_generation
+    monkeypatch.setattr(hedged_generation, "download_generation", download)
+
+    hedged_generate(client, SPEC, count=3, output_dir=tmp_path)
+
+    assert deleted_at_download == [True, True]
+
+
+def test_best_score_is_kept_when_none_reach_the_bar(mock_api, tmp_path):
+    api, client = mock_api()
+    scores = iter([0.2, 0.4, 0.1])
+    scored = {}
+
+    def scorer(path, generation):
+        scored[generation.id] = next(scores)
+        return scored[generation.id]
+
+    generation, path, variant = hedged_generate(client, SPEC, count=3, scorer=scorer, min_score=0.9,
+                                                output_dir=tmp_path)
+
+    # All three had to be scored, so none was cancelled, and the 0.4 one won
+    assert scored[generation.id] == 0.4
+    assert not any(record["deleted"] for record in api.generations.values())
+    assert len(list(tmp_path.glob("*.mp4"))) == 3
+
+
+def test_every_variant_failing_raises(mock_api, tmp_path):
+    api, client = mock_api(failure_rate=1.0)
+    ledger = JobLedger(tmp_path / "ledger.sqlite3")
+
+    with pytest.raises(RuntimeError, match="Every variant failed"):
+        hedged_generate(client, SPEC, count=2, output_dir=tmp_path, ledger=ledger)
+    assert [job["state"] for job in ledger.recent()] == ["failed", "failed"]
+
+
+def test_invalid_spec_is_never_submitted(mock_api, tmp_path):
+    api, client = mock_api()
+
+    with pytest.raises(RuntimeError, match="None of the variants could be submitted"):
+        hedged_generate(client, dict(SPEC, duration="3s"), count=2, output_dir=tmp_path)
+    assert api.generations == {}
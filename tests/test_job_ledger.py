@@ -0,0 +1,81 @@
+from types import SimpleNamespace
+import pytest
+from job_ledger import JobLedger
+
+
+def generation(generation_id, state, failure_reason=None, video=None):
+    return SimpleNamespace(id=generation_id, state=state, failure_reason=failure_reason,
+                           assets=SimpleNamespace(video=video, image=None) if video else None)
+
+
+@pytest.fixture
+def ledger(tmp_path):
+    ledger = JobLedger(tmp_path / "ledger.sqlite3")
+    yield ledger
+    ledger.close()
+
+
+def test_a_job_from_submit_to_download(ledger, tmp_path):
+    spec = {"name": "shot", "model": "ray-2", "prompt": "a lighthouse"}
+    ledger.record_submitted(generation("gen-1", "queued"), spec, output_path=tmp_path / "gen-1.mp4",
+                            source="batch_generate.py")
+    ledger.record_state(generation("gen-1", "queued"))  # unchanged, not recorded again
+    ledger.record_state(generation("gen-1", "dreaming"))
+    ledger.record_state(generation("gen-1", "completed", video="https://cdn/gen-1.mp4"))
+    ledger.record_download("gen-1", tmp_path / "store" / "gen-1.mp4")
+
+    job = ledger.get("gen-1")
+    assert [row["state"] for row in ledger.transitions("gen-1")] == ["queued", "dreaming", "completed", "downloaded"]
+    assert job["state"] == "downloaded"
+    assert job["name"] == "shot" and job["model"] == "ray-2" and job["source"] == "batch_generate.py"
+    assert job["asset_url"] == "https://cdn/gen-1.mp4"
+    assert job["output_path"] == str((tmp_path / "store" / "gen-1.mp4").resolve())
+    assert job["completed_at"] is not None and job["downloaded_at"] is not None
+
+
+def test_unfinished_skips_final_states(ledger):
+    spec = {"name": "shot", "model": "ray-2"}
+    for generation_id in ("running", "completed", "failed", "downloaded", "cancelled"):
+        ledger.record_submitted(generation(generation_id, None), spec)
+    ledger.record_state(generation("running", "dreaming"))
+    ledger.record_state(generation("completed", "completed", video="https://cdn/x.mp4"))
+    ledger.record_state(generation("failed", "failed", failure_reason="moderation"))
+    ledger.record_download("downloaded", "x.mp4")
+    ledger.record_cancelled("cancelled")
+
+    # A completed job that never made it to disk still needs resume_jobs.py
+    assert [job["generation_id"] for job in ledger.unfinished()] == ["running", "completed"]
+    assert ledger.get("failed")["failure_reason"] == "moderation"
+    assert ledger.transitions("cancelled")[-1]["state"] == "cancelled"
+
+
+def test_submitted_without_a_state(ledger):
+    ledger.record_submitted(SimpleNamespace(id="gen-1"), {"name": "shot"})
+    assert ledger.get("gen-1")["state"] == "submitted"
+
+
+def test_unknown_generations_are_ignored(ledger):
+    ledger.record_state(generation("nobody", "completed"))
+    assert ledger.get("nobody") is None
+    assert ledger.transitions("nobody") == []
+
+
+def test_drafts_link_to_their_promotion(ledger):
+    draft_spec = {"name": "shot-draft", "model": "ray-flash-2", "final_spec": {"model": "ray-2"}}
+    ledger.record_submitted(generation("draft", "queued"), draft_spec)
+    ledger.record_submitted(generation("final", "queued"), {"name": "shot", "model": "ray-2", "draft_of": "draft"})
+    ledger.record_submitted(generation("other", "queued"), {"name": "other", "model": "ray-2"})
+
+    drafts = ledger.drafts()
+    assert [(job["generation_id"], job["promoted_to"]) for job in drafts] == [("draft", "final")]
+
+
+def test_ledger_survives_a_reopen(tmp_path):
+    path = tmp_path / "ledger.sqlite3"
+    first = JobLedger(path)
+    first.record_submitted(generation("gen-1", "queued"), {"name": "shot"})
+    first.close()
+
+    second = JobLedger(path)
+    assert [job["generation_id"] for job in second.unfinished()] == ["gen-1"]
+    second.close()
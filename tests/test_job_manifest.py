@@ -0,0 +1,123 @@
+import json
+import pytest
+from job_manifest import iter_prompt_file, iter_manifest
+
+PROMPT_FILE = '''# Orbit prompts
+video_prompt_v1 = (
+    "A lighthouse at dusk, "
+    "the camera orbits slowly."
+)
+
+video_prompt_v2 = ("Waves crash against the rocks.")
+
+A free-standing paragraph
+that spans two lines.
+
+# a comment between prompts
+notes = (
+    free text that isn't a Python string
+)
+
+"A quoted prompt
+
+with a blank line inside it"
+'''
+
+
+@pytest.fixture
+def prompt_file(tmp_path):
+    path = tmp_path / "prompt.txt"
+    path.write_text(PROMPT_FILE, encoding="utf-8")
+    return path
+
+
+def test_iter_prompt_file(prompt_file):
+    assert list(iter_prompt_file(prompt_file)) == [
+        ("video_prompt_v1", "A lighthouse at dusk, the camera orbits slowly."),
+        ("video_prompt_v2", "Waves crash against the rocks."),
+        ("prompt_9", "A free-standing paragraph that spans two lines."),
+        ("notes", "free text that isn't a Python string"),
+        ("prompt_17", "A quoted prompt with a blank line inside it"),
+    ]
+
+
+def test_jsonl_manifest_with_named_prompts_and_defaults(tmp_path, prompt_file):
+    manifest = tmp_path / "shots.jsonl"
+    manifest.write_text("\n".join([
+        json.dumps({"prompt_file": "prompt.txt", "prompt_name": "video_prompt_v2", "resolution": "4k"}),
+        "# skipped",
+        "",
+        json.dumps({"prompt": "inline prompt", "name": "inline"}),
+        json.dumps({"prompt": "no name"}),
+    ]), encoding="utf-8")
+
+    specs = list(iter_manifest(manifest, defaults={"model": "ray-2", "resolution": "720p"}))
+
+    assert specs == [
+        {"model": "ray-2", "resolution": "4k", "prompt": "Waves crash against the rocks.", "name": "video_prompt_v2"},
+        {"model": "ray-2", "resolution": "720p", "prompt": "inline prompt", "name": "inline"},
+        {"model": "ray-2", "resolution": "720p", "prompt": "no name", "name": "job002"},
+    ]
+
+
+def test_a_prompt_file_entry_expands_to_one_job_per_prompt(tmp_path, prompt_file):
+    manifest = tmp_path / "shots.json"
+    manifest.write_text(json.dumps([
+        {"prompt_file": "prompt.txt", "name": "orbit", "model": "ray-2"},
+        {"prompt": "x", "name": "orbit_notes"},  # clashes with an expanded name
+    ]), encoding="utf-8")
+
+    names = [spec["name"] for spec in iter_manifest(manifest)]
+
+    assert names == ["orbit_video_prompt_v1", "orbit_video_prompt_v2", "orbit_prompt_9", "orbit_notes",
+                     "orbit_prompt_17", "orbit_notes_2"]
+
+
+def test_toml_manifest(tmp_path, prompt_file):
+    manifest = tmp_path / "shots.toml"
+    manifest.write_text('''
+[defaults]
+model = "ray-flash-2"
+duration = "5s"
+
+[[job]]
+prompt_file = "prompt.txt"
+prompt_name = "video_prompt_v1"
+
+[[job]]
+prompt = "a still"
+model = "photon-1"
+''', encoding="utf-8")
+
+    specs = list(iter_manifest(manifest, defaults={"duration": "9s", "resolution": "540p"}))
+
+    assert specs[0] == {"model": "ray-flash-2", "duration": "5s", "resolution": "540p",
+                        "prompt": "A lighthouse at dusk, the camera orbits slowly.", "name": "video_prompt_v1"}
+    assert specs[1]["model"] == "photon-1" and specs[1]["name"] == "job001"
+
+
+def test_txt_manifest_is_a_prompt_file(prompt_file):
+    specs = list(iter_manifest(prompt_file, defaults={"model": "ray-2"}))
+    assert len(specs) == 5
+    assert all(spec["model"] == "ray-2" for spec in specs)
+
+
+def test_keyframe_only_entries(tmp_path):
+    keyframes = {"frame0": {"type": "generation", "id": "a"}, "frame1": {"type": "generation", "id": "b"}}
+    manifest = tmp_path / "shots.jsonl"
+    manifest.write_text(json.dumps({"keyframes": keyframes, "name": "bridge"}), encoding="utf-8")
+
+    assert list(iter_manifest(manifest, defaults={"model": "ray-2"})) == [
+        {"model": "ray-2", "keyframes": keyframes, "name": "bridge"},
+    ]
+
+
+def test_bad_entries(tmp_path, prompt_file):
+    manifest = tmp_path / "shots.jsonl"
+    manifest.write_text(json.dumps({"model": "ray-2"}), encoding="utf-8")
+    with pytest.raises(ValueError, match="has no 'prompt', 'prompt_file' or 'keyframes'"):
+        list(iter_manifest(manifest))
+
+    manifest.write_text(json.dumps({"prompt_file": "prompt.txt", "prompt_name": "nope"}), encoding="utf-8")
+    with pytest.raises(ValueError, match="Prompt 'nope' not found"):
+        list(iter_manifest(manifest))
@@ -0,0 +1,121 @@
+import shutil
+import subprocess
+import numpy as np
+import pytest
+from PIL import Image
+from local_transition import (LOCAL_BRIDGE_THRESHOLD, analyse, box_mean, bridge_spec, estimate_flow, local_bridge,
+                              resize_flow, rms, warp)
+from output_store import OutputStore
+from video_frames import probe_video
+
+
+def texture(height=96, width=128, seed=0):
+    # Smooth random texture (sums of a few sinusoids), so the flow has gradients everywhere
+    rng = np.random.default_rng(seed)
+    y, x = np.mgrid[0:height, 0:width].astype(np.float32)
+    image = np.zeros((height, width), dtype=np.float32)
+    for _ in range(6):
+        fx, fy = rng.uniform(0.02, 0.12, 2)
+        image += np.sin(fx * x + rng.uniform(0, 6)) * np.cos(fy * y + rng.uniform(0, 6))
+    return (image - image.min()) / (image.max() - image.min()) * 255
+
+
+def test_box_mean_matches_a_direct_window_mean():
+    image = np.random.default_rng(1).uniform(0, 1, (9, 11))
+    radius = 2
+    padded = np.pad(image, radius, mode="edge")
+    direct = np.array([[padded[y:y + 5, x:x + 5].mean() for x in range(11)] for y in range(9)])
+    np.testing.assert_allclose(box_mean(image, radius), direct, atol=1e-9)
+
+
+def test_warp_by_a_whole_pixel_shift():
+    image = texture()
+    flow = np.zeros(image.shape + (2,), dtype=np.float32)
+    flow[..., 0] = 3  # sample 3px to the right
+    warped = warp(image, flow)
+    np.testing.assert_allclose(warped[:, :-3], image[:, 3:], atol=1e-3)
+    # Stacks of flows warp in one go
+    assert warp(image, np.stack([flow, flow * 0])).shape == (2,) + image.shape
+
+
+def test_resize_flow_scales_the_vectors():
+    flow = np.ones((10, 20, 2), dtype=np.float32)
+    resized = resize_flow(flow, 20, 60)
+    assert resized.shape == (20, 60, 2)
+    np.testing.assert_allclose(resized[..., 0], 3.0, rtol=1e-5)
+    np.testing.assert_allclose(resized[..., 1], 2.0, rtol=1e-5)
+
+
+def test_estimate_flow_recovers_a_shift():
+    # second is first moved 2.5px right and 1.5px down, so first(p) = second(p + (2.5, 1.5))
+    first = texture(seed=3)
+    shift = np.zeros(first.shape + (2,), dtype=np.float32)
+    shift[..., 0], shift[..., 1] = -2.5, -1.5
+    second = warp(first, shift)
+
+    flow = estimate_flow(first, second)
+
+    inner = flow[12:-12, 12:-12]
+    assert np.median(inner[..., 0]) == pytest.approx(2.5, abs=0.3)
+    assert np.median(inner[..., 1]) == pytest.approx(1.5, abs=0.3)
+    assert rms((warp(second, flow) - first)[12:-12, 12:-12]) < rms((second - first)[12:-12, 12:-12]) / 4
+
+
+def rgb(grey):
+    return Image.fromarray(np.repeat(grey[..., None], 3, axis=2).astype(np.uint8))
+
+
+def test_analyse_separates_motion_from_new_content():
+    first = texture(180, 320, seed=4)
+    shift = np.zeros(first.shape + (2,), dtype=np.float32)
+    shift[..., 0] = -3
+    moved = warp(first, shift)
+
+    _, aligned, plain = analyse(rgb(first), rgb(moved))
+    assert aligned < plain / 3
+
+    # Completely different content: the flow can't explain it away
+    _, aligned, plain = analyse(rgb(first), rgb(texture(180, 320, seed=5)))
+    assert aligned > plain / 3
+
+
+@pytest.mark.skipif(shutil.which("ffmpeg") is None, reason="needs ffmpeg")
+def test_local_bridge_only_bridges_close_clips(tmp_path):
+    clips = []
+    for name, offset in (("a", 0), ("b", 4), ("c", 0)):
+        frame = tmp_path / f"{name}.png"
+        rgb(np.roll(texture(180, 320, seed=7 if name == "c" else 6), offset, axis=1)).save(frame)
+        clip = tmp_path / f"{name}.mp4"
+        subprocess.run(["ffmpeg", "-v", "error", "-loop", "1", "-i", str(frame), "-t", "1", "-r", "24",
+                        "-pix_fmt", "yuv420p", str(clip)], check=True)
+        clips.append(clip)
+
+    output = tmp_path / "bridge.mp4"
+    difference, frames = local_bridge(clips[0], clips[1], output, seconds=0.5)
+
+    # Starts on a's last frame, ends on b's first, 12 steps at 24 fps
+    assert difference < 6.0
+    assert frames == 13
+    info = probe_video(output)
+    assert (info["width"], info["height"], info["frame_count"]) == (320, 180, 13)
+
+    # Unrelated clips are left to the API
+    output.unlink()
+    difference, frames = local_bridge(clips[0], clips[2], output, seconds=0.5)
+    assert difference > 6.0 and frames is None
+    assert not output.exists()
+
+
+def test_a_stored_bridge_records_how_it_was_made(tmp_path):
+    bridge = tmp_path / "bridge.mp4"
+    bridge.write_bytes(b"not really a video")
+    store = OutputStore(tmp_path / "outputs", perceptual_hashes=False)
+
+    spec = bridge_spec("gen-a", "gen-b", frames=25, difference=3.14159)
+    store.add(bridge, "local-bridge-gen-a-gen-b", spec, source="local_transition.py", parents=["gen-a", "gen-b"])
+
+    assert spec["method"] == "optical-flow blend" and spec["source_clips"] == ["gen-a", "gen-b"]
+    assert (spec["frames"], spec["aligned_difference"], spec["threshold"]) == (25, 3.14, LOCAL_BRIDGE_THRESHOLD)
+    found = store.find(parent="gen-a")
+    assert [asset["generation_id"] for asset in found] == ["local-bridge-gen-a-gen-b"]
+    assert found[0]["model"] is None and found[0]["source"] == "local_transition.py"
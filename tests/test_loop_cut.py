@@ -0,0 +1,66 @@
+import numpy as np
+import pytest
+from loop_cut import MATCH_WINDOW, cut_scores, find_loop, frame_distances
+
+
+def noise_frames(count, seed=0):
+    return np.random.default_rng(seed).integers(0, 256, size=(count, 12, 16)).astype(np.uint8)
+
+
+def orbit(count, period, seed=0):
+    # A texture sliding round once every `period` frames, with a little sensor noise on each frame
+    rng = np.random.default_rng(seed)
+    base = rng.integers(0, 256, size=(12, 60)).astype(np.float32)
+    frames = [np.roll(base, round(index * 60 / period), axis=1) + rng.normal(0, 2, base.shape)
+              for index in range(count)]
+    return np.clip(frames, 0, 255).astype(np.uint8)
+
+
+def test_frame_distances_and_cut_scores():
+    frames = noise_frames(10)
+    distances = frame_distances(frames)
+    direct = np.sqrt(((frames[2].astype(float) - frames[7]) ** 2).mean())
+    assert distances[2, 7] == pytest.approx(direct, rel=1e-4)
+    np.testing.assert_allclose(np.diag(distances), 0, atol=1e-2)
+
+    scores = cut_scores(distances, window=1)
+    assert scores[0, 5] == np.inf and scores[5, 9] == np.inf
+    assert scores[3, 6] == pytest.approx((distances[2, 5] + distances[3, 6] + distances[4, 7]) / 3, rel=1e-5)
+
+
+def test_find_loop_finds_where_the_clip_repeats_itself():
+    # Frames 40..46 replay 12..18 exactly: frame 43 is frame 15 with the same three frames either
+    # side, so the loop plays 15..42 and wraps back to 15
+    frames = noise_frames(60)
+    frames[40:47] = frames[12:19]
+
+    cut = find_loop(frames, min_frames=20)
+
+    assert (cut.start, cut.end) == (15, 43)
+    assert cut.score == pytest.approx(0, abs=1e-2)
+    assert cut.whole_clip_score > 50
+
+
+def test_find_loop_respects_the_minimum_length():
+    # An exact 10 frame repeat and a slightly noisier 50 frame one
+    frames = noise_frames(80, seed=1)
+    frames[40:47] = frames[30:37]
+    frames[60:67] = np.clip(frames[10:17].astype(int) + 3, 0, 255)
+
+    assert find_loop(frames, min_frames=5)[:2] == (33, 43)
+    assert find_loop(frames, min_frames=20)[:2] == (13, 63)
+
+
+def test_find_loop_on_an_orbit_cuts_a_whole_revolution():
+    frames = orbit(70, period=30)
+
+    cut = find_loop(frames, min_frames=20)
+
+    assert cut.end - cut.start == 30
+    assert MATCH_WINDOW <= cut.start and cut.end <= 70 - MATCH_WINDOW
+    assert cut.score < cut.whole_clip_score / 5
+
+
+def test_find_loop_rejects_clips_too_short_for_the_loop():
+    with pytest.raises(ValueError, match="too few"):
+        find_loop(noise_frames(20), min_frames=15)
@@ -0,0 +1,68 @@
+import pytest
+from model_capabilities import request_problems, validate_request, InvalidRequestError, CAPABILITIES_VERSION
+
+RAY = {"model": "ray-2", "prompt": "a lighthouse", "resolution": "720p", "duration": "5s", "aspect_ratio": "16:9"}
+PHOTON = {"model": "photon-1", "prompt": "a lighthouse", "aspect_ratio": "1:1"}
+
+
+def test_valid_requests_have_no_problems():
+    assert request_problems(RAY) == []
+    assert request_problems(PHOTON) == []
+    assert request_problems({"model": "ray-flash-2", "keyframes": {
+        "frame0": {"type": "generation", "id": "abc"}, "frame1": {"type": "image", "url": "https://x/a.jpg"},
+    }}) == []
+    assert request_problems(dict(PHOTON, image_ref=[{"url": "https://x/a.jpg", "weight": 0.8}],
+                                 character_ref={"identity0": {"images": ["https://x/b.jpg"]}})) == []
+
+
+def test_unknown_model_suggests_a_close_match():
+    assert request_problems({"model": "ray2", "prompt": "x"}) == ["unknown model 'ray2'. Did you mean: ray-2?"]
+
+
+def test_video_problems():
+    assert request_problems(dict(RAY, resolution="8k", duration="3s")) == [
+        "ray-2 resolution must be one of 540p, 720p, 1080p, 4k, got '8k'",
+        "ray-2 duration must be one of 5s, 9s, got '3s'",
+    ]
+    assert request_problems(dict(RAY, aspect_ratio="2:1")) == [
+        "aspect_ratio '2:1' isn't one of 1:1, 16:9, 9:16, 4:3, 3:4, 21:9, 9:21"
+    ]
+    assert request_problems({"model": "ray-2"}) == ["a prompt is required (or keyframes)"]
+    assert request_problems(dict(RAY, loop=True, keyframes={"frame1": {"type": "image", "url": "https://x/a.jpg"}})) \
+        == ["loop=True can't be combined with an end keyframe (frame1)"]
+    assert request_problems(dict(RAY, keyframes={"frame2": {"type": "image", "url": "u"},
+                                                 "frame0": {"type": "video"}})) == [
+        "unknown keyframe 'frame2' (expected frame0 or frame1)",
+        "keyframe frame0 type must be 'image' or 'generation', got 'video'",
+    ]
+    assert request_problems(dict(RAY, image_ref=[])) == ["ray-2 doesn't take image_ref"]
+
+
+def test_image_problems():
+    assert request_problems(dict(PHOTON, resolution="720p")) == ["photon-1 doesn't take resolution"]
+    assert request_problems({"model": "photon-1", "keyframes": {}}) == [
+        "photon-1 doesn't take keyframes", "a prompt is required",
+    ]
+    references = [{"url": f"https://x/{index}.jpg", "weight": 0.5} for index in range(5)]
+    references[1]["weight"] = 1.5
+    assert request_problems(dict(PHOTON, image_ref=references)) == [
+        "image_ref takes at most 4 images, got 5",
+        "image_ref[1] weight must be between 0 and 1, got 1.5",
+    ]
+    assert request_problems(dict(PHOTON, style_ref=[{"weight": 0.5}])) == ["style_ref[0] needs a 'url'"]
+    assert request_problems(dict(PHOTON, character_ref={"identity1": {"images": ["u"]}})) == [
+        "character_ref only supports 'identity0', not 'identity1'"
+    ]
+    assert request_problems(dict(PHOTON, format="gif")) == ["format must be one of jpg, png, got 'gif'"]
+
+
+def test_validate_request_lists_every_problem():
+    with pytest.raises(InvalidRequestError) as raised:
+        validate_request(dict(RAY, resolution="8k", duration="3s"))
+    message = str(raised.value)
+    assert message.startswith("Invalid ray-2 request: ray-2 resolution must be")
+    assert "; ray-2 duration must be" in message
+    assert CAPABILITIES_VERSION in message
+    # Still a ValueError, for callers that catch those
+    assert isinstance(raised.value, ValueError)
+    validate_request(RAY)
@@ -0,0 +1,85 @@
+import time
+import numpy as np
+import pytest
+from PIL import Image, ImageFilter
+from output_store import OutputStore
+
+ORBIT = {"prompt": "A lighthouse at dusk, the camera orbits slowly.", "model": "ray-2", "name": "orbit"}
+STILL = {"prompt": "A bronze pharaoh statue", "model": "photon-1", "name": "still"}
+
+
+@pytest.fixture
+def store(tmp_path):
+    store = OutputStore(tmp_path / "outputs", perceptual_hashes=False)
+    yield store
+    store.close()
+
+
+def asset(tmp_path, name, content):
+    path = tmp_path / name
+    path.write_bytes(content)
+    return path
+
+
+def test_identical_files_are_stored_once(store, tmp_path):
+    first = store.add(asset(tmp_path, "a.mp4", b"same bytes"), "gen-a", ORBIT)
+    second = store.add(asset(tmp_path, "b.mp4", b"same bytes"), "gen-b", dict(ORBIT, name="retake"))
+
+    assert first == second and first.read_bytes() == b"same bytes"
+    assert not (tmp_path / "a.mp4").exists() and not (tmp_path / "b.mp4").exists()
+    assert sorted(row["generation_id"] for row in store.with_sha256(store.get("gen-a")["sha256"])) == ["gen-a", "gen-b"]
+    assert store.sidecar("gen-b")["name"] == "retake"
+
+
+def test_find_by_prompt_words_model_date_and_parent(store, tmp_path):
+    store.add(asset(tmp_path, "a.mp4", b"orbit"), "gen-a", ORBIT)
+    store.add(asset(tmp_path, "b.jpg", b"still"), "gen-b", STILL)
+    extended = dict(ORBIT, prompt="The lighthouse at night", keyframes={"frame0": {"type": "generation", "id": "gen-a"}})
+    store.add(asset(tmp_path, "c.mp4", b"extended"), "gen-c", extended)
+
+    def found(**query):
+        return [row["generation_id"] for row in store.find(**query)]
+
+    assert found(text="lighthouse") == ["gen-c", "gen-a"]
+    assert found(text="lighthouse dusk") == ["gen-a"]
+    assert found(text='orbits, "slowly."') == ["gen-a"]  # punctuation can't break the FTS query
+    assert found(text="pharaoh", model="photon-1") == ["gen-b"]
+    assert found(text="pharaoh", model="ray-2") == []
+    assert found(parent="gen-a") == ["gen-c"]
+    assert found(since=time.time() + 60) == []
+    assert found(model="ray-2", limit=1) == ["gen-c"]
+    assert store.get("gen-b")["kind"] == "image"
+
+
+def test_reindex_rebuilds_from_the_sidecars(store, tmp_path):
+    store.add(asset(tmp_path, "a.mp4", b"first"), "gen-a", ORBIT)
+    # Re-adding a generation with new content drops its old sidecar, so reindex can't resurrect it
+    store.add(asset(tmp_path, "a.mp4", b"second"), "gen-a", ORBIT)
+    store.add(asset(tmp_path, "b.jpg", b"still"), "gen-b", STILL)
+
+    with store._lock:
+        store._connection.executescript("DELETE FROM assets; DELETE FROM parents; DELETE FROM prompts;")
+    assert store.find() == []
+
+    assert store.reindex() == 2
+    assert store.path_for("gen-a").read_bytes() == b"second"
+    assert [row["generation_id"] for row in store.find(text="pharaoh")] == ["gen-b"]
+
+
+def picture(seed):
+    coarse = np.random.default_rng(seed).uniform(0, 255, (8, 8)).astype(np.uint8)
+    return Image.fromarray(coarse).resize((256, 256), Image.Resampling.BICUBIC).convert("RGB")
+
+
+def test_similar_finds_near_duplicates(tmp_path):
+    store = OutputStore(tmp_path / "outputs")
+    for seed in range(3):
+        picture(seed).save(tmp_path / f"{seed}.png")
+        store.add(tmp_path / f"{seed}.png", f"gen-{seed}", dict(STILL, name=f"still{seed}"))
+    query = tmp_path / "query.jpg"
+    picture(1).filter(ImageFilter.GaussianBlur(1)).save(query, quality=70)
+
+    matches = store.similar(query, max_distance=8)
+
+    assert [asset["generation_id"] for asset, _, _ in matches] == ["gen-1"]
+    store.close()
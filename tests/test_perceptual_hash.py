@@ -0,0 +1,83 @@
+import shutil
+import subprocess
+import numpy as np
+import pytest
+from PIL import Image, ImageFilter
+from perceptual_hash import (HashIndex, area_matrix, dct_matrix, dhash, from_blob, hash_file, phash, popcount,
+                             to_blob)
+
+
+def picture(seed, size=256):
+    # A smooth random landscape: enough structure for the hashes, nothing they'd call flat
+    rng = np.random.default_rng(seed)
+    coarse = rng.uniform(0, 255, (8, 8)).astype(np.uint8)
+    return Image.fromarray(coarse).resize((size, size), Image.Resampling.BICUBIC).convert("RGB")
+
+
+def distance(a, b):
+    return int(popcount(np.asarray([a ^ b], dtype=np.uint64))[0])
+
+
+def test_matrices_are_what_the_hashes_assume():
+    dct = dct_matrix(32)
+    np.testing.assert_allclose(dct @ dct.T, np.eye(32), atol=1e-5)
+    resample = area_matrix(9, 32)
+    np.testing.assert_allclose(resample.sum(axis=1), np.ones(9), rtol=1e-6)
+
+
+def test_popcount():
+    values = np.array([0, 1, 0xFF, 2 ** 64 - 1], dtype=np.uint64)
+    assert popcount(values).tolist() == [0, 1, 8, 64]
+
+
+def test_near_duplicates_hash_close_and_different_images_far(tmp_path):
+    original = picture(1)
+    original.save(tmp_path / "a.png")
+    original.filter(ImageFilter.GaussianBlur(1)).resize((200, 200)).save(tmp_path / "a_small.jpg", quality=70)
+    picture(2).save(tmp_path / "b.png")
+
+    (a_phash,), (a_dhash,) = hash_file(tmp_path / "a.png")
+    (small_phash,), (small_dhash,) = hash_file(tmp_path / "a_small.jpg")
+    (b_phash,), (b_dhash,) = hash_file(tmp_path / "b.png")
+
+    assert distance(a_phash, small_phash) <= 6 and distance(a_dhash, small_dhash) <= 6
+    assert distance(a_phash, b_phash) > 16 and distance(a_dhash, b_dhash) > 16
+
+
+def test_hashes_are_batched_over_frames():
+    thumbnails = np.stack([np.asarray(picture(seed, 32).convert("L"), dtype=np.float32) for seed in range(3)])
+    assert phash(thumbnails).tolist() == [phash(thumbnails[index:index + 1])[0] for index in range(3)]
+    assert dhash(thumbnails).dtype == np.uint64
+
+
+def test_blob_round_trip():
+    hashes = np.array([1, 2 ** 63 + 5, 2 ** 64 - 1], dtype=np.uint64)
+    assert from_blob(to_blob(hashes)).tolist() == hashes.tolist()
+
+
+def test_hash_index_search():
+    rng = np.random.default_rng(0)
+    frames = rng.integers(0, 2 ** 63, size=(3, 4), dtype=np.uint64)
+    rows = [(f"asset{index}", to_blob(frames[index]), to_blob(frames[index] ^ np.uint64(1)))
+            for index in range(3)]
+    index = HashIndex(rows)
+    assert len(index) == 3
+
+    # One frame of asset1 with 3 bits flipped in its pHash: found, closest first, the others are far
+    query = frames[1][2] ^ np.uint64(0b111)
+    assert index.search([query], [frames[1][2] ^ np.uint64(1)]) == [("asset1", 3, 0)]
+    assert index.search([query], [frames[1][2]], max_distance=2) == []
+    assert [key for key, _, _ in index.search(frames[0], frames[0] ^ np.uint64(1), max_distance=64)][0] == "asset0"
+    assert len(index.search(frames[0], frames[0], max_distance=64, limit=2)) == 2
+    assert HashIndex([]).search([1], [1]) == []
+
+
+@pytest.mark.skipif(shutil.which("ffmpeg") is None, reason="needs ffmpeg")
+def test_video_gets_one_hash_per_sampled_keyframe(tmp_path):
+    path = tmp_path / "clip.mp4"
+    subprocess.run(["ffmpeg", "-v", "error", "-f", "lavfi", "-i", "testsrc=size=160x90:rate=10:duration=2",
+                    "-g", "5", "-pix_fmt", "yuv420p", str(path)], check=True)
+
+    phashes, dhashes = hash_file(path)
+
+    assert 1 < len(phashes) <= 8 and len(dhashes) == len(phashes)
@@ -0,0 +1,43 @@
+import json
+import pytest
+from batch_generate import run_batch, draft_spec
+from job_ledger import JobLedger
+from promote_draft import final_spec_for
+
+SPEC = {"name": "orbit", "prompt": "a lighthouse at dusk", "model": "ray-2", "resolution": "1080p", "duration": "9s",
+        "aspect_ratio": "16:9", "concepts": [{"key": "orbit_left"}]}
+
+
+def test_a_draft_is_promoted_to_the_spec_it_stood_in_for(mock_api, tmp_path):
+    api, client = mock_api()
+    ledger = JobLedger(tmp_path / "ledger.sqlite3")
+
+    [draft] = run_batch(client, [draft_spec(SPEC)], tmp_path / "out", ledger=ledger)
+    sent = api.generations[draft["generation_id"]]["request"]
+    assert (sent["model"], sent["resolution"], sent["duration"]) == ("ray-flash-2", "540p", "5s")
+
+    final = final_spec_for(ledger.get(draft["generation_id"]))
+    assert final == dict(SPEC, draft_of=draft["generation_id"])
+
+    [promoted] = run_batch(client, [final], tmp_path / "out", ledger=ledger)
+    sent = api.generations[promoted["generation_id"]]["request"]
+    assert (sent["model"], sent["resolution"], sent["duration"]) == ("ray-2", "1080p", "9s")
+    assert sent["prompt"] == SPEC["prompt"] and sent["concepts"] == SPEC["concepts"]
+    assert "draft_of" not in sent and "final_spec" not in sent
+    [listed] = ledger.drafts()
+    assert (listed["generation_id"], listed["promoted_to"]) == (draft["generation_id"], promoted["generation_id"])
+
+
+def test_only_standalone_drafts_can_be_promoted():
+    with pytest.raises(ValueError, match="is not a draft"):
+        final_spec_for({"generation_id": "gen-1", "spec": json.dumps(SPEC)})
+
+    node = dict(SPEC, keyframes={"frame0": {"type": "generation", "node": "wide"}})
+    with pytest.raises(ValueError, match="re-run run_pipeline.py"):
+        final_spec_for({"generation_id": "gen-2", "spec": json.dumps(draft_spec(node))})
+
+
+def test_a_draft_of_a_draft_is_not_drafted_twice():
+    draft = draft_spec(SPEC)
+    assert draft_spec(draft) is draft
+    assert draft["name"] == "orbit-draft" and draft["final_spec"] == SPEC
@@ -0,0 +1,177 @@
+from types import SimpleNamespace
+from email.utils import formatdate
+import httpx
+import pytest
+import rate_limiter
+from rate_limiter import CircuitBreaker, RateLimitedTransport, TokenBucket, retry_after_seconds
+
+CREATE_URL = "https://api.lumalabs.ai/dream-machine/v1/generations/video"
+GET_URL = "https://api.lumalabs.ai/dream-machine/v1/generations/abc"
+
+
+class FakeClock:
+    # Stands in for the time module: sleeping just moves the clock on
+
+    def __init__(self):
+        self.now = 1_000_000.0
+        self.slept = []
+
+    def monotonic(self):
+        return self.now
+
+    def time(self):
+        return self.now
+
+    def sleep(self, seconds):
+        self.slept.append(seconds)
+        self.now += seconds
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = FakeClock()
+    monkeypatch.setattr(rate_limiter, "time", clock)
+    return clock
+
+
+@pytest.fixture
+def server(monkeypatch):
+    # Answers every request the transport sends with the next of `server.responses`
+    # (a status code, or an exception to raise), through httpx.MockTransport
+    calls = []
+    responses = []
+
+    def handler(request):
+        calls.append(request.method)
+        answer = responses.pop(0)
+        if isinstance(answer, Exception):
+            raise answer
+        status, headers = answer if isinstance(answer, tuple) else (answer, {})
+        return httpx.Response(status, headers=headers, json={})
+
+    mock = httpx.MockTransport(handler)
+    monkeypatch.setattr(httpx.HTTPTransport, "handle_request", lambda self, request: mock.handle_request(request))
+    monkeypatch.setattr(rate_limiter, "backoff_seconds", lambda attempt: 1.0)
+    return SimpleNamespace(calls=calls, responses=responses)
+
+
+def transport():
+    return RateLimitedTransport(request_bucket=TokenBucket(100, 100), create_bucket=TokenBucket(100, 100),
+                                breaker=CircuitBreaker(failure_threshold=10))
+
+
+def send(method, url, transport):
+    return transport.handle_request(httpx.Request(method, url))
+
+
+def test_token_bucket_spends_its_burst_then_waits_for_the_rate(clock):
+    bucket = TokenBucket(rate=2, capacity=3)
+
+    for _ in range(4):
+        bucket.acquire()
+    assert clock.slept == [pytest.approx(0.5)]
+
+    # Idle time refills it, but never past its capacity
+    clock.now += 60
+    for _ in range(3):
+        bucket.acquire()
+    assert len(clock.slept) == 1
+
+
+def test_token_bucket_drain_holds_tokens_back(clock):
+    bucket = TokenBucket(rate=1, capacity=5)
+    bucket.drain(4)
+
+    bucket.acquire()
+
+    assert sum(clock.slept) == pytest.approx(5)
+
+
+def test_retry_after_seconds(clock):
+    def retry_after(**headers):
+        return retry_after_seconds(httpx.Response(429, headers=headers))
+
+    assert retry_after(**{"Retry-After": "7"}) == 7
+    assert retry_after(**{"retry-after-ms": "1500", "Retry-After": "7"}) == 1.5
+    assert retry_after(**{"Retry-After": formatdate(clock.now + 30, usegmt=True)}) == pytest.approx(30)
+    assert retry_after(**{"Retry-After": formatdate(clock.now - 30, usegmt=True)}) == 0
+    assert retry_after(**{"Retry-After": "86400"}) == rate_limiter.MAX_RETRY_AFTER
+    assert retry_after(**{"Retry-After": "soon"}) is None
+    assert retry_after() is None
+
+
+def test_circuit_breaker_opens_probes_and_closes(clock):
+    breaker = CircuitBreaker(failure_threshold=3, cooldown=10)
+
+    breaker.record_failure()
+    breaker.record_failure()
+    assert breaker.state == "closed"
+    breaker.record_failure()
+    assert breaker.state == "open"
+
+    # Callers wait out the cooldown, then one of them gets to probe
+    breaker.before_call()
+    assert breaker.state == "half-open"
+    assert sum(clock.slept) >= 10
+
+    # A failed probe re-opens it straight away
+    breaker.record_failure()
+    assert breaker.state == "open"
+    clock.slept.clear()
+    breaker.before_call()
+    assert sum(clock.slept) >= 10
+
+    breaker.record_success()
+    assert breaker.state == "closed"
+    clock.slept.clear()
+    breaker.before_call()
+    assert clock.slept == []
+
+
+def test_a_failed_create_is_not_replayed(clock, server):
+    server.responses.extend([500, 502])
+    limited = transport()
+
+    assert send("POST", CREATE_URL, limited).status_code == 500
+    assert server.calls == ["POST"] and server.responses == [502]
+    assert limited.retried == 0
+
+
+def test_idempotent_calls_retry_5xx(clock, server):
+    server.responses.extend([503, (500, {"Retry-After": "4"}), 200])
+    limited = transport()
+
+    assert send("GET", GET_URL, limited).status_code == 200
+    assert server.calls == ["GET"] * 3
+    assert clock.slept == [1.0, 4.0]
+
+
+def test_429s_are_retried_for_creates_too(clock, server):
+    server.responses.extend([(429, {"Retry-After": "3"}), 201])
+    limited = transport()
+
+    assert send("POST", CREATE_URL, limited).status_code == 201
+    assert server.calls == ["POST", "POST"]
+    assert limited.throttled == 1
+    # Retry-After is honoured, and the drained buckets hand out nothing until it has passed
+    assert clock.slept[0] == 3
+    assert sum(clock.slept) == pytest.approx(3.01)
+
+
+def test_a_create_that_never_connected_is_retried(clock, server):
+    server.responses.extend([httpx.ConnectError("refused"), 201])
+    assert send("POST", CREATE_URL, transport()).status_code == 201
+
+    # Anything that may have reached the server is not
+    server.responses.extend([httpx.ReadTimeout("slow")])
+    with pytest.raises(httpx.ReadTimeout):
+        send("POST", CREATE_URL, transport())
+
+
+def test_retries_stop_at_max_retries(clock, server):
+    server.responses.extend([503] * 3)
+    limited = transport()
+    limited.max_retries = 2
+
+    assert send("GET", GET_URL, limited).status_code == 503
+    assert len(server.calls) == 3
@@ -0,0 +1,59 @@
+from pathlib import Path
+import pytest
+from PIL import Image
+from reference_images import LocalDirectoryBackend, ReferenceImages, is_local_reference
+
+BASE_URL = "https://refs.example.com"
+
+
+@pytest.mark.parametrize("value, local", [
+    ("face.png", True),
+    ("~/refs/face.png", True),
+    ("/home/me/face.png", True),
+    (Path("face.png"), True),
+    ("C:\\refs\\face.png", True),
+    ("file:///home/me/face.png", True),
+    ("https://cdn.example.com/face.png", False),
+    ("http://cdn.example.com/face.png", False),
+    ("data:image/png;base64,iVBORw0KGgo=", False),
+    ("gs://bucket/face.png", False),
+    ("s3://bucket/face.png", False),
+    ("", False),
+    (None, False),
+])
+def test_is_local_reference(value, local):
+    assert is_local_reference(value) is local
+
+
+@pytest.fixture
+def references(tmp_path):
+    return ReferenceImages(LocalDirectoryBackend(tmp_path / "uploads", BASE_URL), cache_dir=tmp_path / "cache",
+                           max_workers=1)
+
+
+def test_resolve_spec_uploads_local_files_and_passes_the_rest_through(references, tmp_path):
+    image = tmp_path / "face.png"
+    Image.new("RGB", (64, 48), "red").save(image)
+    spec = {
+        "prompt": "a portrait",
+        "aspect_ratio": "16:9",
+        "keyframes": {"frame0": {"type": "image", "url": image.as_uri()}},
+        "image_ref": [{"url": str(image), "weight": 0.5}, {"url": "gs://bucket/pose.png"}, {"weight": 0.2}],
+        "style_ref": [{"url": "s3://bucket/style.png"}],
+    }
+
+    resolved = references.resolve_spec(spec)
+
+    keyframe_url = resolved["keyframes"]["frame0"]["url"]
+    image_ref_url = resolved["image_ref"][0]["url"]
+    assert keyframe_url.startswith(BASE_URL) and image_ref_url.startswith(BASE_URL)
+    # Cropped to 16:9 as a keyframe, kept as it is as an image_ref: two different uploads
+    assert keyframe_url != image_ref_url
+    assert resolved["image_ref"][1:] == spec["image_ref"][1:]
+    assert resolved["style_ref"] == spec["style_ref"]
+    assert len(list((tmp_path / "uploads").iterdir())) == 2
+
+
+def test_resolve_spec_leaves_entries_without_a_url_alone(references):
+    spec = {"prompt": "p", "keyframes": {"frame0": {"type": "image"}}, "image_ref": [{"weight": 0.5}]}
+    assert references.resolve_spec(spec) == spec
@@ -0,0 +1,121 @@
+import json
+import pytest
+from run_pipeline import main, run_pipeline, load_pipeline, topological_order
+from generation_cache import GenerationCache
+
+
+def node(prompt=None, parents=(), **extra):
+    spec = {"model": "ray-flash-2", "resolution": "540p", "duration": "5s"}
+    if prompt:
+        spec["prompt"] = prompt
+    if parents:
+        spec["keyframes"] = {slot: {"type": "generation", "node": parent}
+                             for slot, parent in zip(("frame0", "frame1"), parents)}
+    spec.update(extra)
+    return spec
+
+
+def write_pipeline(path, nodes):
+    path.write_text(json.dumps({"nodes": nodes}), encoding="utf-8")
+    return load_pipeline(path)
+
+
+def test_children_start_from_their_parents_generations(mock_api, tmp_path):
+    api, client = mock_api()
+    nodes = write_pipeline(tmp_path / "orbit.json", {
+        "wide": node("a wide shot of a lighthouse"),
+        "close": node("a close up of the lamp"),
+        "push_in": node("push in towards the lamp", parents=["wide"]),
+        # Keyframes alone are enough for a bridge
+        "bridge": node(parents=["push_in", "close"]),
+    })
+
+    results = run_pipeline(client, nodes, tmp_path / "out", max_concurrency=2)
+
+    assert all(result["error"] is None and result["path"] for result in results.values())
+    requests = {name: api.generations[result["generation_id"]]["request"] for name, result in results.items()}
+    assert requests["push_in"]["keyframes"] == {"frame0": {"type": "generation", "id": results["wide"]["generation_id"]}}
+    assert requests["bridge"]["keyframes"] == {
+        "frame0": {"type": "generation", "id": results["push_in"]["generation_id"]},
+        "frame1": {"type": "generation", "id": results["close"]["generation_id"]},
+    }
+    assert "prompt" not in requests["bridge"]
+    # A child is only submitted once its parent has completed
+    wide, push_in = (api.generations[results[name]["generation_id"]] for name in ("wide", "push_in"))
+    assert push_in["created"] >= wide["created"]
+
+
+def test_a_failed_node_skips_its_descendants(mock_api, tmp_path):
+    api, client = mock_api()
+    nodes = write_pipeline(tmp_path / "orbit.json", {
+        "ok": node("a lighthouse"),
+        # Rejected by the capability check at submit time
+        "broken": node("a lighthouse at 8k", resolution="8k"),
+        "child": node("continue", parents=["broken"]),
+        "grandchild": node("and again", parents=["child"]),
+    })
+
+    results = run_pipeline(client, nodes, tmp_path / "out")
+
+    assert results["ok"]["error"] is None and results["ok"]["path"]
+    assert "resolution must be one of" in results["broken"]["error"]
+    assert results["child"]["error"] == "parent 'broken' failed"
+    assert results["grandchild"]["error"] == "parent 'broken' failed"
+    assert results["child"]["generation_id"] is None and results["grandchild"]["generation_id"] is None
+    assert api.stats["create_video"] == 1
+
+
+def test_a_failed_render_skips_its_descendants(mock_api, tmp_path):
+    api, client = mock_api(failure_rate=1.0)
+    nodes = write_pipeline(tmp_path / "orbit.json", {"root": node("a lighthouse"), "child": node(parents=["root"])})
+
+    results = run_pipeline(client, nodes, tmp_path / "out")
+
+    assert results["root"]["error"].startswith("Generation failed: ")
+    assert results["child"]["error"] == "parent 'root' failed"
+    assert api.stats["create_video"] == 1
+
+
+def test_cached_nodes_still_release_their_children(mock_api, tmp_path):
+    api, client = mock_api()
+    cache = GenerationCache(tmp_path / "cache")
+    nodes = {"root": node("a lighthouse"), "child": node("push in", parents=["root"])}
+
+    first = run_pipeline(client, write_pipeline(tmp_path / "a.json", nodes), tmp_path / "out", cache=cache)
+    second = run_pipeline(client, write_pipeline(tmp_path / "b.json", nodes), tmp_path / "out", cache=cache)
+
+    assert api.stats["create_video"] == 2
+    assert {name: result["generation_id"] for name, result in second.items()} == \
+        {name: result["generation_id"] for name, result in first.items()}
+
+
+def test_load_pipeline_rejects_bad_graphs(tmp_path):
+    with pytest.raises(ValueError, match="unknown node 'missing'"):
+        write_pipeline(tmp_path / "a.json", {"a": node("x", parents=["missing"])})
+    with pytest.raises(ValueError, match="cycle"):
+        write_pipeline(tmp_path / "b.json", {"a": node("x", parents=["b"]), "b": node("y", parents=["a"])})
+    with pytest.raises(ValueError, match="no 'nodes'"):
+        write_pipeline(tmp_path / "c.json", {})
+
+
+@pytest.mark.parametrize("contents", [
+    {"nodes": {"a": node("x", parents=["b"]), "b": node("y", parents=["a"])}},
+    {"nodes": {}},
+    None,
+])
+def test_main_reports_a_bad_pipeline_without_a_traceback(tmp_path, monkeypatch, capsys, contents):
+    pipeline = tmp_path / "orbit.json"
+    if contents is not None:
+        pipeline.write_text(json.dumps(contents), encoding="utf-8")
+    monkeypatch.setattr("sys.argv", ["run_pipeline.py", str(pipeline)])
+
+    with pytest.raises(SystemExit) as exited:
+        main()
+
+    assert exited.value.code == 1
+    assert capsys.readouterr().out.startswith("Error: ")
+
+
+def test_topological_order_is_stable():
+    nodes = {"c": node("c", parents=["a"]), "b": node("b"), "a": node("a"), "d": node(parents=["c", "b"])}
+    assert topological_order(nodes) == ["a", "b", "c", "d"]
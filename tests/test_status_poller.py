@@ -0,0 +1,147 @@
+import time
+import threading
+from types import SimpleNamespace
+import pytest
+from status_poller import StatusPoller, POLL_PROFILES, expected_render_seconds, next_poll_delay
+
+
+def test_expected_render_seconds_scales_video_not_stills():
+    assert expected_render_seconds("ray-2", "720p", "5s") == 90
+    assert expected_render_seconds("ray-2", "4k", "9s") == pytest.approx(90 * 4.0 * 1.8)
+    assert expected_render_seconds("photon-1", "4k", "9s") == 15
+    assert expected_render_seconds("unknown-model") == 60
+
+
+def test_next_poll_delay_schedule():
+    profile = POLL_PROFILES["ray-2"]
+    # First check early, to catch instant validation failures
+    assert next_poll_delay("ray-2", "720p", "5s", 0.0, 0) == profile.first_check
+    # Queued jobs are checked sparsely
+    assert next_poll_delay("ray-2", "720p", "5s", 5.0, 1, state="queued") == profile.max_interval
+    # Early in the render: sparse, but never past the start of the ramp (70% of 90s)
+    assert next_poll_delay("ray-2", "720p", "5s", 10.0, 1, "dreaming") == profile.max_interval
+    assert next_poll_delay("ray-2", "720p", "5s", 55.0, 1, "dreaming") == pytest.approx(63 - 55)
+    # Around the expected finish: tight
+    assert next_poll_delay("ray-2", "720p", "5s", 80.0, 5, "dreaming") == profile.min_interval
+    # Overrunning: backs off again, capped at max_interval
+    overrun = next_poll_delay("ray-2", "720p", "5s", 135.0, 9, "dreaming")
+    assert profile.min_interval < overrun < profile.max_interval
+    assert next_poll_delay("ray-2", "720p", "5s", 10_000.0, 99, "dreaming") == profile.max_interval
+
+
+def generation(generation_id, state, model="photon-flash-1"):
+    return SimpleNamespace(id=generation_id, state=state, failure_reason=None, request=SimpleNamespace(model=model))
+
+
+class FakeGenerations:
+    # Each job reports its states in order, one per status check, then stays on the last one
+
+    def __init__(self, states):
+        self.states = {generation_id: list(sequence) for generation_id, sequence in states.items()}
+        self.gets = []
+        self.lists = 0
+        self._lock = threading.Lock()
+
+    def _next(self, generation_id):
+        sequence = self.states[generation_id]
+        state = sequence.pop(0) if len(sequence) > 1 else sequence[0]
+        return generation(generation_id, state)
+
+    def get(self, id):
+        with self._lock:
+            self.gets.append(id)
+            return self._next(id)
+
+    def list(self, limit, offset):
+        with self._lock:
+            self.lists += 1
+            page = sorted(self.states)[offset:offset + limit]
+            return SimpleNamespace(generations=[self._next(generation_id) for generation_id in page])
+
+
+@pytest.fixture
+def client(fast_clock):
+    def make(states):
+        return SimpleNamespace(generations=FakeGenerations(states))
+    return make
+
+
+def test_as_completed_yields_each_job_once_and_reports_changes(client):
+    fake = client({"a": ["queued", "dreaming", "completed"], "b": ["dreaming", "failed"]})
+    changes = []
+    poller = StatusPoller(fake, on_state_change=lambda generation: changes.append((generation.id, generation.state)))
+    poller.add(generation("a", "queued"))
+    poller.add(generation("b", "queued"))
+
+    finished = {generation.id: generation.state for generation in poller.as_completed(timeout=5)}
+
+    assert finished == {"a": "completed", "b": "failed"}
+    assert poller.pending() == 0
+    assert ("a", "dreaming") in changes and ("a", "completed") in changes
+    assert ("a", "queued") not in changes  # not a change: add() saw it queued already
+    assert changes.count(("b", "failed")) == 1
+
+
+def test_many_due_jobs_are_checked_with_one_list_call(client):
+    ids = [f"job{index}" for index in range(6)]
+    fake = client({generation_id: ["completed"] for generation_id in ids})
+    poller = StatusPoller(fake, bulk_threshold=4)
+    for generation_id in ids:
+        poller.add(generation(generation_id, "queued"))
+    time.sleep(0.05)  # every first check is due by now
+
+    finished = [generation.id for generation in poller.as_completed(timeout=5)]
+
+    assert sorted(finished) == ids
+    assert fake.generations.lists == 1
+    assert fake.generations.gets == []
+
+
+def test_removed_jobs_are_not_checked(client):
+    fake = client({"a": ["completed"], "b": ["completed"]})
+    poller = StatusPoller(fake)
+    poller.add(generation("a", "queued"))
+    poller.add(generation("b", "queued"))
+    poller.remove("b")
+
+    assert [generation.id for generation in poller.as_completed(timeout=5)] == ["a"]
+    assert "b" not in fake.generations.gets
+
+
+def test_pushed_statuses_finish_jobs_without_polling(client):
+    fake = client({"a": ["dreaming"]})
+    poller = StatusPoller(fake, sweep_interval=60)
+    poller.add(generation("a", "queued"))
+    poller.push(generation("a", "completed"))
+
+    assert [generation.state for generation in poller.as_completed(timeout=5)] == ["completed"]
+    assert fake.generations.gets == []
+
+
+def test_failed_checks_go_to_on_error_and_are_retried(client):
+    fake = client({"a": ["completed"]})
+    real_get = fake.generations.get
+    calls = []
+
+    def flaky_get(id):
+        calls.append(id)
+        if len(calls) == 1:
+            raise ConnectionError("boom")
+        return real_get(id)
+
+    fake.generations.get = flaky_get
+    errors = []
+    poller = StatusPoller(fake, on_error=errors.append)
+    poller.add(generation("a", "queued"))
+
+    assert [generation.state for generation in poller.as_completed(timeout=5)] == ["completed"]
+    assert len(errors) == 1 and len(calls) == 2
+
+
+def test_timeout_raises_with_jobs_still_running(client):
+    fake = client({"a": ["dreaming"]})
+    poller = StatusPoller(fake)
+    poller.add(generation("a", "queued"))
+
+    with pytest.raises(TimeoutError, match="1 generations still running"):
+        list(poller.as_completed(timeout=0.2))
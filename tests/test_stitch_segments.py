@@ -0,0 +1,90 @@
+import json
+import shutil
+import subprocess
+from pathlib import Path
+import pytest
+from stitch_segments import Segment, playback_chain, segments_from_pipeline, stitch
+from video_frames import probe_video
+
+
+def link(slot, node):
+    return {slot: {"type": "generation", "node": node}}
+
+
+def write_pipeline(tmp_path, nodes, downloaded=None):
+    pipeline = tmp_path / "orbit.json"
+    pipeline.write_text(json.dumps({"nodes": nodes}), encoding="utf-8")
+    results = {name: {"path": str(tmp_path / f"{name}.mp4")} for name in (downloaded or nodes)}
+    pipeline.with_suffix(".results.json").write_text(json.dumps(results), encoding="utf-8")
+    return pipeline
+
+
+def as_pairs(segments):
+    return [(Path(segment.path).stem, segment.trim_end) for segment in segments]
+
+
+def test_a_bridge_plays_between_the_clips_it_joins(tmp_path):
+    pipeline = write_pipeline(tmp_path, {
+        "a": {"prompt": "start"},
+        "b": {"prompt": "end"},
+        "bridge": {"keyframes": {**link("frame0", "a"), **link("frame1", "b")}},
+    })
+
+    # a's last frame is the bridge's first, and the bridge's last frame is b's first
+    assert as_pairs(segments_from_pipeline(pipeline)) == [("a", True), ("bridge", True), ("b", False)]
+
+
+def test_extends_and_bridges_chain_together(tmp_path):
+    pipeline = write_pipeline(tmp_path, {
+        "wide": {"prompt": "wide"},
+        "push_in": {"prompt": "push in", "keyframes": link("frame0", "wide")},
+        "close": {"prompt": "close up"},
+        "join": {"keyframes": {**link("frame0", "push_in"), **link("frame1", "close")}},
+        "pull_out": {"prompt": "pull out", "keyframes": link("frame0", "close")},
+    })
+
+    assert as_pairs(segments_from_pipeline(pipeline)) == [
+        ("wide", True), ("push_in", True), ("join", True), ("close", True), ("pull_out", False),
+    ]
+
+
+def test_a_missing_download_breaks_the_trim_across_it(tmp_path):
+    pipeline = write_pipeline(tmp_path, {
+        "a": {"prompt": "a"},
+        "b": {"prompt": "b", "keyframes": link("frame0", "a")},
+        "c": {"prompt": "c", "keyframes": link("frame0", "b")},
+    }, downloaded=["a", "c"])
+
+    assert as_pairs(segments_from_pipeline(pipeline)) == [("a", False), ("c", False)]
+
+
+@pytest.mark.parametrize("nodes, message", [
+    ({"a": {"prompt": "a"}, "b": {"keyframes": link("frame0", "a")}, "c": {"keyframes": link("frame0", "a")}},
+     "branches after 'a'"),
+    ({"a": {"prompt": "a"}, "b": {"prompt": "b"}, "x": {"keyframes": link("frame1", "b")},
+      "y": {"keyframes": {**link("frame0", "a"), **link("frame1", "b")}}},
+     "branches before 'b'"),
+    ({"a": {"prompt": "a"}, "b": {"prompt": "b"}}, "starts at a, b"),
+])
+def test_branching_pipelines_are_rejected(nodes, message):
+    with pytest.raises(ValueError, match=message):
+        playback_chain(nodes)
+
+
+def make_clip(path, frames, colour):
+    subprocess.run([
+        "ffmpeg", "-v", "error", "-f", "lavfi", "-i", f"color=c={colour}:size=64x48:rate=24",
+        "-frames:v", str(frames), "-c:v", "libx264", "-bf", "0", "-pix_fmt", "yuv420p", str(path),
+    ], check=True)
+    return path
+
+
+@pytest.mark.skipif(shutil.which("ffmpeg") is None, reason="needs ffmpeg")
+def test_stitch_drops_the_repeated_boundary_frames(tmp_path):
+    clips = [make_clip(tmp_path / f"{index}.mp4", 12, colour) for index, colour in enumerate(("red", "green", "blue"))]
+    segments = [Segment(clips[0], True), Segment(clips[1], True), Segment(clips[2], False)]
+
+    result = stitch(segments, tmp_path / "orbit.mp4")
+
+    assert result["frame_count"] == 12 * 3 - 2
+    assert probe_video(tmp_path / "orbit.mp4")["codec"] == "h264"
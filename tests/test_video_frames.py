@@ -0,0 +1,70 @@
+import shutil
+import subprocess
+from pathlib import Path
+import numpy as np
+import pytest
+from PIL import Image
+from video_frames import FrameExtractionError, extract_frame, find_generation_video, image_keyframe, probe_video
+
+needs_ffmpeg = pytest.mark.skipif(shutil.which("ffmpeg") is None, reason="needs ffmpeg")
+FRAMES = 30
+
+
+@pytest.fixture
+def clip(tmp_path):
+    # Frame n is a flat grey of 8n, with a keyframe every 10 frames, so a seek has a GOP to decode into
+    for index in range(FRAMES):
+        Image.new("L", (64, 48), 8 * index).save(tmp_path / f"{index:02d}.png")
+    path = tmp_path / "9f1c.mp4"
+    subprocess.run(["ffmpeg", "-v", "error", "-framerate", "24", "-i", str(tmp_path / "%02d.png"), "-g", "10",
+                    "-c:v", "libx264", "-qp", "0", "-pix_fmt", "yuv420p", str(path)], check=True)
+    return path
+
+
+def grey(path):
+    return float(np.asarray(Image.open(path).convert("L"), dtype=np.float32).mean())
+
+
+@needs_ffmpeg
+def test_probe_video(clip):
+    info = probe_video(clip)
+    assert (info["width"], info["height"], info["frame_count"], info["fps"]) == (64, 48, FRAMES, 24.0)
+
+
+@needs_ffmpeg
+@pytest.mark.parametrize("frame, expected", [(-1, FRAMES - 1), (0, 0), (13, 13), (-5, FRAMES - 5)])
+def test_extract_frame_gets_exactly_the_frame_asked_for(clip, tmp_path, frame, expected):
+    still = extract_frame(clip, tmp_path / "still.png", frame)
+    assert grey(still) == pytest.approx(8 * expected, abs=2)
+
+
+@needs_ffmpeg
+def test_the_last_frame_goes_next_to_the_clip_by_default(clip):
+    assert extract_frame(clip) == clip.with_name("9f1c_last.jpg")
+    assert image_keyframe(clip, frame=0) == {"type": "image", "url": str(clip.with_name("9f1c_frame0.jpg"))}
+
+
+@needs_ffmpeg
+def test_frames_past_the_end_are_an_error(clip):
+    with pytest.raises(FrameExtractionError, match=f"has {FRAMES} frames, there is no frame {FRAMES}"):
+        extract_frame(clip, frame=FRAMES)
+
+
+def test_find_generation_video(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    with pytest.raises(FileNotFoundError, match="No downloaded video for generation gen-1"):
+        find_generation_video("gen-1")
+
+    (tmp_path / "gen-1.mp4").write_bytes(b"")
+    assert find_generation_video("gen-1") == Path("gen-1.mp4")
+
+    # The ledger's record of where it went comes first
+    stored = tmp_path / "outputs" / "clip.mp4"
+    stored.parent.mkdir()
+    stored.write_bytes(b"")
+
+    class Ledger:
+        def get(self, generation_id):
+            return {"output_path": str(stored)}
+
+    assert find_generation_video("gen-1", Ledger()) == stored
@@ -0,0 +1,185 @@
+import os
+import sys
+import math
+import json
+import argparse
+import subprocess
+from pathlib import Path
+from fractions import Fraction
+import numpy as np
+from job_ledger import JobLedger
+
+# --- Frame Extraction ---
+# Pulls a single still (by default the last frame) out of a downloaded {generation.id}.mp4, so a
+# shot can be continued from an image keyframe instead of referencing the whole prior generation.
+#
+# Decoding a 4K clip from the start to reach its last frame takes seconds. Instead:
+#   1. ffprobe reads the frame count and frame rate from the container header (no decoding)
+#   2. ffmpeg seeks straight to the keyframe before the wanted frame (-ss before -i) and only
+#      decodes the few frames from there to the target
+# so at most one GOP is decoded (a fraction of a second for a 4K clip, instead of the whole clip).
+# The still can go straight into a keyframe:
+#   {"type": "image", "url": "<still path>"}   (hosted by reference_images.py)
+#
+#   python video_frames.py 9f1c...e2.mp4              # last frame -> 9f1c...e2_last.jpg
+#   python video_frames.py 9f1c...e2 --frame 0        # a generation ID from the job ledger works too
+#
+# Needs ffmpeg and ffprobe on the PATH (or set FFMPEG / FFPROBE to their locations).
+
+FFMPEG = os.getenv("FFMPEG", "ffmpeg")
+FFPROBE = os.getenv("FFPROBE", "ffprobe")
+JPEG_QUALITY = 2  # ffmpeg -q:v scale, 2 is visually lossless
+
+
+class FrameExtractionError(RuntimeError):
+    pass
+
+
+def run_tool(command):
+    try:
+        completed = subprocess.run(command, capture_output=True, text=True)
+    except FileNotFoundError:
+        raise FrameExtractionError(f"{command[0]} not found; install ffmpeg or set FFMPEG / FFPROBE")
+    if completed.returncode != 0:
+        raise FrameExtractionError(f"{Path(command[0]).name} failed: {completed.stderr.strip()[-500:]}")
+    return completed.stdout
+
+
+def probe_video(video_path):
+    # Video stream details straight from the container header
+    output = run_tool([
+        FFPROBE, "-v", "error", "-select_streams", "v:0",
+        "-show_entries",
+        "stream=codec_name,profile,width,height,pix_fmt,has_b_frames,r_frame_rate,avg_frame_rate,time_base,nb_frames,start_time,duration"
+        ":format=duration",
+        "-of", "json", str(video_path),
+    ])
+    info = json.loads(output)
+    if not info.get("streams"):
+        raise FrameExtractionError(f"No video stream in {video_path}")
+    stream = info["streams"][0]
+
+    rate = stream.get("avg_frame_rate") or stream.get("r_frame_rate") or "0/1"
+    fps = float(Fraction(rate)) if rate != "0/0" else float(Fraction(stream.get("r_frame_rate", "0/1")))
+    duration = float(stream.get("duration") or info.get("format", {}).get("duration") or 0)
+    frame_count = int(stream["nb_frames"]) if stream.get("nb_frames", "N/A") != "N/A" else round(duration * fps)
+    return {
+        "codec": stream.get("codec_name"),
+        "profile": stream.get("profile"),
+        "width": stream.get("width"),
+        "height": stream.get("height"),
+        "pix_fmt": stream.get("pix_fmt"),
+        # Frames the decoder holds back for reordering, > 0 means the stream has B-frames
+        "has_b_frames": int(stream.get("has_b_frames") or 0),
+        "time_base": stream.get("time_base"),
+        "fps": fps,
+        "frame_rate": rate,
+        "frame_count": frame_count,
+        "start_time": float(stream.get("start_time") or 0),
+        "duration": duration,
+    }
+
+
+def read_frames(video_path, width, height, keyframes_only=False):
+    # Every frame (or only the keyframes) as a (frames, height, width) uint8 greyscale array, scaled
+    # down by ffmpeg and piped out raw, so nothing full size is written to disk or held in memory
+    command = [FFMPEG, "-v", "error", "-nostdin"]
+    if keyframes_only:
+        command += ["-skip_frame", "nokey"]
+    command += [
+        "-i", str(video_path), "-vf", f"scale={width}:{height}:flags=area,format=gray",
+        "-fps_mode", "passthrough", "-f", "rawvideo", "-",
+    ]
+    try:
+        completed = subprocess.run(command, capture_output=True)
+    except FileNotFoundError:
+        raise FrameExtractionError(f"{command[0]} not found; install ffmpeg or set FFMPEG / FFPROBE")
+    frame_bytes = width * height
+    if completed.returncode != 0 or len(completed.stdout) < frame_bytes:
+        error = completed.stderr.decode("utf-8", "replace").strip().splitlines()
+        raise FrameExtractionError(f"ffmpeg could not decode {video_path}: {error[-1] if error else 'no frames'}")
+    frames = np.frombuffer(completed.stdout, dtype=np.uint8)
+    return frames[:len(frames) // frame_bytes * frame_bytes].reshape(-1, height, width)
+
+
+def default_still_path(video_path, frame):
+    video_path = Path(video_path)
+    suffix = "last" if frame == -1 else f"frame{frame}"
+    return video_path.with_name(f"{video_path.stem}_{suffix}.jpg")
+
+
+def extract_frame(video_path, output_path=None, frame=-1, info=None):
+    # Write frame number `frame` of the video (negative counts back from the end, -1 = last) as a
+    # still image and return its path. .png output is lossless, anything else is a high quality JPEG.
+    info = info or probe_video(video_path)
+    if info["fps"] <= 0 or info["frame_count"] <= 0:
+        raise FrameExtractionError(f"Can't work out the frame rate / frame count of {video_path}")
+
+    index = frame if frame >= 0 else info["frame_count"] + frame
+    if not 0 <= index < info["frame_count"]:
+        raise FrameExtractionError(f"{video_path} has {info['frame_count']} frames, there is no frame {frame}")
+
+    output_path = Path(output_path or default_still_path(video_path, frame))
+    quality = [] if output_path.suffix.lower() == ".png" else ["-q:v", str(JPEG_QUALITY)]
+    if output_path.exists():
+        output_path.unlink()
+
+    # Seek to the target's timestamp, rounded down to ffmpeg's microsecond resolution: ffmpeg jumps
+    # to the keyframe at or before it and drops every decoded frame earlier than it, so the first
+    # frame out is exactly the one we want
+    seek = math.floor(index / info["fps"] * 1e6) / 1e6
+    run_tool([
+        FFMPEG, "-v", "error", "-nostdin", "-y",
+        "-ss", f"{seek:.6f}", "-i", str(video_path),
+        "-frames:v", "1", *quality, str(output_path),
+    ])
+
+    if not output_path.exists() and frame < 0:
+        # The header's frame count was off (e.g. a variable frame rate clip): decode just the tail
+        # with -sseof and keep overwriting the still, so the last frame written is the last frame
+        run_tool([
+            FFMPEG, "-v", "error", "-nostdin", "-y",
+            "-sseof", f"{-max(1.0, 4 / info['fps']):.3f}", "-i", str(video_path),
+            "-update", "1", *quality, str(output_path),
+        ])
+    if not output_path.exists():
+        raise FrameExtractionError(f"ffmpeg produced no frame {frame} for {video_path}")
+    return output_path
+
+
+def find_generation_video(generation_id, ledger=None):
+    # The downloaded clip for a generation: wherever the job ledger says it went, else ./<id>.mp4
+    if ledger is not None:
+        job = ledger.get(generation_id)
+        if job and job.get("output_path") and Path(job["output_path"]).exists():
+            return Path(job["output_path"])
+    path = Path(f"{generation_id}.mp4")
+    if path.exists():
+        return path
+    raise FileNotFoundError(f"No downloaded video for generation {generation_id} (run resume_jobs.py to fetch it)")
+
+
+def image_keyframe(video_path, frame=-1, output_path=None):
+    # A keyframe entry starting (or ending) a new generation on a frame of an existing clip
+    return {"type": "image", "url": str(extract_frame(video_path, output_path, frame))}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Extract the last (or any) frame of a video as a still image.")
+    parser.add_argument("video", help="A video file, or a generation ID whose download is in the job ledger")
+    parser.add_argument("--frame", type=int, default=-1, help="Frame number, negative counts from the end (default: last)")
+    parser.add_argument("--output", help="Still image path (.jpg or .png)")
+    args = parser.parse_args()
+
+    try:
+        video_path = Path(args.video)
+        if not video_path.exists():
+            video_path = find_generation_video(args.video, JobLedger())
+        print(extract_frame(video_path, args.output, args.frame))
+    except (FileNotFoundError, FrameExtractionError) as e:
+        print(f"Error: {e}")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()